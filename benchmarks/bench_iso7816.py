@@ -0,0 +1,198 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Micro-benchmarks of Python overhead of iso7816 per operation
+Card-reader is not needed: PC/SC calls go to SimulatedBackend without latency
+
+    $python benchmarks/bench_iso7816.py                 # compare with benchmarks/baseline.json
+    $python benchmarks/bench_iso7816.py --save          # store results as new baseline
+    $python benchmarks/bench_iso7816.py -k transmit     # only benchmarks with 'transmit' in name
+"""
+
+__author__ = 'lem'
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import iso7816
+from iso7816.simulator import SimulatedBackend, SimulatedCard
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+ATR = bytes.fromhex('3B DB 96 00 80 B1 FE 45 1F 83 00 31 C0 64 C7 FC 10 00 01 90 00 74')
+
+
+def make_card():
+    responses = {bytes.fromhex('00 A4 04 00 07 A0 00 00 00 03 10 10'): bytes.fromhex('6F 10 84 07 A0 00 00 00 '
+                                                                                     '03 10 10 A5 05 50 03 56 '
+                                                                                     '49 53 90 00'),
+                 bytes.fromhex('00 B0 00 00 00'): bytes(256) + b'\x90\x00'}
+
+    def handler(apdu):                                          # Transparent EF of 4096 bytes
+        if apdu[1] == 0xB0:
+            return bytes(256) + b'\x90\x00' if apdu[2] < 0x10 else b'\x6B\x00'
+        return None
+
+    backend = SimulatedBackend({'Bench Reader': SimulatedCard(atr=ATR, responses=responses, handler=handler)})
+    card = iso7816.Iso7816(backend=backend)
+    card.connect('Bench Reader')
+
+    return card
+
+
+def benchmarks(card):
+    """
+    :return: dict {name: callable without arguments}
+    """
+    apdu_str = '00 A4 04 00 07 A0 00 00 00 03 10 10'
+    apdu_list = list(bytes.fromhex(apdu_str))
+    apdu_bytes = bytes(apdu_list)
+    read_binary = bytes.fromhex('00 B0 00 00 00')
+    rx_buffer = bytearray(300)
+    atr_str = ATR.hex(' ').upper()
+    read_template = iso7816.ApduTemplate(0x00, 0xB0, le=256)
+    file_reader = iso7816.FileReader(card)
+    file_buffer = bytearray(4096)
+    fci = bytes.fromhex('6F 1C 84 07 A0 00 00 00 03 10 10 A5 11 50 04 56 49 53 41 BF 0C 05 9F 4D 02 0B 0A 87 01 01')
+
+    def analyze_atr():
+        with contextlib.redirect_stdout(io.StringIO()):
+            card.analyze_atr(atr_str)
+
+    items = {
+        'transmit_str': lambda: card.transmit(apdu_str),
+        'transmit_list': lambda: card.transmit(apdu_list),
+        'transmit_bytes': lambda: card.transmit(apdu_bytes),
+        'transmit_into': lambda: card.transmit_into(apdu_bytes),
+        'transmit_into_rx_buffer': lambda: card.transmit_into(apdu_bytes, rx_buffer),
+        'transmit_read_binary_256': lambda: card.transmit(read_binary),
+        'read_binary_4k': lambda: file_reader.read_into(file_buffer),
+        'get_atr': card.get_atr,
+        'analyze_atr': analyze_atr,
+        'parse_atr': lambda: iso7816.parse_atr(ATR),
+        'get_attrib': lambda: card.get_attrib('VENDOR_IFD_TYPE'),
+        'reader_snapshot': card.reader_snapshot,
+        'apdu_encode': lambda: iso7816.apdu.encode_apdu(0x00, 0xB0, 0x01, 0x00, None, 256),
+        'apdu_template_build': lambda: read_template.build(0x01, 0x00),
+        'validate_byte_int': lambda: iso7816.Iso7816.validate_byte(0xA4),
+        'validate_byte_str': lambda: iso7816.Iso7816.validate_byte('A4'),
+        'validate_data': lambda: iso7816.Iso7816.validate_data('A0 00 00 00 03 10 10'),
+        'tlv_parse_fci': lambda: iso7816.tlv.parse(fci).get('6F/A5/BF0C/9F4D'),
+        'tlv_index_fci': lambda: iso7816.tlv.parse(fci).index,
+        'exception': lambda: iso7816.Iso7816Exception('[transmit] ', 0x80100008),
+        'exception_sw': lambda: iso7816.NotFoundError(0x6A, 0x82),
+        'sw_describe': lambda: iso7816.sw.describe(0x63, 0xC2),
+        'sw_check': lambda: iso7816.sw.check_sw(0x90, 0x00),
+        'open_close': lambda: iso7816.Iso7816(backend=card.backend).close(),
+    }
+
+    if iso7816.sm.Cipher is not None:                           # Secure messaging needs package 'cryptography'
+        sm_apdu = bytes.fromhex('00 D6 00 00 40') + bytes(64)
+        sm_aes = iso7816.sm.IsoSm(card, bytes(range(16)), bytes(range(16, 32)), aes=True)
+        sm_3des = iso7816.sm.IsoSm(card, bytes(range(16)), bytes(range(16, 32)))
+        items['sm_wrap_aes_64'] = lambda: sm_aes.wrap(sm_apdu)
+        items['sm_wrap_3des_64'] = lambda: sm_3des.wrap(sm_apdu)
+
+    return items
+
+
+def measure(fn, min_time=0.2, repeat=5):
+    """
+    :return: ns per operation (the best of 'repeat'), peak of memory (bytes) allocated by one operation
+    """
+    fn()
+
+    loops = 1
+    while True:
+        time_start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - time_start
+        if elapsed >= min_time / 10:
+            break
+        loops *= 10
+
+    loops = max(1, int(loops * (min_time / 10) / elapsed * 10))
+
+    best = None
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - time_start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    fn()
+    tracemalloc.reset_peak()
+    current = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    return best / loops * 1e9, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', action='store_true', help='store results in baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='path to baseline file')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown against baseline')
+    parser.add_argument('--min-time', type=float, default=0.2, help='time (s) of one measurement')
+    parser.add_argument('-k', dest='keyword', default='', help='run benchmarks which contain keyword')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    card = make_card()
+    results = {}
+    regressions = []
+
+    print("{:<28} {:>12} {:>12} {:>10}".format('benchmark', 'ns/op', 'peak B/op', 'baseline'))
+
+    for name, fn in benchmarks(card).items():
+        if args.keyword not in name:
+            continue
+
+        ns_per_op, peak = measure(fn, args.min_time)
+        results[name] = {'ns_per_op': round(ns_per_op, 1), 'peak_bytes': peak}
+
+        change = ''
+        if name in baseline and not args.save:
+            ratio = ns_per_op / baseline[name]['ns_per_op'] - 1
+            change = '{:+.0%}'.format(ratio)
+            if ratio > args.threshold:
+                regressions.append(name)
+                change += ' !'
+
+        print("{:<28} {:>12.1f} {:>12} {:>10}".format(name, ns_per_op, peak, change))
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(dict(baseline, **results), f, indent=4, sort_keys=True)
+            f.write('\n')
+        print("\nBaseline is stored in {}".format(args.baseline))
+
+    if regressions:
+        print("\nRegressions (> {:.0%}): {}".format(args.threshold, ", ".join(regressions)))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
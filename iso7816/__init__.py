@@ -4,3 +4,23 @@
 
 from iso7816.core import Iso7816
 from iso7816.core import Iso7816Exception
+from iso7816.exceptions import PcscError, CardRemovedError, CardResetError, ReaderUnavailableError
+from iso7816.exceptions import SecureMessagingError
+from iso7816.exceptions import SwError, SwWarning, VerificationError, SwExecutionError, SwCheckingError
+from iso7816.exceptions import WrongLengthError, SecurityError, NotFoundError, NotSupportedError
+from iso7816.script import ScriptRunner
+from iso7816.pool import ReaderPool
+from iso7816.aio import AsyncIso7816
+from iso7816.monitor import CardMonitor
+from iso7816.session import SessionCache
+from iso7816 import trace
+from iso7816.record import Recorder, TraceReader
+from iso7816.atr import Atr, parse_atr
+from iso7816.atrdb import AtrDatabase
+from iso7816.apdu import CommandAPDU, ApduTemplate
+from iso7816.files import FileReader
+from iso7816.crawler import Crawler, FileNode
+from iso7816 import apdu
+from iso7816 import tlv
+from iso7816 import sw
+from iso7816 import sm
@@ -0,0 +1,112 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import asyncio
+import concurrent.futures
+
+from iso7816 import constants
+from iso7816.core import Iso7816, PCSC_LIB
+from iso7816.exceptions import Iso7816Exception
+
+
+class AsyncIso7816:
+    """
+    asyncio front-end for Iso7816
+    Every object has its own thread with its own PC/SC context, so calls of one object are serialized
+    and objects of different readers progress concurrently
+
+        card = AsyncIso7816()
+        await card.connect((await card.get_readers())[0])
+        response, sw1, sw2 = await card.transmit('00 A4 04 00')
+
+    If awaiting task is cancelled - SCardCancel is called for the context of object
+    """
+
+    def __init__(self, path_to_lib=PCSC_LIB, backend=None):
+        self.path_to_lib = path_to_lib
+        self.backend = backend
+        self.card = None                                        # Iso7816 object, created in the thread
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                                thread_name_prefix='AsyncIso7816')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def get_readers(self):
+        return await self.run(Iso7816.get_readers)
+
+    async def connect(self,
+                      reader=None,
+                      mode=constants.SCARD_SHARE_SHARED,
+                      protocol=constants.SCARD_PROTOCOL_T0 | constants.SCARD_PROTOCOL_T1):
+        return await self.run(Iso7816.connect, reader, mode, protocol)
+
+    async def disconnect(self):
+        return await self.run(Iso7816.disconnect)
+
+    async def get_atr(self):
+        return await self.run(Iso7816.get_atr)
+
+    async def get_attrib(self, get_attrib=None):
+        return await self.run(Iso7816.get_attrib, get_attrib)
+
+    async def transmit(self, raw_apdu, auto_get_response=False):
+        return await self.run(Iso7816.transmit, raw_apdu, auto_get_response)
+
+    async def transmit_many(self, apdus, expected_sw=None, auto_get_response=False):
+        """
+        See 'Iso7816.transmit_many', the whole batch is run in the thread of object
+        :return:    list of (response (bytes), sw1, sw2)
+        """
+        def batch(card):
+            return list(card.transmit_many(apdus, expected_sw, auto_get_response))
+
+        return await self.run(batch)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run fn(card, *args, **kwargs) in the thread of object
+        :param fn:  callable, the first argument is Iso7816 object
+        """
+        def job():
+            if self.card is None:
+                self.card = Iso7816(self.path_to_lib, self.backend)
+            return fn(self.card, *args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        future = self.__executor.submit(job)
+
+        try:
+            return await asyncio.wrap_future(future, loop=loop)
+
+        except asyncio.CancelledError:
+            if not future.cancel() and self.card is not None:
+                try:
+                    self.card.cancel()
+
+                except Iso7816Exception:
+                    pass
+            raise
+
+    async def close(self):
+        """
+        Close connection and stop the thread of object
+        """
+        def job():
+            if self.card is not None:
+                self.card.close()
+                self.card = None
+
+        try:
+            await asyncio.wrap_future(self.__executor.submit(job))
+
+        except RuntimeError:                                    # Already closed
+            pass
+
+        await asyncio.get_running_loop().run_in_executor(None, self.__executor.shutdown, True)
@@ -0,0 +1,348 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+from iso7816.exceptions import Iso7816Exception
+
+
+MAX_SHORT_LC = 0xFF                 # Lc  1..255 in short form
+MAX_SHORT_LE = 0x100                # Le  1..256 in short form (256 encoded as 0x00)
+MAX_EXTENDED_LC = 0xFFFF            # Lc  1..65535 in extended form
+MAX_EXTENDED_LE = 0x10000           # Le  1..65536 in extended form (65536 encoded as 0x0000)
+
+
+def validate_byte(raw_value):
+    """
+    :param raw_value:   int or hex string ('A4', '0xA4') of single byte
+    :return:            int 0..0xFF
+    """
+    if isinstance(raw_value, int):
+        value = raw_value
+
+    elif isinstance(raw_value, str):
+        try:
+            value = int(raw_value, 16)
+
+        except ValueError:
+            raise Iso7816Exception('wrong value of [CLA]/[INS]/[P1]/[P2]/[Lc]/[Le]')
+
+    else:
+        raise Iso7816Exception('wrong value of [CLA]/[INS]/[P1]/[P2]/[Lc]/[Le]')
+
+    if not 0 <= value <= 0xFF:
+        raise Iso7816Exception('wrong value of [CLA]/[INS]/[P1]/[P2]/[Lc]/[Le]')
+
+    return value
+
+
+def validate_le(le, extended=None):
+    """
+    :param le:          Ne or None
+    :param extended:    False - short form only (1..256), otherwise 1..65536
+    :return:            le
+    """
+    if le is not None and (not isinstance(le, int) or
+                           not 0 < le <= (MAX_SHORT_LE if extended is False else MAX_EXTENDED_LE)):
+        raise Iso7816Exception("wrong value of [Le]: {}".format(le))
+
+    return le
+
+
+def encode_apdu(cla, ins, p1, p2, data=None, le=None, extended=None):
+    """
+    Build C-APDU according to ISO 7816-4 (case 1, 2, 3, 4 in short or extended form)
+    :param cla:         class byte, see 'validate_byte'
+    :param ins:         instruction byte
+    :param p1:          parameter P1
+    :param p2:          parameter P2
+    :param data:        command data field (bytes/bytearray/list) or None
+    :param le:          expected length of response (Ne) or None
+                        0 is not valid Ne, use 256 (short) or 65536 (extended) for "all available"
+    :param extended:    True  - force extended form
+                        False - force short form
+                        None  - extended form is used only if Lc or Le not fit into short form
+    :return:            bytes of C-APDU
+    """
+    nc = len(data) if data else 0
+
+    if nc > MAX_EXTENDED_LC:
+        raise Iso7816Exception("wrong length of [data]: {}".format(nc))
+
+    if le is not None and not (isinstance(le, int) and 0 < le <= MAX_EXTENDED_LE):
+        raise Iso7816Exception("wrong value of [Le]: {}".format(le))
+
+    if extended is None:
+        extended = nc > MAX_SHORT_LC or (le is not None and le > MAX_SHORT_LE)
+
+    elif not extended and (nc > MAX_SHORT_LC or (le is not None and le > MAX_SHORT_LE)):
+        raise Iso7816Exception("[Lc]/[Le] can't be encoded in short form")
+
+    try:
+        apdu = bytearray((cla, ins, p1, p2))
+
+    except (TypeError, ValueError):                             # Hex string or wrong value of header
+        apdu = bytearray((validate_byte(cla), validate_byte(ins), validate_byte(p1), validate_byte(p2)))
+
+    if nc:
+        if extended:
+            apdu += bytes((0x00, nc >> 8, nc & 0xFF))
+        else:
+            apdu.append(nc)
+        apdu += bytes(data)
+
+    if le is not None:
+        if extended:
+            if not nc:
+                apdu.append(0x00)
+            apdu += bytes(((le >> 8) & 0xFF, le & 0xFF))
+        else:
+            apdu.append(le & 0xFF)
+
+    return bytes(apdu)
+
+
+def decode_apdu(apdu):
+    """
+    Split C-APDU into fields (case 1, 2, 3, 4 in short or extended form)
+    :param apdu:        C-APDU - bytes/bytearray/memoryview
+    :return:            cla, ins, p1, p2, data (bytes, empty for case 1, 2), Ne (None for case 1, 3)
+    """
+    apdu = bytes(apdu)
+    apdu_len = len(apdu)
+
+    if apdu_len < 4:
+        raise Iso7816Exception("Wrong C-APDU {}".format(apdu.hex(' ').upper()))
+
+    data = b''
+    le = None
+
+    if apdu_len == 5:                                       # case 2 short
+        le = apdu[4] or MAX_SHORT_LE
+
+    elif apdu_len > 5 and apdu[4] != 0:                     # case 3, 4 short
+        nc = apdu[4]
+        data = apdu[5:5 + nc]
+        rest = apdu_len - 5 - nc
+        if rest == 1:
+            le = apdu[-1] or MAX_SHORT_LE
+        elif rest != 0:
+            raise Iso7816Exception("Wrong C-APDU {}".format(apdu.hex(' ').upper()))
+
+    elif apdu_len == 7:                                     # case 2 extended
+        le = ((apdu[5] << 8) | apdu[6]) or MAX_EXTENDED_LE
+
+    elif apdu_len > 7:                                      # case 3, 4 extended
+        nc = (apdu[5] << 8) | apdu[6]
+        data = apdu[7:7 + nc]
+        rest = apdu_len - 7 - nc
+        if rest == 2:
+            le = ((apdu[-2] << 8) | apdu[-1]) or MAX_EXTENDED_LE
+        elif rest != 0:
+            raise Iso7816Exception("Wrong C-APDU {}".format(apdu.hex(' ').upper()))
+
+    elif apdu_len != 4:
+        raise Iso7816Exception("Wrong C-APDU {}".format(apdu.hex(' ').upper()))
+
+    return apdu[0], apdu[1], apdu[2], apdu[3], data, le
+
+
+def expected_length(apdu):
+    """
+    Decode Ne (maximum number of bytes expected in response data) from C-APDU
+    :param apdu:        C-APDU - bytes/bytearray/memoryview
+    :return:            Ne, 0 if C-APDU has no Le field (case 1 or case 3)
+    """
+    apdu_len = len(apdu)
+
+    if apdu_len <= 4:                                       # case 1
+        return 0
+
+    if apdu_len == 5:                                       # case 2 short
+        return apdu[4] or MAX_SHORT_LE
+
+    if apdu[4] != 0:                                        # short Lc
+        nc = apdu[4]
+        if apdu_len == 5 + nc:                              # case 3 short
+            return 0
+        return apdu[-1] or MAX_SHORT_LE                     # case 4 short
+
+    if apdu_len < 7:                                        # '00' of extended length without 2 bytes
+        raise Iso7816Exception("Wrong C-APDU {}".format(bytes(apdu).hex(' ').upper()))
+
+    if apdu_len == 7:                                       # case 2 extended
+        return ((apdu[5] << 8) | apdu[6]) or MAX_EXTENDED_LE
+
+    nc = (apdu[5] << 8) | apdu[6]
+    if apdu_len == 7 + nc:                                 # case 3 extended
+        return 0
+
+    return ((apdu[-2] << 8) | apdu[-1]) or MAX_EXTENDED_LE  # case 4 extended
+
+
+def set_le(apdu, le):
+    """
+    Replace (or append) Le field of C-APDU, the form (short/extended) of C-APDU is kept
+    :param apdu:        C-APDU - bytes/bytearray/memoryview
+    :param le:          new Le value as it is received in SW2 of '6Cxx' (0 means 256)
+    :return:            bytes of C-APDU
+    """
+    apdu = bytes(apdu)
+    apdu_len = len(apdu)
+    le = le or MAX_SHORT_LE                                 # SW2 = 00 is 256, not 65536 in extended form
+
+    extended = apdu_len > 5 and apdu[4] == 0
+    has_le = expected_length(apdu) != 0
+
+    if not extended:
+        if has_le:
+            return apdu[:-1] + bytes((le & 0xFF,))
+        return apdu + bytes((le & 0xFF,))
+
+    if has_le:
+        return apdu[:-2] + bytes(((le >> 8) & 0xFF, le & 0xFF))
+    return apdu + bytes(((le >> 8) & 0xFF, le & 0xFF))
+
+
+class CommandAPDU:
+    """
+    C-APDU of ISO 7816-4
+
+        apdu = CommandAPDU(0x00, 0xB0, 0x00, 0x00, le=256)
+        card.transmit_into(bytes(apdu))
+        CommandAPDU.from_bytes(b'\\x00\\xA4\\x04\\x00\\x02\\x3F\\x00').data     # b'\\x3F\\x00'
+    """
+
+    __slots__ = ('cla', 'ins', 'p1', 'p2', 'data', 'le', 'extended')
+
+    def __init__(self, cla, ins, p1=0x00, p2=0x00, data=None, le=None, extended=None):
+        """
+        Parameters are the same as of 'encode_apdu', wrong header and Le are raised here
+        """
+        self.cla = validate_byte(cla)
+        self.ins = validate_byte(ins)
+        self.p1 = validate_byte(p1)
+        self.p2 = validate_byte(p2)
+        self.data = bytes(data) if data else b''
+        self.le = validate_le(le, extended)
+        self.extended = extended
+
+    def __repr__(self):
+        return "CommandAPDU({})".format(self.encode().hex(' ').upper())
+
+    def __bytes__(self):
+        return self.encode()
+
+    def __eq__(self, other):
+        if not isinstance(other, CommandAPDU):
+            return NotImplemented
+
+        return self.encode() == other.encode()
+
+    def __hash__(self):
+        return hash(self.encode())
+
+    @classmethod
+    def from_bytes(cls, apdu):
+        """
+        :param apdu:    C-APDU - bytes/bytearray/memoryview
+        :return:        CommandAPDU, the form (short/extended) of C-APDU is kept
+        """
+        cla, ins, p1, p2, data, le = decode_apdu(apdu)
+        return cls(cla, ins, p1, p2, data, le, len(apdu) > 5 and apdu[4] == 0)
+
+    @property
+    def case(self):
+        """
+        :return: 1 - no data, no Le; 2 - Le; 3 - data; 4 - data and Le
+        """
+        return (3 if self.data else 1) + (self.le is not None)
+
+    def encode(self):
+        """
+        :return: bytes of C-APDU
+        """
+        return encode_apdu(self.cla, self.ins, self.p1, self.p2, self.data, self.le, self.extended)
+
+
+class ApduTemplate:
+    """
+    Pre-encoded C-APDU, only variable fields are patched into the same buffer
+
+        read = ApduTemplate(0x00, 0xB0, le=256)
+        for offset in range(0, 0x1000, 0x100):
+            card.transmit_into(read.build(p1=offset >> 8, p2=offset & 0xFF))
+
+        update = ApduTemplate(0x00, 0xD6, data=bytes(16))
+        update.build(p2=0x10, data=b'\\x01\\x02', offset=4)      # data field: 00 00 00 00 01 02 00 ...
+
+    The result of 'build' is memoryview of the buffer, it is valid until the next 'build'
+    """
+
+    __slots__ = ('buffer', 'data_size', 'extended', '__view', '__data_offset', '__le_offset')
+
+    def __init__(self, cla, ins, p1=0x00, p2=0x00, data=None, le=None, extended=None):
+        """
+        Parameters are the same as of 'encode_apdu', 'data' is the fixed part of data field (it sets Lc)
+        and 'le' is the default Le
+        """
+        self.buffer = bytearray(encode_apdu(cla, ins, p1, p2, data, le, extended))
+        self.data_size = len(data) if data else 0
+        self.extended = len(self.buffer) > 5 and self.buffer[4] == 0
+        self.__view = memoryview(self.buffer)
+
+        header_size = 4 + (3 if self.extended else 1)
+        self.__data_offset = header_size if self.data_size else None
+
+        if le is None:
+            self.__le_offset = None
+        elif self.data_size:
+            self.__le_offset = header_size + self.data_size
+        else:
+            self.__le_offset = 5 if self.extended else 4
+
+    def build(self, p1=None, p2=None, data=None, offset=0, le=None):
+        """
+        :param p1:      new P1 or None
+        :param p2:      new P2 or None
+        :param data:    bytes-like which is written into data field at 'offset', size of data field isn't changed
+        :param offset:  offset in data field
+        :param le:      new Le (in the same form as Le of template) or None
+        :return:        memoryview of C-APDU
+        """
+        buffer = self.buffer
+
+        try:
+            if p1 is not None:
+                buffer[2] = p1
+            if p2 is not None:
+                buffer[3] = p2
+
+        except (TypeError, ValueError):                         # Hex string or wrong value of P1/P2
+            if p1 is not None:
+                buffer[2] = validate_byte(p1)
+            if p2 is not None:
+                buffer[3] = validate_byte(p2)
+
+        if data is not None:
+            if self.__data_offset is None or offset < 0 or offset + len(data) > self.data_size:
+                raise Iso7816Exception("[data] doesn't fit into data field of template")
+            start = self.__data_offset + offset
+            buffer[start:start + len(data)] = data
+
+        if le is not None:
+            if self.__le_offset is None:
+                raise Iso7816Exception("Template has no [Le]")
+
+            if self.extended:
+                if not 0 < le <= MAX_EXTENDED_LE:
+                    raise Iso7816Exception("wrong value of [Le]: {}".format(le))
+                buffer[self.__le_offset] = (le >> 8) & 0xFF
+                buffer[self.__le_offset + 1] = le & 0xFF
+            else:
+                if not 0 < le <= MAX_SHORT_LE:
+                    raise Iso7816Exception("wrong value of [Le]: {}".format(le))
+                buffer[self.__le_offset] = le & 0xFF
+
+        return self.__view
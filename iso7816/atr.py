@@ -0,0 +1,462 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Parser of ATR (ISO/IEC 7816-3)
+
+    atr = parse_atr('3B 8A 80 01 00 31 C1 73 C8 40 00 00 90 00 90')
+    atr.protocols, atr.fi, atr.di, atr.historical, atr.tck_valid
+    print(render_atr(atr))
+
+Parsing has no side effects, the result is immutable and cached by raw ATR
+"""
+
+__author__ = 'lem'
+
+import functools
+
+from iso7816 import constants
+from iso7816.exceptions import Iso7816Exception
+
+
+FI_TABLE = (372, 372, 558, 744, 1116, 1488, 1860, None, None, 512, 768, 1024, 1536, 2048, None, None)
+F_MAX_TABLE = (4, 5, 6, 8, 12, 16, 20, None, None, 5, 7.5, 10, 15, 20, None, None)    # MHz
+DI_TABLE = (None, 1, 2, 4, 8, 16, 32, 64, 12, 20, None, None, None, None, None, None)
+
+DEFAULT_TA1 = 0x11                                              # Fi = 372, Di = 1
+DEFAULT_IFSC = 32
+
+CACHE_SIZE = 256                                                # Number of cached ATR
+
+# Tags of compact-TLV objects of historical bytes (ISO/IEC 7816-4)
+TAG_COUNTRY_CODE = 0x1
+TAG_ISSUER_ID = 0x2
+TAG_CARD_SERVICE_DATA = 0x3
+TAG_INITIAL_ACCESS_DATA = 0x4
+TAG_CARD_ISSUER_DATA = 0x5
+TAG_PRE_ISSUING_DATA = 0x6
+TAG_CARD_CAPABILITIES = 0x7
+TAG_STATUS_INDICATOR = 0x8
+TAG_AID = 0xF
+
+COMPACT_TLV_TAGS = {
+    TAG_COUNTRY_CODE: 'Country code',
+    TAG_ISSUER_ID: 'Issuer identification number',
+    TAG_CARD_SERVICE_DATA: 'Card service data',
+    TAG_INITIAL_ACCESS_DATA: 'Initial access data',
+    TAG_CARD_ISSUER_DATA: "Card issuer's data",
+    TAG_PRE_ISSUING_DATA: 'Pre-issuing data',
+    TAG_CARD_CAPABILITIES: 'Card capabilities',
+    TAG_STATUS_INDICATOR: 'Status indicator',
+    TAG_AID: 'Application identifier',
+}
+
+
+class HistoricalBytes:
+    """
+    Decoded historical bytes
+    Fields of card capabilities are None if the card doesn't report them
+    """
+
+    __slots__ = ('raw', 'category', 'objects', 'dir_reference', 'lcs', 'sw', 'card_service_data',
+                 'capabilities', 'selection_methods', 'short_ef_id', 'record_number', 'record_identifier',
+                 'data_unit_size', 'command_chaining', 'extended_length', 'logical_channels', 'valid')
+
+    def __init__(self, raw):
+        self.raw = raw                                          # bytes of historical bytes
+        self.category = raw[0] if raw else None                 # Category indicator
+        self.objects = ()                                       # Compact-TLV objects: ((tag, value), ...)
+        self.dir_reference = None                               # DIR data reference (category 0x10)
+        self.lcs = None                                         # Life cycle status
+        self.sw = None                                          # SW1 SW2 of status indicator
+        self.card_service_data = None
+        self.capabilities = b''                                 # Raw card capabilities (1..3 bytes)
+        self.selection_methods = None                           # DF selection: b8 full DF name ... b4 implicit
+        self.short_ef_id = None
+        self.record_number = None
+        self.record_identifier = None
+        self.data_unit_size = None                              # Size of data unit in bytes
+        self.command_chaining = None
+        self.extended_length = None                             # Extended Lc and Le
+        self.logical_channels = None                            # Maximum number of logical channels
+        self.valid = True                                       # False if compact-TLV is broken
+
+    def __repr__(self):
+        return "HistoricalBytes('{}')".format(self.raw.hex(' ').upper())
+
+    def get(self, tag, default=None):
+        """
+        Value of the first compact-TLV object with tag
+        :param tag:     TAG_*
+        :return:        bytes
+        """
+        for object_tag, value in self.objects:
+            if object_tag == tag:
+                return value
+
+        return default
+
+
+def decode_historical(raw):
+    """
+    Decode historical bytes (ISO/IEC 7816-4, 8.1.1)
+    :param raw:     bytes
+    :return:        HistoricalBytes
+    """
+    hb = HistoricalBytes(bytes(raw))
+
+    if hb.category == 0x10 and len(raw) > 1:
+        hb.dir_reference = raw[1]
+        return hb
+
+    if hb.category not in (0x00, 0x80):                         # Proprietary format
+        return hb
+
+    end = len(raw)
+    if hb.category == 0x00:                                     # Status indicator is mandatory, the last 3 bytes
+        if end < 4:
+            hb.valid = False
+            return hb
+        end -= 3
+        hb.lcs = raw[end]
+        hb.sw = (raw[end + 1] << 8) | raw[end + 2]
+
+    objects = []
+    ptr = 1
+    while ptr < end:
+        tag = raw[ptr] >> 4
+        length = raw[ptr] & 0xF
+        ptr += 1
+
+        if ptr + length > end:
+            hb.valid = False
+            break
+
+        objects.append((tag, bytes(raw[ptr:ptr + length])))
+        ptr += length
+
+    hb.objects = tuple(objects)
+
+    status = hb.get(TAG_STATUS_INDICATOR)
+    if status:
+        if len(status) != 2:
+            hb.lcs = status[0]
+        if len(status) >= 2:
+            hb.sw = int.from_bytes(status[-2:], 'big')
+
+    service_data = hb.get(TAG_CARD_SERVICE_DATA)
+    if service_data:
+        hb.card_service_data = service_data[0]
+
+    capabilities = hb.capabilities = hb.get(TAG_CARD_CAPABILITIES, b'')
+    if len(capabilities) >= 1:                                  # The first software function table
+        hb.selection_methods = capabilities[0] & 0xF8
+        hb.short_ef_id = bool(capabilities[0] & 0x04)
+        hb.record_number = bool(capabilities[0] & 0x02)
+        hb.record_identifier = bool(capabilities[0] & 0x01)
+
+    if len(capabilities) >= 2:                                  # Data coding byte
+        hb.data_unit_size = (1 << (capabilities[1] & 0xF)) // 2 or 1    # 2^n quartets, at least 1 byte
+
+    if len(capabilities) >= 3:                                  # The third software function table
+        hb.command_chaining = bool(capabilities[2] & 0x80)
+        hb.extended_length = bool(capabilities[2] & 0x40)
+        if capabilities[2] & 0x18:
+            hb.logical_channels = (capabilities[2] & 0x07) + 1
+        else:
+            hb.logical_channels = 1
+
+    return hb
+
+
+class Atr:
+    """
+    Parsed ATR
+    Interface bytes are 'interface' - tuple of levels i = 1, 2, ... (TAi, TBi, TCi, TDi), None if byte is absent
+    """
+
+    __slots__ = ('raw', 'ts', 't0', 'interface', 'protocols', 'historical', 'historical_info', 'tck', 'tck_valid',
+                 'fi', 'di', 'f_max', 'guard_time', 'ifsc')
+
+    def __init__(self, raw, ts, t0, interface, protocols, historical, tck, tck_valid,
+                 fi, di, f_max, guard_time, ifsc):
+        self.raw = raw                                          # bytes of ATR
+        self.ts = ts                                            # Initial character: 0x3B/0x3F
+        self.t0 = t0                                            # Format byte
+        self.interface = interface
+        self.protocols = protocols                              # Offered protocols: (0,), (0, 1), ...
+        self.historical = historical                            # Historical bytes
+        self.historical_info = decode_historical(historical)    # HistoricalBytes
+        self.tck = tck                                          # Check byte, None if absent
+        self.tck_valid = tck_valid                              # None if TCK isn't required
+        self.fi = fi                                            # Clock rate conversion integer, None - RFU
+        self.di = di                                            # Baud rate adjustment integer, None - RFU
+        self.f_max = f_max                                      # Maximum clock frequency (MHz)
+        self.guard_time = guard_time                            # Extra guard time N (TC1)
+        self.ifsc = ifsc                                        # Information field size of card (T=1)
+
+    def __repr__(self):
+        return "Atr('{}')".format(self.raw.hex(' ').upper())
+
+    def __eq__(self, other):
+        return isinstance(other, Atr) and self.raw == other.raw
+
+    def __hash__(self):
+        return hash(self.raw)
+
+    def byte(self, name):
+        """
+        Interface byte by name
+        :param name:    'TA1', 'TB2', 'TD1', ...
+        :return:        value, None if byte is absent
+        """
+        try:
+            return self.interface[int(name[2:]) - 1]['ABCD'.index(name[1])]
+
+        except (IndexError, ValueError):
+            return None
+
+    @property
+    def headers(self):
+        """
+        Names of present bytes: ['TS', 'T0', 'TA1', ..., 'hb', 'TCK']
+        """
+        headers = ['TS', 'T0']
+
+        for index, level in enumerate(self.interface, 1):
+            headers.extend('T{}{}'.format(letter, index) for letter, value in zip('ABCD', level) if value is not None)
+
+        headers.append('hb')
+
+        if self.tck is not None:
+            headers.append('TCK')
+
+        return headers
+
+    def as_dict(self):
+        """
+        ATR in format of 'Iso7816.analyze_atr'
+        :return:    {'TS': <val>, 'T0': <val>, 'TA1': <val>, ..., 'hb': [...], 'TCK': <val>,
+                     'headers': [...]}
+        """
+        atr = {'TS': self.ts, 'T0': self.t0}
+
+        for index, level in enumerate(self.interface, 1):
+            for letter, value in zip('ABCD', level):
+                if value is not None:
+                    atr['T{}{}'.format(letter, index)] = value
+
+        atr['hb'] = list(self.historical)
+
+        if self.tck is not None:
+            atr['TCK'] = self.tck
+
+        atr['headers'] = self.headers
+        atr['headres'] = atr['headers']                         # Former name of key
+
+        return atr
+
+
+def to_bytes(raw_atr):
+    """
+    :param raw_atr:     ATR - hex string ('3B 80 80 01 01'), list of int, bytes or any buffer
+    :return:            bytes
+    """
+    if isinstance(raw_atr, bytes):
+        return raw_atr
+
+    try:
+        if isinstance(raw_atr, str):
+            return bytes.fromhex(raw_atr)
+
+        return bytes(raw_atr)
+
+    except (ValueError, TypeError):
+        raise Iso7816Exception("Wrong ATR: {}".format(raw_atr))
+
+
+def parse_atr(raw_atr):
+    """
+    Parse ATR, result is cached
+    :param raw_atr:     ATR - hex string, list of int, bytes or any buffer
+    :return:            Atr
+    """
+    return _parse(to_bytes(raw_atr))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _parse(raw):
+    atr_len = len(raw)
+
+    if atr_len < 2 or raw[0] not in (0x3B, 0x3F):
+        raise Iso7816Exception("This is not ATR")
+
+    t0 = raw[1]
+    hist_len = t0 & 0xF
+
+    interface = []
+    protocols = []
+    tck_present = False
+
+    ptr = 2
+    td = t0
+
+    while True:
+        level = []
+        for mask in (0x10, 0x20, 0x40, 0x80):
+            if td & mask:
+                if ptr >= atr_len:
+                    raise Iso7816Exception("Wrong ATR: interface bytes are truncated")
+                level.append(raw[ptr])
+                ptr += 1
+            else:
+                level.append(None)
+
+        interface.append(tuple(level))
+
+        td = level[3]
+        if td is None:
+            break
+
+        protocol = td & 0xF
+        if protocol not in protocols and protocol != 0xF:
+            protocols.append(protocol)
+        if protocol != 0:
+            tck_present = True
+
+    if ptr + hist_len > atr_len:
+        raise Iso7816Exception("Wrong ATR: historical bytes are truncated")
+
+    historical = raw[ptr:ptr + hist_len]
+    ptr += hist_len
+
+    tck = tck_valid = None
+    if tck_present:
+        if ptr < atr_len:
+            tck = raw[ptr]
+            tck_valid = functools.reduce(int.__xor__, raw[1:ptr + 1]) == 0
+        else:
+            tck_valid = False                                   # TCK is required but absent
+
+    ta1, _, tc1, _ = interface[0]
+    if ta1 is None:
+        ta1 = DEFAULT_TA1
+
+    ifsc = DEFAULT_IFSC
+    for index in range(2, len(interface)):                      # The first TAi (i > 2) after TD for T=1
+        if interface[index - 1][3] & 0xF == 1 and interface[index][0] is not None:
+            ifsc = interface[index][0]
+            break
+
+    return Atr(raw=raw,
+               ts=raw[0],
+               t0=t0,
+               interface=tuple(interface),
+               protocols=tuple(protocols) or (0,),
+               historical=historical,
+               tck=tck,
+               tck_valid=tck_valid,
+               fi=FI_TABLE[ta1 >> 4],
+               di=DI_TABLE[ta1 & 0xF],
+               f_max=F_MAX_TABLE[ta1 >> 4],
+               guard_time=tc1 or 0,
+               ifsc=ifsc)
+
+
+def render_atr(atr):
+    """
+    Human-readable description of ATR
+    :param atr:     Atr or raw ATR
+    :return:        str
+    """
+    if not isinstance(atr, Atr):
+        atr = parse_atr(atr)
+
+    lines = ["Analyze ATR: {}".format(atr.raw.hex(' ').upper()), '',
+             "TS  = {:>5X} -> {}".format(atr.ts, constants.DSC_ATR['TS'][atr.ts]),
+             "T0  = {:>5X} -> K = {}".format(atr.t0, atr.t0 & 0xF)]
+
+    protocol = None                                             # Protocol of current level, None - global
+
+    for index, (ta, tb, tc, td) in enumerate(atr.interface, 1):
+        if ta is not None:
+            if index == 1:
+                lines.append("TA1 = {:>5X} ->".format(ta))
+                lines.append("{:>16}Fi = {}, f max = {} MHz".format(' ', atr.fi or 'RFU', atr.f_max or 'RFU'))
+                lines.append("{:>16}Di = {}".format(' ', atr.di or 'RFU'))
+            elif index == 2:
+                lines.append("TA2 = {:>5X} -> Specific mode, T = {}".format(ta, ta & 0xF))
+            elif protocol == 1:
+                lines.append("TA{} = {:>5X} -> IFSC = {}".format(index, ta, ta))
+            else:
+                lines.append("TA{} = {:>5X}".format(index, ta))
+
+        if tb is not None:
+            if index == 1:
+                lines.append("TB1 = {:>5X} ->".format(tb))
+                lines.append("{:>16}II = {}".format(' ', (tb & 0x60) >> 5))
+                lines.append("{:>16}Pi = {}".format(' ', tb & 0x1F))
+            elif protocol == 1:
+                lines.append("TB{} = {:>5X} -> BWI = {}, CWI = {}".format(index, tb, tb >> 4, tb & 0xF))
+            else:
+                lines.append("TB{} = {:>5X}".format(index, tb))
+
+        if tc is not None:
+            if index == 1:
+                lines.append("TC1 = {:>5X} -> Extra guard time".format(tc))
+            elif index == 2:
+                lines.append("TC2 = {:>5X} -> Waiting time integer WI".format(tc))
+            elif protocol == 1:
+                lines.append("TC{} = {:>5X} -> Error detection code: {}".format(index, tc, 'CRC' if tc & 1 else 'LRC'))
+            else:
+                lines.append("TC{} = {:>5X}".format(index, tc))
+
+        if td is not None:
+            protocol = td & 0xF
+            lines.append("TD{} = {:>5X} ->".format(index, td))
+            lines.append("{:>16}T = {} - {}".format(' ', protocol, constants.DSC_ATR['T'][protocol]))
+
+    lines.append('')
+    lines.append("H Bytes: {}".format(atr.historical.hex(' ').upper()))
+    lines.extend(render_historical(atr.historical_info))
+
+    if atr.tck is not None:
+        lines.append("TCK = {:>5X} -> {}".format(atr.tck, 'valid' if atr.tck_valid else 'invalid'))
+
+    return '\n'.join(lines)
+
+
+def render_historical(hb):
+    """
+    Human-readable description of historical bytes
+    :param hb:      HistoricalBytes
+    :return:        list of lines
+    """
+    if hb.category is None:
+        return []
+
+    if hb.category == 0x10:
+        return ["{:>8}Category = 10 -> DIR data reference = {}".format(' ', hb.dir_reference)]
+
+    if hb.category not in (0x00, 0x80):
+        return ["{:>8}Category = {:02X} -> Proprietary format".format(' ', hb.category)]
+
+    lines = ["{:>8}Category = {:02X} -> Compact-TLV{}".format(' ', hb.category,
+                                                            '' if hb.valid else ' (broken)')]
+
+    for tag, value in hb.objects:
+        lines.append("{:>8}{:X}{:X} {} -> {}".format(' ', tag, len(value), value.hex(' ').upper(),
+                                                    COMPACT_TLV_TAGS.get(tag, 'Unknown')))
+
+    if hb.lcs is not None:
+        lines.append("{:>8}Life cycle status = {:02X}".format(' ', hb.lcs))
+
+    if hb.sw is not None:
+        lines.append("{:>8}SW = {:04X}".format(' ', hb.sw))
+
+    if hb.command_chaining is not None:
+        lines.append("{:>8}Command chaining = {}, extended Lc/Le = {}, logical channels = {}".format(
+            ' ', hb.command_chaining, hb.extended_length, hb.logical_channels))
+
+    return lines
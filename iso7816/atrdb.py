@@ -0,0 +1,236 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Identification of cards by ATR, database in format of smartcard_list.txt (pcsc-tools):
+
+    3B 02 14 50                             <- ATR, '.' - any hex digit
+    <TAB>Schlumberger Multiflex 3k          <- description(s), lines start with TAB
+    3B 8F 80 01 80 4F 0C A0 00 00 03 06 .. 00 .. 00 00 00 00 ..
+    <TAB>Mifare card
+
+    db = AtrDatabase.load('/usr/share/pcsc/smartcard_list.txt')   # compiled index is cached on disk
+    db.identify('3B 02 14 50')                                    # ['Schlumberger Multiflex 3k']
+
+Patterns with wildcards of bytes/nibbles are compiled to value/mask and bucketed by length, TS and T0,
+other regular expressions are matched one by one
+"""
+
+__author__ = 'lem'
+
+import os
+import re
+import marshal
+import functools
+
+from iso7816.atr import to_bytes
+from iso7816.exceptions import Iso7816Exception
+
+
+DEFAULT_ATR_LIST = '/usr/share/pcsc/smartcard_list.txt'
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'iso7816')
+
+INDEX_VERSION = 1
+
+_MASK_PATTERN = re.compile(r'[0-9A-F.]{2}( [0-9A-F.]{2})*')
+
+
+class AtrDatabase:
+    """
+    Index of ATR patterns
+    """
+
+    def __init__(self):
+        self.__exact = {}                                       # {ATR: (description, ...)}
+        self.__masked = {}                                      # {(length, TS, T0): [(value, mask, descriptions)]}
+                                                                # {length: [...]} if TS or T0 is masked
+        self.__regex = []                                       # [(pattern, descriptions)]
+        self.__compiled = {}                                    # {pattern: compiled regex}
+        self.__count = 0
+
+    def __len__(self):
+        return self.__count
+
+    def add(self, pattern, descriptions):
+        """
+        Add pattern of ATR
+        :param pattern:         '3B 02 14 50', '3B .. 13 .F ..' or regular expression for hex string of ATR
+        :param descriptions:    str or list of str
+        """
+        if isinstance(descriptions, str):
+            descriptions = [descriptions]
+        descriptions = tuple(descriptions)
+
+        pattern = ' '.join(pattern.upper().split())
+        self.__count += 1
+
+        if not _MASK_PATTERN.fullmatch(pattern):
+            self.__regex.append((pattern, descriptions))
+            return
+
+        hex_digits = pattern.replace(' ', '')
+        length = len(hex_digits) // 2
+
+        if '.' not in hex_digits:
+            atr = bytes.fromhex(hex_digits)
+            self.__exact[atr] = self.__exact.get(atr, ()) + descriptions
+            return
+
+        value = int(hex_digits.replace('.', '0'), 16)
+        mask = int(''.join('0' if digit == '.' else 'F' for digit in hex_digits), 16)
+
+        if '.' in hex_digits[:4]:
+            key = length
+        else:
+            key = (length, int(hex_digits[:2], 16), int(hex_digits[2:4], 16))
+
+        self.__masked.setdefault(key, []).append((value, mask, descriptions))
+
+    def parse(self, lines):
+        """
+        Add patterns from lines of smartcard_list.txt
+        :param lines:   iterable of str
+        """
+        pattern = None
+        descriptions = []
+
+        for line in lines:
+            if not line.strip() or line.startswith('#'):
+                continue
+
+            if line[0] in ' \t':
+                if pattern is not None:
+                    descriptions.append(line.strip())
+                continue
+
+            if pattern is not None:
+                self.add(pattern, descriptions)
+
+            pattern = line.strip()
+            descriptions = []
+
+        if pattern is not None:
+            self.add(pattern, descriptions)
+
+    def identify(self, atr):
+        """
+        Descriptions of all patterns matching ATR
+        :param atr:     ATR - hex string, list of int, bytes or iso7816.atr.Atr
+        :return:        list of str, empty if card is unknown
+        """
+        atr = to_bytes(getattr(atr, 'raw', atr))
+        length = len(atr)
+
+        result = list(self.__exact.get(atr, ()))
+
+        if length >= 2:
+            value = int.from_bytes(atr, 'big')
+
+            for key in ((length, atr[0], atr[1]), length):
+                for pattern_value, pattern_mask, descriptions in self.__masked.get(key, ()):
+                    if value & pattern_mask == pattern_value:
+                        result.extend(descriptions)
+
+        if self.__regex:
+            atr_string = atr.hex(' ').upper()
+
+            for pattern, descriptions in self.__regex:
+                regex = self.__compiled.get(pattern)
+                if regex is None:
+                    try:
+                        regex = self.__compiled[pattern] = re.compile(pattern)
+
+                    except re.error:
+                        regex = self.__compiled[pattern] = re.compile(re.escape(pattern))
+
+                if regex.fullmatch(atr_string):
+                    result.extend(descriptions)
+
+        return result
+
+    def save(self, filename, source_stat=None):
+        """
+        Write compiled index
+        :param filename:        path of index file
+        :param source_stat:     os.stat_result of source database, it is checked by 'load'
+        """
+        source = (source_stat.st_size, source_stat.st_mtime_ns) if source_stat is not None else None
+        data = marshal.dumps((INDEX_VERSION, source, self.__count, self.__exact, self.__masked, self.__regex))
+
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+
+        temp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(temp_filename, 'wb') as f:
+            f.write(data)
+        os.replace(temp_filename, filename)
+
+    def __load_index(self, filename, source_stat):
+        """
+        :return: True if index is loaded
+        """
+        try:
+            with open(filename, 'rb') as f:
+                version, source, count, exact, masked, regex = marshal.loads(f.read())
+
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+
+        if version != INDEX_VERSION or source != (source_stat.st_size, source_stat.st_mtime_ns):
+            return False
+
+        self.__count, self.__exact, self.__masked, self.__regex = count, exact, masked, regex
+        return True
+
+    @classmethod
+    def load(cls, filename=DEFAULT_ATR_LIST, cache=True):
+        """
+        Load database of smartcard_list.txt format
+        :param filename:    path to database
+        :param cache:       True - compiled index is stored in DEFAULT_CACHE_DIR,
+                            path of index file or False - don't use index file
+        :return:            AtrDatabase
+        """
+        try:
+            source_stat = os.stat(filename)
+
+        except OSError:
+            raise Iso7816Exception("Can't find ATR database '{}'".format(filename))
+
+        if cache is True:
+            cache = os.path.join(DEFAULT_CACHE_DIR, os.path.basename(filename) + '.idx')
+
+        database = cls()
+
+        if cache and database.__load_index(cache, source_stat):
+            return database
+
+        with open(filename, encoding='utf-8', errors='replace') as f:
+            database.parse(f)
+
+        if cache:
+            try:
+                database.save(cache, source_stat)
+
+            except OSError:                                     # Index is optional
+                pass
+
+        return database
+
+
+@functools.lru_cache(maxsize=None)
+def default_database():
+    """
+    Database of DEFAULT_ATR_LIST, loaded once
+    :return: AtrDatabase
+    """
+    return AtrDatabase.load(DEFAULT_ATR_LIST)
+
+
+def identify(atr):
+    """
+    Descriptions of card from default database
+    :param atr:     ATR - hex string, list of int, bytes or iso7816.atr.Atr
+    :return:        list of str
+    """
+    return default_database().identify(atr)
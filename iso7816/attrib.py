@@ -0,0 +1,101 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Types of reader's attributes (constants.ATTRIB_SMART_CARD) and decoding of raw values
+
+    decode_attrib('VENDOR_IFD_VERSION', b'\\x10\\x00\\x02\\x01')     # (1, 2, 16)
+"""
+
+__author__ = 'lem'
+
+
+TYPE_DWORD = 'dword'                                            # int, little endian
+TYPE_BYTE = 'byte'                                              # int of single byte
+TYPE_STRING = 'string'                                          # str without trailing zeros
+TYPE_VERSION = 'version'                                        # (major, minor, build) of 0xMMmmbbbb
+TYPE_CHANNEL = 'channel'                                        # (type, number) of 0xDDDDCCCC
+TYPE_BYTES = 'bytes'
+
+ATTRIB_TYPES = {
+    'ASYNC_PROTOCOL_TYPES':     TYPE_DWORD,
+    'ATR_STRING':               TYPE_BYTES,
+    'CHANNEL_ID':               TYPE_CHANNEL,
+    'CHARACTERISTICS':          TYPE_DWORD,
+    'CURRENT_BWT':              TYPE_DWORD,
+    'CURRENT_CLK':              TYPE_DWORD,
+    'CURRENT_CWT':              TYPE_DWORD,
+    'CURRENT_D':                TYPE_DWORD,
+    'CURRENT_EBC_ENCODING':     TYPE_DWORD,
+    'CURRENT_F':                TYPE_DWORD,
+    'CURRENT_IFSC':             TYPE_DWORD,
+    'CURRENT_IFSD':             TYPE_DWORD,
+    'CURRENT_IO_STATE':         TYPE_BYTES,
+    'CURRENT_N':                TYPE_DWORD,
+    'CURRENT_PROTOCOL_TYPE':    TYPE_DWORD,
+    'CURRENT_W':                TYPE_DWORD,
+    'DEFAULT_CLK':              TYPE_DWORD,
+    'DEFAULT_DATA_RATE':        TYPE_DWORD,
+    'DEVICE_FRIENDLY_NAME':     TYPE_STRING,
+    'DEVICE_IN_USE':            TYPE_DWORD,
+    'DEVICE_SYSTEM_NAME':       TYPE_STRING,
+    'DEVICE_UNIT':              TYPE_DWORD,
+    'ESC_AUTHREQUEST':          TYPE_BYTES,
+    'ESC_CANCEL':               TYPE_BYTES,
+    'ESC_RESET':                TYPE_BYTES,
+    'EXTENDED_BWT':             TYPE_DWORD,
+    'ICC_INTERFACE_STATUS':     TYPE_BYTE,
+    'ICC_PRESENCE':             TYPE_BYTE,
+    'ICC_TYPE_PER_ATR':         TYPE_BYTE,
+    'MAX_CLK':                  TYPE_DWORD,
+    'MAX_DATA_RATE':            TYPE_DWORD,
+    'MAX_IFSD':                 TYPE_DWORD,
+    'MAXINPUT':                 TYPE_DWORD,
+    'POWER_MGMT_SUPPORT':       TYPE_DWORD,
+    'SUPRESS_T1_IFS_REQUEST':   TYPE_DWORD,
+    'SYNC_PROTOCOL_TYPES':      TYPE_DWORD,
+    'USER_AUTH_INPUT_DEVICE':   TYPE_DWORD,
+    'USER_TO_CARD_AUTH_DEVICE': TYPE_DWORD,
+    'VENDOR_IFD_SERIAL_NO':     TYPE_STRING,
+    'VENDOR_IFD_TYPE':          TYPE_STRING,
+    'VENDOR_IFD_VERSION':       TYPE_VERSION,
+    'VENDOR_NAME':              TYPE_STRING,
+}
+
+# Attributes of reader which don't depend on the card, they are cached until reconnect
+STATIC_ATTRIBS = frozenset((
+    'ASYNC_PROTOCOL_TYPES', 'CHANNEL_ID', 'CHARACTERISTICS', 'DEFAULT_CLK', 'DEFAULT_DATA_RATE',
+    'DEVICE_FRIENDLY_NAME', 'DEVICE_SYSTEM_NAME', 'DEVICE_UNIT', 'MAX_CLK', 'MAX_DATA_RATE', 'MAX_IFSD',
+    'MAXINPUT', 'POWER_MGMT_SUPPORT', 'SYNC_PROTOCOL_TYPES', 'USER_AUTH_INPUT_DEVICE', 'USER_TO_CARD_AUTH_DEVICE',
+    'VENDOR_IFD_SERIAL_NO', 'VENDOR_IFD_TYPE', 'VENDOR_IFD_VERSION', 'VENDOR_NAME',
+))
+
+# Attributes of 'Iso7816.reader_snapshot', escape commands and reserved attributes are skipped
+SNAPSHOT_ATTRIBS = tuple(sorted(name for name in ATTRIB_TYPES
+                                if not name.startswith('ESC_') and name != 'DEVICE_IN_USE'))
+
+
+def decode_attrib(name, raw):
+    """
+    :param name:    name of attribute (key of constants.ATTRIB_SMART_CARD)
+    :param raw:     raw value (bytes)
+    :return:        typed value, bytes if type of attribute is unknown
+    """
+    attrib_type = ATTRIB_TYPES.get(name, TYPE_BYTES)
+
+    if attrib_type == TYPE_DWORD or attrib_type == TYPE_BYTE:
+        return int.from_bytes(raw, 'little')
+
+    if attrib_type == TYPE_STRING:
+        return bytes(raw).split(b'\x00', 1)[0].decode('latin-1')
+
+    if attrib_type == TYPE_VERSION:
+        value = int.from_bytes(raw, 'little')
+        return value >> 24, (value >> 16) & 0xFF, value & 0xFFFF
+
+    if attrib_type == TYPE_CHANNEL:
+        value = int.from_bytes(raw, 'little')
+        return value >> 16, value & 0xFFFF
+
+    return bytes(raw)
@@ -0,0 +1,243 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import ctypes
+
+from iso7816 import pcsc
+from iso7816 import constants
+from iso7816.pcsc import PCSC_LIB, DWORD, SCARDCONTEXT, SCARDHANDLE, ScardIORequest, ScardReaderState
+
+
+class Backend:
+    """
+    Interface of PC/SC functions used by Iso7816
+    Every function returns 'rv' of PC/SC (0 - success) and, if needed, output values in tuple
+    Handles of context and card are int
+    """
+
+    def establish_context(self, scope):
+        """
+        :return: rv, context
+        """
+        raise NotImplementedError
+
+    def release_context(self, context):
+        """
+        :return: rv
+        """
+        raise NotImplementedError
+
+    def list_readers(self, context):
+        """
+        :return: rv, list of names of readers
+        """
+        raise NotImplementedError
+
+    def connect(self, context, reader, mode, protocol):
+        """
+        :return: rv, card, active protocol
+        """
+        raise NotImplementedError
+
+    def reconnect(self, card, mode, protocol, initialization):
+        """
+        :return: rv, active protocol
+        """
+        raise NotImplementedError
+
+    def disconnect(self, card, disposition):
+        """
+        :return: rv
+        """
+        raise NotImplementedError
+
+    def status(self, card):
+        """
+        :return: rv, ATR (bytes), active protocol
+        """
+        raise NotImplementedError
+
+    def transmit(self, card, pci, apdu, apdu_len, rx_buffer, rx_len):
+        """
+        :param pci:         ScardIORequest
+        :param apdu:        bytes or ctypes array of C-APDU
+        :param apdu_len:    length of C-APDU
+        :param rx_buffer:   ctypes array which receives R-APDU
+        :param rx_len:      iso7816.pcsc.DWORD - size of 'rx_buffer' on input, length of R-APDU on output
+        :return:            rv
+        """
+        raise NotImplementedError
+
+    def begin_transaction(self, card):
+        """
+        :return: rv
+        """
+        raise NotImplementedError
+
+    def end_transaction(self, card, disposition):
+        """
+        :return: rv
+        """
+        raise NotImplementedError
+
+    def get_status_change(self, context, timeout, reader_states):
+        """
+        :param reader_states:   ctypes array of ScardReaderState, 'dwEventState', 'cbAtr', 'rgbAtr' are updated
+        :return:                rv
+        """
+        raise NotImplementedError
+
+    def cancel(self, context):
+        """
+        :return: rv
+        """
+        raise NotImplementedError
+
+    def get_attrib(self, card, attrib, buffer=None):
+        """
+        :param buffer:      ctypes array reused for value, if it is too small - size is requested from library
+        :return:            rv, raw value of attribute (bytes)
+        """
+        raise NotImplementedError
+
+    def control(self, card, control_code, data, response_size):
+        """
+        :param control_code:    code of reader's command (SCardControl)
+        :param data:            bytes sent to reader
+        :param response_size:   maximum size of response
+        :return:                rv, response (bytes)
+        """
+        raise NotImplementedError
+
+
+class PcscBackend(Backend):
+    """
+    Backend of PC/SC library called by ctypes
+    Functions of library are loaded once per process (iso7816.pcsc.load) and bound to the object
+    """
+
+    def __init__(self, path_to_lib=PCSC_LIB):
+        self.lib = pcsc.load(path_to_lib)
+
+        self.__transmit = self.lib.SCardTransmit
+        self.__status = self.lib.SCardStatus
+        self.__get_attrib = self.lib.SCardGetAttrib
+        self.__get_status_change = self.lib.SCardGetStatusChange
+
+    def establish_context(self, scope):
+        context = SCARDCONTEXT()
+        rv = self.lib.SCardEstablishContext(scope, None, None, ctypes.byref(context))
+        return rv, context.value
+
+    def release_context(self, context):
+        return self.lib.SCardReleaseContext(context)
+
+    def list_readers(self, context):
+        n_multistrings = DWORD()
+
+        rv = self.lib.SCardListReaders(context, None, None, ctypes.byref(n_multistrings))
+        if rv:
+            return rv, []
+
+        readers = ctypes.create_string_buffer(n_multistrings.value)
+
+        rv = self.lib.SCardListReaders(context, None, readers, ctypes.byref(n_multistrings))
+        if rv:
+            return rv, []
+
+        return rv, list(filter(None, readers.raw.decode().split('\x00')))
+
+    def connect(self, context, reader, mode, protocol):
+        card = SCARDHANDLE()
+        active_protocol = DWORD()
+
+        rv = self.lib.SCardConnect(context,
+                                   reader.encode(),
+                                   mode,
+                                   protocol,
+                                   ctypes.byref(card),
+                                   ctypes.byref(active_protocol))
+
+        return rv, card.value, active_protocol.value
+
+    def reconnect(self, card, mode, protocol, initialization):
+        active_protocol = DWORD()
+
+        rv = self.lib.SCardReconnect(card, mode, protocol, initialization, ctypes.byref(active_protocol))
+
+        return rv, active_protocol.value
+
+    def disconnect(self, card, disposition):
+        return self.lib.SCardDisconnect(card, disposition)
+
+    def status(self, card):
+        reader_len = DWORD()
+        state_reader = DWORD()
+        protocol = DWORD()
+        atr = ctypes.create_string_buffer(pcsc.READER_STATE_ATR_SIZE)  # Current ATR of a card in this reader
+        atr_len = DWORD(ctypes.sizeof(atr))                         # Length of ATR
+
+        rv = self.__status(card,
+                           None,
+                           ctypes.byref(reader_len),
+                           ctypes.byref(state_reader),
+                           ctypes.byref(protocol),
+                           atr,
+                           ctypes.byref(atr_len))
+
+        return rv, atr.raw[:atr_len.value] if not rv else b'', protocol.value
+
+    def transmit(self, card, pci, apdu, apdu_len, rx_buffer, rx_len):
+        return self.__transmit(card,
+                               ctypes.byref(pci),
+                               apdu,
+                               apdu_len,
+                               None,
+                               rx_buffer,
+                               ctypes.byref(rx_len))
+
+    def begin_transaction(self, card):
+        return self.lib.SCardBeginTransaction(card)
+
+    def end_transaction(self, card, disposition):
+        return self.lib.SCardEndTransaction(card, disposition)
+
+    def get_status_change(self, context, timeout, reader_states):
+        return self.__get_status_change(context, timeout, reader_states, len(reader_states))
+
+    def cancel(self, context):
+        return self.lib.SCardCancel(context)
+
+    def get_attrib(self, card, attrib, buffer=None):
+        attr_len = DWORD()                                          # Length of the pbAttr buffer in bytes and
+                                                                    # receives the actual length of the received attribute
+
+        if buffer is not None:                                      # One call if buffer is big enough
+            attr_len.value = ctypes.sizeof(buffer)
+            rv = self.__get_attrib(card, attrib, buffer, ctypes.byref(attr_len))
+            if rv != constants.SCARD_E_INSUFFICIENT_BUFFER:
+                return rv, buffer.raw[:attr_len.value] if not rv else b''
+
+        rv = self.__get_attrib(card, attrib, None, ctypes.byref(attr_len))
+        if rv:
+            return rv, b''
+
+        raw_attrib = ctypes.create_string_buffer(attr_len.value)
+
+        rv = self.__get_attrib(card, attrib, raw_attrib, ctypes.byref(attr_len))
+        if rv:
+            return rv, b''
+
+        return rv, raw_attrib.raw[:attr_len.value]
+
+    def control(self, card, control_code, data, response_size):
+        response = ctypes.create_string_buffer(response_size)
+        response_len = DWORD()
+
+        rv = self.lib.SCardControl(card, control_code, data, len(data), response, response_size,
+                                   ctypes.byref(response_len))
+
+        return rv, response.raw[:response_len.value] if not rv else b''
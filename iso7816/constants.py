@@ -7,8 +7,14 @@
 # https://pcsclite.apdu.fr/api/group__ErrorCodes.html
 
 MAX_ATR_SIZE            = 33                # Maximum ATR size
+MAX_BUFFER_SIZE         = 264               # Maximum Tx/Rx Buffer for short APDU
+MAX_BUFFER_SIZE_EXTENDED = 65548          # Maximum Tx/Rx Buffer for extended APDU (4 + 3 + 65536 + 3 + 2)
+MAX_CHAIN_COMMANDS      = 128               # Maximum GET RESPONSE / Le-corrected commands for one C-APDU
 
+SCARD_LEAVE_CARD        = 0x0000            # Do nothing on close
+SCARD_RESET_CARD        = 0x0001            # Reset on close
 SCARD_UNPOWER_CARD      = 0x0002            # Power down on close
+SCARD_EJECT_CARD        = 0x0003            # Eject on close
 
 SCARD_SCOPE_USER        = 0x0000            # Scope in user space
 SCARD_SCOPE_TERMINAL    = 0x0001            # Scope in terminal
@@ -19,18 +25,36 @@ SCARD_PROTOCOL_T0       = 0x0001            # T=0 active protocol.
 SCARD_PROTOCOL_T1       = 0x0002            # T=1 active protocol.
 SCARD_PROTOCOL_RAW      = 0x0004            # Raw active protocol
 
+SCARD_STATE_UNAWARE     = 0x0000            # App wants status
+SCARD_STATE_IGNORE      = 0x0001            # Ignore this reader
+SCARD_STATE_CHANGED     = 0x0002            # State has changed
+SCARD_STATE_UNKNOWN     = 0x0004            # Reader unknown
+SCARD_STATE_UNAVAILABLE = 0x0008            # Status unavailable
+SCARD_STATE_EMPTY       = 0x0010            # Card removed
+SCARD_STATE_PRESENT     = 0x0020            # Card inserted
+SCARD_STATE_ATRMATCH    = 0x0040            # ATR matches card
+SCARD_STATE_EXCLUSIVE   = 0x0080            # Exclusive Mode
+SCARD_STATE_INUSE       = 0x0100            # Shared Mode
+SCARD_STATE_MUTE        = 0x0200            # Unresponsive card
+SCARD_STATE_UNPOWERED   = 0x0400            # Unpowered card
+
+INFINITE                = 0xFFFFFFFF        # Infinite timeout
+PNP_NOTIFICATION        = "\\\\?PnP?\\Notification"    # Pseudo reader to detect new readers
+
 SCARD_SHARE_EXCLUSIVE   = 0x0001            # This application will NOT allow others to share the reader
 SCARD_SHARE_SHARED      = 0x0002            # This application will allow others to share the reader
 SCARD_SHARE_DIRECT      = 0x0003            # Direct control of the reader, even without a card
 
 # Define Error
 SCARD_F_INTERNAL_ERROR          = 0x80100001        # An internal consistency check failed
+SCARD_E_CANCELLED               = 0x80100002        # The action was cancelled by an SCardCancel request
 SCARD_E_INVALID_HANDLE          = 0x80100003        # The supplied handle was invalid
 SCARD_E_INVALID_PARAMETER       = 0x80100004        # One or more of the supplied parameters
                                                     # could not be properly interpreted
 SCARD_E_NO_MEMORY               = 0x80100006        # Not enough memory available to complete this command
 SCARD_E_INSUFFICIENT_BUFFER     = 0x80100008        #
 SCARD_E_UNKNOWN_READER          = 0x80100009        # The specified reader name is not recognized
+SCARD_E_TIMEOUT                 = 0x8010000A        # The user-specified timeout value has expired
 SCARD_E_SHARING_VIOLATION       = 0x8010000B        # The smart card cannot be accessed because of
                                                     # other connections outstanding
 SCARD_E_NO_SMARTCARD            = 0x8010000C        # The operation requires a Smart Card,
@@ -40,6 +64,7 @@ SCARD_E_PROTO_MISMATCH          = 0x8010000F        # The requested protocols ar
 SCARD_E_INVALID_VALUE           = 0x80100011        # One or more of the supplied parameters values
                                                     # could not be properly interpreted
 SCARD_F_COMM_ERROR              = 0x80100013        # An internal communications error has been detected
+SCARD_E_NOT_TRANSACTED          = 0x80100016        # An attempt was made to end a non-existent transaction
 SCARD_E_READER_UNAVAILABLE      = 0x80100017        # The specified reader is not currently available for use
 SCARD_E_NO_SERVICE              = 0x8010001D        # The Smart card resource manager is not running
 SCARD_E_UNSUPPORTED_FEATURE     = 0x8010001F        # This smart card does not support the requested feature
@@ -47,26 +72,34 @@ SCARD_E_NO_READERS_AVAILABLE    = 0x8010002E        # Cannot find a smart card r
 SCARD_W_UNRESPONSIVE_CARD       = 0x80100066        # The smart card is not responding to a reset
 SCARD_W_UNPOWERED_CARD          = 0x80100067        # Power has been removed from the smart card,
                                                     # so that further communication is not possible
+SCARD_W_RESET_CARD              = 0x80100068        # The smart card has been reset,
+                                                    # so any shared state information is invalid
+SCARD_W_REMOVED_CARD            = 0x80100069        # The smart card has been removed,
+                                                    # so further communication is not possible
 
 
 DSC_ERROR = {
     0x80100001: "An internal consistency check failed",
+    0x80100002: "The action was cancelled by an SCardCancel request",
     0x80100003: "The supplied handle was invalid",
     0x80100004: "One or more of the supplied parameters could not be properly interpreted",
     0x80100006: "Not enough memory available to complete this command",
     0x80100008: "The data buffer to receive returned data is too small for the returned data",
     0x80100009: "The specified reader name is not recognized",
+    0x8010000A: "The user-specified timeout value has expired",
     0x8010000B: "The smart card cannot be accessed because of other connections outstanding",
     0x8010000C: "The operation requires a Smart Card, but no Smart Card is currently in the device",
     0x8010000F: "The requested protocols are incompatible with the protocol currently in use with the smart card",
     0x80100011: "One or more of the supplied parameters values could not be properly interpreted",
     0x80100013: "An internal communications error has been detected",
+    0x80100016: "An attempt was made to end a non-existent transaction",
     0x80100017: "The specified reader is not currently available for use",
     0x8010001D: "The Smart card resource manager is not running",
     0x8010001F: "This smart card does not support the requested feature",
     0x8010002E: "Cannot find a smart card reader",
     0x80100066: "The smart card is not responding to a reset",
     0x80100067: "Power has been removed from the smart card, so that further communication is not possible",
+    0x80100068: "The smart card has been reset, so any shared state information is invalid",
     0x80100069: "The smart card has been removed, so further communication is not possible"
             }
 
@@ -211,5 +244,5 @@ ATTRIB_SMART_CARD = {
                                                                 # MM = major version,
                                                                 # mm = minor version, and
                                                                 # bbbb = build number
-                        'VENDOR_NAME':              0x40131
+                        'VENDOR_NAME':              0x10100
                     }
@@ -0,0 +1,134 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Reference-counted PC/SC contexts shared by Iso7816 objects
+
+SCardEstablishContext is a round-trip to the PC/SC service, so Iso7816 objects of one thread attach to
+the same context of the same backend. The context is released (SCardReleaseContext) when the last object
+is closed:
+
+    context = acquire(backend)              # SCardEstablishContext or the existing context of thread
+    ...context.handle...
+    release(context)                        # SCardReleaseContext if it was the last reference
+"""
+
+__author__ = 'lem'
+
+import threading
+
+from iso7816 import constants
+from iso7816.backend import PcscBackend
+from iso7816.exceptions import Iso7816Exception
+
+
+_lock = threading.Lock()
+_backends = {}                                                  # {path_to_lib: PcscBackend}
+_shared = {}                                                    # {(backend, scope): SharedContext} of process
+_local = threading.local()                                      # .shared - the same dict for current thread
+
+
+class SharedContext:
+    """
+    PC/SC context with counter of references
+    """
+
+    def __init__(self, backend, scope=constants.SCARD_SCOPE_SYSTEM):
+        """
+        :param backend:     iso7816.backend.Backend
+        :param scope:       scope of context
+        """
+        rv, handle = backend.establish_context(scope)
+
+        if rv:
+            raise Iso7816Exception("[initialization]", rv)
+
+        self.backend = backend
+        self.scope = scope
+        self.handle = handle                                    # SCARDCONTEXT
+        self.refs = 1
+
+    @property
+    def released(self):
+        return self.refs == 0
+
+
+def get_backend(path_to_lib):
+    """
+    PcscBackend shared by all objects of process
+    :param path_to_lib:     path to PC/SC library
+    :return:                PcscBackend
+    """
+    with _lock:
+        backend = _backends.get(path_to_lib)
+
+        if backend is None:
+            backend = _backends[path_to_lib] = PcscBackend(path_to_lib)
+
+        return backend
+
+
+def acquire(backend, scope=constants.SCARD_SCOPE_SYSTEM, per_thread=True):
+    """
+    Take reference to shared context, the context is established on the first call
+    :param backend:     iso7816.backend.Backend
+    :param scope:       scope of context
+    :param per_thread:  if True - context is shared by objects of current thread only
+                        (PC/SC library serializes calls of one context)
+                        if False - context is shared by all threads of process
+    :return:            SharedContext
+    """
+    if per_thread:
+        contexts = getattr(_local, 'shared', None)
+        if contexts is None:
+            contexts = _local.shared = {}
+    else:
+        contexts = _shared
+
+    key = (backend, scope)
+
+    with _lock:
+        context = contexts.get(key)
+
+        if context is not None and not context.released:
+            context.refs += 1
+            return context
+
+    context = SharedContext(backend, scope)
+
+    with _lock:
+        existing = contexts.get(key)
+
+        if existing is not None and not existing.released:     # Established by another thread meanwhile
+            existing.refs += 1
+            redundant, context = context, existing
+        else:
+            contexts[key] = context
+            redundant = None
+
+    if redundant is not None:
+        backend.release_context(redundant.handle)
+
+    return context
+
+
+def release(context):
+    """
+    Drop reference to context, SCardReleaseContext is called for the last reference
+    :param context:     SharedContext
+    :return:            rv of SCardReleaseContext, 0 if context is still used
+    """
+    with _lock:
+        if context.released:
+            return 0
+
+        context.refs -= 1
+
+        if not context.released:
+            return 0
+
+        if _shared.get((context.backend, context.scope)) is context:
+            del _shared[(context.backend, context.scope)]
+
+    return context.backend.release_context(context.handle)
@@ -5,100 +5,85 @@
 __author__ = 'lem'
 
 import ctypes
-import struct
-import logging
+import contextlib
+import time
 
+from iso7816 import trace
+from iso7816 import context
 from iso7816 import constants
+from iso7816.apdu import expected_length
+from iso7816.apdu import set_le
+from iso7816.apdu import validate_byte
+from iso7816.atr import parse_atr, render_atr
+from iso7816.attrib import decode_attrib, STATIC_ATTRIBS, SNAPSHOT_ATTRIBS
+from iso7816.backend import PCSC_LIB, ScardIORequest, ScardReaderState, DWORD
+from iso7816.exceptions import Iso7816Exception, pcsc_error
 
 
-PCSC_LIB = "/lib/x86_64-linux-gnu/libpcsclite.so.1"
-
-
-class Iso7816Exception(Exception):
-    """
-    The base class for iso7816 exception
-    """
-
-    def __init__(self, msg='Iso7816 Exception', error=None):
-        self.msg = msg
-        if error:
-            self.error = error & 0xFFFFFFFF
-            try:
-                self.msg = constants.DSC_ERROR[self.error] + ' ' + self.msg
+class Iso7816:
 
-            except KeyError:
-                logging.info("Error = {:x} - Unknown error code : {}".format(self.error, self.msg))
+    def __init__(self, path_to_lib=PCSC_LIB, backend=None, shared_context=True):
+        """
+        :param path_to_lib:     path to PC/SC library, used if 'backend' is None
+        :param backend:         iso7816.backend.Backend (e.g. iso7816.simulator.SimulatedBackend)
+                                if None - PcscBackend of 'path_to_lib' shared by process
+        :param shared_context:  if True - PC/SC context is shared with other objects of this thread
+                                (see iso7816.context), if False - the object has own context
+        """
+        self.backend = backend if backend is not None else context.get_backend(path_to_lib)
 
-            else:
-                logging.info("Error = {:x} - {}".format(self.error, self.msg))
+        if shared_context:
+            self.__context = context.acquire(self.backend, constants.SCARD_SCOPE_SYSTEM)
         else:
-            logging.info(self.msg)
-
+            self.__context = context.SharedContext(self.backend, constants.SCARD_SCOPE_SYSTEM)
 
+        self.rv = 0
+        self.hwnd_app_context = self.__context.handle
 
-class ScardIORequest(ctypes.Structure):
-    """
-    This class need to compatibility to direct call function form "libpcslite: lib
-    """
-    _fields_ = [('dwProtocol', ctypes.c_long),
-                ('cbPciLength', ctypes.c_long)]
+        self.hwnd_reader = None                                 # Handle of connection
+        self.protocol = None                                    # Established protocol in connection
+                                                                # Typical value: T0/T1/RAW
 
+        self.reader = None                                      # Parameters of the last 'connect'
+        self.mode = None
+        self.disposition = constants.SCARD_UNPOWER_CARD         # Action with the card in 'close'
 
-class Iso7816:
+                                                                # Buffers reused by every 'transmit' call
+                                                                # of this connection
+        self.__pio_send_pci = ScardIORequest()                  # Protocol Control Information
+        self.__rx_apdu = ctypes.create_string_buffer(constants.MAX_BUFFER_SIZE)
+        self.__rx_apdu_view = memoryview(self.__rx_apdu).cast('B')
+        self.__rx_apdu_len = DWORD()
 
-    def __init__(self, path_to_lib=PCSC_LIB):
-        try:
-            self.pcsc_lib = ctypes.CDLL(path_to_lib)
+        self.chain_stats = None                                 # Statistic of the last 'transmit_chain'
+        self.__transaction_depth = 0                            # Level of nested 'transaction'
+        self.recorder = None                                    # iso7816.record.Recorder of APDU
 
-        except OSError:
-            print("\nCan't find '{}'".format(path_to_lib))
-            exit(0)
-
-        else:
-            self.hwnd_app_context = ctypes.c_long()  # Application Context
-
-            self.rv = self.pcsc_lib.SCardEstablishContext(constants.SCARD_SCOPE_SYSTEM,
-                                                     None,
-                                                     None,
-                                                     ctypes.byref(self.hwnd_app_context))
-
-            # error_code = rv & 0xFFFFFFFF
-            error_msg = "[initialization]"
-
-            # if error_code:
-            if self.rv:
-                # try:
-                #
-                #     error_msg += constants.DSC_ERROR[error_code]
-                #
-                # except KeyError:
-                #     raise Iso7816Exception(error_msg + "Unknown error code: {:X}".format(error_code))
-                #
-                # else:
-                #     raise Iso7816Exception(error_msg, error_code)
-                    raise Iso7816Exception(error_msg, self.rv)
+        self.__attrib_buffer = ctypes.create_string_buffer(constants.MAX_BUFFER_SIZE)
+        self.__static_attribs = {}                              # {name: value} cached until reconnect
 
-            else:
-                                                                # '__hwnd_reader' and '__protocol'
-                                                                # used to communicate to C-library
-                self.__hwnd_reader = ctypes.c_long()
-                self.__protocol = ctypes.c_long()               # Established protocol in connection
-                                                                # Typical value: T0/T1/RAW
+    def __del__(self):
+        if getattr(self, '_Iso7816__context', None) is not None:
+            self.close()
 
-                                                                # 'hwnd_reader' and 'protocol'
-                                                                # used to communicate in application in Python
-                self.hwnd_reader = None
-                self.protocol = None
+    def __enter__(self):
+        return self
 
-                logging.basicConfig(format=u'[%(asctime)s]  %(message)s',
-                                    filename="iso7816.log",
-                                    level=logging.INFO)
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
-    def __del__(self):
-        rv = self.pcsc_lib.SCardDisconnect(self.hwnd_reader, constants.SCARD_UNPOWER_CARD)
+    def close(self, disposition=None):
+        """
+        Disconnect and release reference to PC/SC context, the object can't be used after 'close'
+        :param disposition:     action with the card, if None - 'disposition' of object
+        """
+        if self.hwnd_reader is not None:
+            self.disconnect(self.disposition if disposition is None else disposition)
 
+        if self.__context is not None:
+            shared, self.__context = self.__context, None
+            self.rv = context.release(shared)
 
-    # def __check_rv(self, rv, fun=" "):
     def __check_rv(self, fun=" "):
         """
         Check value of "rv"
@@ -109,53 +94,44 @@ class Iso7816:
         error_msg = '[' + fun + '] '
 
         if self.rv:
-            raise Iso7816Exception(error_msg, self.rv)
-
-    # def __check_sw(self, sw1, sw2):
-    #     """
-    #     Check status word
-    #     :param sw1:
-    #     :param sw2:
-    #     :return:
-    #     """
-    #     sw = (sw1 << 8) | sw2
-    #     # err_msg = ""
-    #
-    #     if (sw1 != 0x61) and (sw1 != 0x90):
-    #         try:
-    #             err_msg = '[' + constants.DSC_SW_ERROR[sw] + ']'
-    #
-    #         except KeyError:
-    #             logging.info("Unknown sw1={:02X} sw2={:02X}".format(sw1, sw2))
-    #             raise Iso7816Exception("Unknown error code: {:X}".format(sw), sw)
-    #
-    #         else:
-    #             logging.info("sw1={:02X} sw2={:02X}".format(sw1, sw2))
-    #             raise Iso7816Exception(err_msg + " {:X} ".format(sw), sw)
+            raise pcsc_error(error_msg, self.rv)
+
+    def __check_handle(self, fun=" "):
+        """
+        Raise PcscError of SCARD_E_INVALID_HANDLE if there is no connection ('connect' wasn't called or 'disconnect')
+        :param fun:         "name" of function, who call __check_handle
+        """
+        if self.hwnd_reader is None:
+            self.rv = constants.SCARD_E_INVALID_HANDLE
+            self.__check_rv(fun)
 
     def get_readers(self):
         """
         Returns a list of currently available readers on the system
         :return:
         """
-        n_multistrings = ctypes.c_int32()
-
-        # rv = self.pcsc_lib.SCardListReaders(self.hwnd_app_context, None, None, ctypes.byref(n_multistrings))
-        self.rv = self.pcsc_lib.SCardListReaders(self.hwnd_app_context, None, None, ctypes.byref(n_multistrings))
+        self.rv, available_readers = self.backend.list_readers(self.hwnd_app_context)
 
-        # self.__check_rv(rv, self.get_readers.__name__)
         self.__check_rv(self.get_readers.__name__)
 
-        readers = ctypes.create_string_buffer(n_multistrings.value)
+        return available_readers
 
-        self.rv = self.pcsc_lib.SCardListReaders(self.hwnd_app_context, None, readers, ctypes.byref(n_multistrings))
+    def get_status_change(self, reader_states, timeout=constants.INFINITE):
+        """
+        Block until the state of one of readers is changed (SCardGetStatusChange)
+        :param reader_states:   ctypes array of ScardReaderState, 'dwEventState' of each item is updated
+        :param timeout:         timeout in ms, constants.INFINITE - wait forever
+        :return:                True - state is changed
+                                False - timeout is expired or the request is cancelled by 'cancel'
+        """
+        self.rv = self.backend.get_status_change(self.hwnd_app_context, timeout, reader_states)
 
-        # self.__check_rv(rv, self.get_readers.__name__)
-        self.__check_rv(self.get_readers.__name__)
+        if (self.rv & 0xFFFFFFFF) in (constants.SCARD_E_TIMEOUT, constants.SCARD_E_CANCELLED):
+            return False
 
-        available_readers = list(filter(None, readers.raw.decode().split('\x00')))
+        self.__check_rv(self.get_status_change.__name__)
 
-        return available_readers
+        return True
 
     def connect(self,
                 reader=None,
@@ -168,346 +144,329 @@ class Iso7816:
         :param mode:        Mode of connection type
         :return:            Handle to this connection
         """
-        # rv = self.pcsc_lib.SCardConnect(self.hwnd_app_context,
-        self.rv = self.pcsc_lib.SCardConnect(self.hwnd_app_context,
-                                        reader.encode(),
-                                        mode,
-                                        protocol,
-                                        ctypes.byref(self.__hwnd_reader),
-                                        ctypes.byref(self.__protocol))
+        self.rv, hwnd_reader, active_protocol = self.backend.connect(self.hwnd_app_context,
+                                                                     reader,
+                                                                     mode,
+                                                                     protocol)
 
-        # self.__check_rv(rv, self.connect.__name__)
         self.__check_rv(self.connect.__name__)
 
-        self.hwnd_reader = self.__hwnd_reader.value
-        self.protocol = self.__protocol.value
+        self.hwnd_reader = hwnd_reader
+        self.protocol = active_protocol
+        self.reader = reader
+        self.mode = mode
+        self.__static_attribs.clear()
 
-    def disconnect(self):
-        rv = self.pcsc_lib.SCardDisconnect(self.hwnd_reader, constants.SCARD_UNPOWER_CARD)
+        self.__pio_send_pci.dwProtocol = self.protocol
+        self.__pio_send_pci.cbPciLength = ctypes.sizeof(ScardIORequest)
 
-    def get_atr(self):
+    def reconnect(self,
+                  mode=None,
+                  protocol=constants.SCARD_PROTOCOL_T0 | constants.SCARD_PROTOCOL_T1,
+                  initialization=constants.SCARD_RESET_CARD):
         """
-        Get ATR - Answer To Reset
-        :return: list of ATR
-
+        Re-establish existing connection without new SCardConnect (SCardReconnect)
+        :param mode:            Mode of connection type, if None - mode of 'connect'
+        :param protocol:        type of protocol T0/T1/RAW
+        :param initialization:  SCARD_LEAVE_CARD - keep the card as is
+                                SCARD_RESET_CARD - warm reset
+                                SCARD_UNPOWER_CARD - cold reset
         """
+        if mode is None:
+            mode = self.mode
 
-        reader_len = ctypes.c_long()
-        state_reader = ctypes.c_long()
-        atr = ctypes.create_string_buffer(constants.MAX_ATR_SIZE)   # Current ATR of a card in this reade
-        atr_len = ctypes.c_long(ctypes.sizeof(atr))                 # Length of ATR
+        self.__check_handle(self.reconnect.__name__)
 
-        # rv = self.pcsc_lib.SCardStatus(self.__hwnd_reader,
-        self.rv = self.pcsc_lib.SCardStatus(self.__hwnd_reader,
-                                       None,
-                                       ctypes.byref(reader_len),
-                                       ctypes.byref(state_reader),
-                                       ctypes.byref(self.__protocol),
-                                       atr,
-                                       ctypes.byref(atr_len))
+        self.rv, active_protocol = self.backend.reconnect(self.hwnd_reader, mode, protocol, initialization)
 
-        # self.__check_rv(rv, self.get_atr.__name__)
-        self.__check_rv(self.get_atr.__name__)
+        self.__check_rv(self.reconnect.__name__)
 
-        atr = list(struct.unpack('%dB' % atr_len.value, atr[:atr_len.value]))
+        self.protocol = active_protocol
+        self.mode = mode
+        self.__static_attribs.clear()
 
-        logging.info("ATR: " + " ".join("{:02X}".format(i) for i in atr))
+        self.__pio_send_pci.dwProtocol = self.protocol
 
-        return atr
+    def disconnect(self, disposition=constants.SCARD_UNPOWER_CARD):
+        """
+        Terminate connection
+        :param disposition:     SCARD_LEAVE_CARD - keep the card as is
+                                SCARD_RESET_CARD - warm reset
+                                SCARD_UNPOWER_CARD - power down
+                                SCARD_EJECT_CARD - eject
+        """
+        if self.hwnd_reader is None:
+            return
 
-    # def __tx_rx_apdu(self, apdu, apdu_len):
-    #
-    #     # Structure of Protocol Control Information
-    #     pio_send_pci = ScardIORequest()
-    #     pio_send_pci.dwProtocol = self.__protocol
-    #
-    #     apdu_rx = ctypes.create_string_buffer(300)
-    #     apdu_rx_len = ctypes.c_long(ctypes.sizeof(apdu_rx))
-    #
-    #     self.rv = self.pcsc_lib.SCardTransmit(self.__hwnd_reader,
-    #                                      ctypes.byref(pio_send_pci),
-    #                                      apdu,
-    #                                      ctypes.c_long(apdu_len),
-    #                                      None,
-    #                                      apdu_rx,
-    #                                      ctypes.byref(apdu_rx_len))
-    #
-    #     # self.__check_rv(rv, self.transmit.__name__)
-    #     self.__check_rv(self.transmit.__name__)
-    #
-    #     raw_apdu = list(struct.unpack('%dB' % apdu_rx_len.value, apdu_rx[:apdu_rx_len.value]))
-    #
-    #     return raw_apdu
-    #
-    # def transmit_old(self, raw_apdu=None, debug=False):
-    #     """
-    #     Transmit apdu to smart-card and receive answer
-    #     :param debug:
-    #     :param raw_apdu:    may be string "90 AA BB..."
-    #                         or list [0x90, 0x85, 0x4F, ...]
-    #     :return:            apdu, sw1, sw2 or exception
-    #     """
-    #     if raw_apdu is None:
-    #         raise Iso7816Exception("Can't transmit empty 'APDU'")
-    #
-    #     if isinstance(raw_apdu, str):
-    #         raw_apdu = raw_apdu.split(" ")
-    #         try:
-    #             raw_apdu = [int(x, 16) for x in raw_apdu]
-    #         except ValueError:
-    #             raise Iso7816Exception("Wrong C-APDU {}".format(raw_apdu))
-    #
-    #     logging.info("tx apdu: " + " ".join("{:02X}".format(i) for i in raw_apdu))
-    #
-    #     apdu_len = len(raw_apdu)
-    #     apdu = struct.pack('%dB' % apdu_len, *raw_apdu)
-    #
-    #     sw = None
-    #     sw1 = None
-    #     sw2 = None
-    #     sc_response = []
-    #
-    #     while sw != 0x9000:
-    #         raw_rx_apdu = self.__tx_rx_apdu(apdu, apdu_len)
-    #
-    #         if raw_rx_apdu:
-    #             sw2 = raw_rx_apdu.pop()
-    #             sw1 = raw_rx_apdu.pop()
-    #
-    #             if debug:
-    #                 print("debug mode: sw1={:02X} sw2={:02X}".format(sw1, sw2))
-    #
-    #             self.__check_sw(sw1, sw2)
-    #
-    #             sw = (sw1 << 8) | sw2
-    #             sc_response.extend(raw_rx_apdu)
-    #
-    #             if sc_response:
-    #                 logging.info("rx apdu: " +
-    #                              " ".join("{:02X}".format(i) for i in sc_response) +
-    #                              " {:02X} {:02X}".format(sw1, sw2))
-    #             else:
-    #                 logging.info("rx apdu: " + "{:02X} {:02X}".format(sw1, sw2))
-    #
-    #             if sw1 == 0x61:
-    #                 apdu = [0x00, 0xC0, 0x00, 0x00, sw2]                # ISO7816 cmd 'GET RESPONSE'
-    #                 apdu_len = len(apdu)
-    #                 logging.info("tx apdu: " + " ".join("{:02X}".format(i) for i in apdu))
-    #                 apdu = struct.pack('%dB' % apdu_len, *apdu)
-    #         else:
-    #             raise Iso7816Exception("Wrong R-APDU {}".format(raw_rx_apdu))
-    #
-    #     return sc_response, sw1, sw2
-    #
-    #
-    # # def transmit(self, raw_apdu, debug=False):
-    # def transmit2(self, raw_apdu):
-    #     """
-    #
-    #     :param raw_apdu:
-    #     :return:
-    #     """
-    #     if isinstance(raw_apdu, str):
-    #         raw_apdu = raw_apdu.split(" ")
-    #         try:
-    #             raw_apdu = [int(x, 16) for x in raw_apdu]
-    #         except ValueError:
-    #             raise Iso7816Exception("Wrong C-APDU {}".format(raw_apdu))
-    #
-    #     apdu_len = len(raw_apdu)
-    #     apdu = struct.pack('%dB' % apdu_len, *raw_apdu)
-    #
-    #     logging.info("TX apdu: " + " ".join("{:02X}".format(i) for i in raw_apdu))
-    #     rx_raw_apdu = self.__tx_rx_apdu(apdu, apdu_len)
-    #
-    #     if rx_raw_apdu:
-    #         sw2 = rx_raw_apdu.pop()
-    #         sw1 = rx_raw_apdu.pop()
-    #         response = rx_raw_apdu[:]
-    #
-    #         return response, sw1, sw2
-    #     else:
-    #         raise Iso7816Exception('Error, R-apdu: {}'.format(rx_raw_apdu))
-
-
-    # def transmit(self, raw_apdu, auto_get_response=False):
-    def transmit(self, raw_apdu):
-        """
-
-        :param raw_apdu:    APDU which will be send to smart card
-                            type string "AA BB CC DD"
-                            or   list [0xAA, 0xBB, 0xCC]
-        :return:
+        self.rv = self.backend.disconnect(self.hwnd_reader, disposition)
+        self.hwnd_reader = None
+        self.__static_attribs.clear()
+
+    def cancel(self):
         """
-        if isinstance(raw_apdu, str):
-            raw_apdu = raw_apdu.split(" ")
-            try:
-                raw_apdu = [int(x, 16) for x in raw_apdu]
-            except ValueError:
-                raise Iso7816Exception("Wrong C-APDU {}".format(raw_apdu))
+        Cancel all pending blocking requests of the context (SCardCancel)
+        It may be called from another thread
+        """
+        self.rv = self.backend.cancel(self.hwnd_app_context)
+        self.__check_rv(self.cancel.__name__)
 
-        apdu_len = len(raw_apdu)
-        apdu = struct.pack('%dB' % apdu_len, *raw_apdu)
+    @contextlib.contextmanager
+    def transaction(self, disposition=constants.SCARD_LEAVE_CARD):
+        """
+        Context manager which holds exclusive access to the card (SCardBeginTransaction/SCardEndTransaction)
+        Nested calls use the transaction of the outer one
+        :param disposition:     action with the card at the end of transaction
+                                SCARD_LEAVE_CARD/SCARD_RESET_CARD/SCARD_UNPOWER_CARD/SCARD_EJECT_CARD
+        :return:                self
+        """
+        if self.__transaction_depth == 0:
+            self.__check_handle(self.transaction.__name__)
+            self.rv = self.backend.begin_transaction(self.hwnd_reader)
+            self.__check_rv(self.transaction.__name__)
 
-        # Structure of Protocol Control Information
-        pio_send_pci = ScardIORequest()
-        pio_send_pci.dwProtocol = self.__protocol
+        self.__transaction_depth += 1
+        try:
+            yield self
 
-        rx_apdu = ctypes.create_string_buffer(300)
-        rx_apdu_len = ctypes.c_long(ctypes.sizeof(rx_apdu))
+        finally:
+            self.__transaction_depth -= 1
+            if self.__transaction_depth == 0 and self.hwnd_reader is not None:     # 'disconnect' inside
+                rv = self.backend.end_transaction(self.hwnd_reader, disposition)
+                if rv:
+                    trace.logger.info("Error = %x - [transaction] SCardEndTransaction", rv & 0xFFFFFFFF)
 
-        logging.info("TX apdu: " + " ".join("{:02X}".format(i) for i in raw_apdu))
-        self.rv = self.pcsc_lib.SCardTransmit(self.__hwnd_reader,
-                                         ctypes.byref(pio_send_pci),
-                                         apdu,
-                                         ctypes.c_long(apdu_len),
-                                         None,
-                                         rx_apdu,
-                                         ctypes.byref(rx_apdu_len))
+    def get_atr(self):
+        """
+        Get ATR - Answer To Reset
+        :return: list of ATR
 
+        """
+        self.__check_handle(self.get_atr.__name__)
 
-        self.__check_rv(self.transmit.__name__)
+        self.rv, atr, active_protocol = self.backend.status(self.hwnd_reader)
 
-        raw_response = list(struct.unpack('%dB' % rx_apdu_len.value, rx_apdu[:rx_apdu_len.value]))
+        if self.recorder is not None:
+            self.recorder.atr(self.reader, self.rv, atr)
 
-        if raw_response:
-            sw2 = raw_response.pop()
-            sw1 = raw_response.pop()
-            response = raw_response[:]
+        self.__check_rv(self.get_atr.__name__)
 
-            # if auto_get_response and sw1 == 0x61:
-            #     apdu_get_response = [0x00, 0xC0, 0x00, 0x00, sw2]                # ISO7816 cmd 'GET RESPONSE'
-            #     apdu_get_response_len = len(apdu_get_response)
-            #     logging.info("tx apdu: " + " ".join("{:02X}".format(i) for i in apdu))
-            #     apdu = struct.pack('%dB' % apdu_get_response_len, *apdu_get_response)
+        self.protocol = active_protocol
+        atr = list(atr)
 
-            return response, sw1, sw2
+        if trace.enabled:
+            trace.atr(atr)
 
-        else:
-            raise Iso7816Exception('Error, R-apdu: {}'.format(raw_response))
+        return atr
 
-    def analyze_atr(self, raw_atr=None):
+    def transmit(self, raw_apdu, auto_get_response=False):
         """
-        Analaze ATR and show description
-        :param raw_atr: string to analyze
-        :return: atr = {'TS': <val>,
-                        'T0': <val>,
-                        'TAi': <val>,
-                        'TBi': <val>,
-                        'TCi': <val>,
-                        'TDi': <val>,
-                        'hb' : <val>,
-                        'headeres': ['TS', 'T0', 'TA1', 'TB1', 'TC1', 'TD1', 'TA2', ...]
-                        }
 
+        :param raw_apdu:            APDU which will be send to smart card
+                                    type string "AA BB CC DD"
+                                    or   list [0xAA, 0xBB, 0xCC]
+                                    or   bytes/bytearray/memoryview
+        :param auto_get_response:   if True - 'GET RESPONSE' on SW1=0x61 and
+                                    re-send with corrected Le on SW1=0x6C are done automatically
+                                    (see 'transmit_chain')
+        :return:                    response (list), sw1, sw2
         """
+        apdu = self.to_bytes(raw_apdu)
 
-        if raw_atr is None:
-            raw_atr = self.get_atr()
+        if auto_get_response:
+            response, sw1, sw2 = self.transmit_chain(apdu)
+            return list(response), sw1, sw2
 
-        if isinstance(raw_atr, str):
-            raw_atr = raw_atr.split(" ")
-            raw_atr = [int(x, 16) for x in raw_atr]
+        response, sw1, sw2 = self.transmit_into(apdu)
 
-        print("Analyze ATR: " + " ".join("{:02X}".format(i) for i in raw_atr) + '\n')
+        return response.tolist(), sw1, sw2
 
-        if (raw_atr[0] != 0x3B) and (raw_atr[0] != 0x3F):
-            raise Iso7816Exception("This is not ATR")
+    def transmit_many(self, apdus, expected_sw=None, auto_get_response=False):
+        """
+        Transmit sequence of APDU inside one transaction
+        The transaction is held while generator is not exhausted or closed
+        :param apdus:               iterable of APDU, each one in format of 'transmit'
+        :param expected_sw:         iterable of expected SW (e.g. [0x9000, 0x6282]) or None
+                                    if not None - the sequence stops after the first unexpected SW
+        :param auto_get_response:   see 'transmit'
+        :return:                    generator of (response (bytes), sw1, sw2)
+        """
+        if expected_sw is not None:
+            expected_sw = frozenset(expected_sw)
 
-        atr_len = len(raw_atr)
+        with self.transaction():
+            for raw_apdu in apdus:
+                apdu = self.to_bytes(raw_apdu)
 
+                if auto_get_response:
+                    response, sw1, sw2 = self.transmit_chain(apdu)
+                    response = bytes(response)
+                else:
+                    response, sw1, sw2 = self.transmit_into(apdu)
+                    response = response.tobytes()
 
-        atr = {}
+                yield response, sw1, sw2
 
-        atr['headres'] = []
-        atr["TS"] = raw_atr[0]
+                if expected_sw is not None and ((sw1 << 8) | sw2) not in expected_sw:
+                    break
 
-        atr['headres'].append('TS')
-        hist_bytes = raw_atr[1] & 0xF
+    def transmit_chain(self, raw_apdu, max_chain=constants.MAX_CHAIN_COMMANDS):
+        """
+        Transmit APDU and collect whole response of smart card
+            SW1=0x61 - 'GET RESPONSE' (00 C0 00 00 SW2) is sent to get the rest of data
+            SW1=0x6C - the last command is sent again with Le=SW2
+        Statistic of the chain is stored in 'chain_stats':
+            {'commands': <number of sent C-APDU>, 'bytes': <length of response>, 'time': <seconds>}
+        :param raw_apdu:    APDU which will be send to smart card, see 'transmit'
+        :param max_chain:   maximum number of C-APDU in one chain
+        :return:            response (bytearray), sw1, sw2
+        """
+        apdu = self.to_bytes(raw_apdu)
+        response = bytearray()
+        commands = 0
+        time_start = time.perf_counter()
 
-        ptr = 1
-        index = 1
+        while True:
+            if commands >= max_chain:
+                raise Iso7816Exception("Too long response chain: {} C-APDU".format(commands))
 
-        TDi = raw_atr[1]
+            rx_apdu, sw1, sw2 = self.transmit_into(apdu)
+            commands += 1
 
-        atr['T0'] = TDi
-        atr['headres'].append('T0')
+            if sw1 == 0x6C:
+                apdu = set_le(apdu, sw2)                                # Wrong Le, SW2 - exact length
 
-        while (ptr + hist_bytes) < atr_len:
+            elif sw1 == 0x61:
+                response += rx_apdu
+                apdu = bytes((0x00, 0xC0, 0x00, 0x00, sw2))             # ISO7816 cmd 'GET RESPONSE'
 
-            # TAi presence
-            if TDi & 0x10:
-                ptr += 1
-                atr["TA%d" % index] = raw_atr[ptr]
-                atr['headres'].append('TA%d' % index)
+            else:
+                response += rx_apdu
+                break
 
-            # TBi presence
-            if TDi & 0x20:
-                ptr += 1
-                atr["TB%d" % index] = raw_atr[ptr]
-                atr['headres'].append('TB%d' % index)
+        self.chain_stats = {'commands': commands,
+                            'bytes': len(response),
+                            'time': time.perf_counter() - time_start}
 
-            # TCi presence
-            if TDi & 0x40:
-                ptr += 1
-                atr["TC%d" % index] = raw_atr[ptr]
-                atr['headres'].append('TC%d' % index)
+        return response, sw1, sw2
 
-            if TDi & 0x80:
-                ptr += 1
-                atr["TD%d" % index] = raw_atr[ptr]
-                atr['headres'].append('TD%d' % index)
+    def transmit_into(self, apdu, rx_buffer=None):
+        """
+        Transmit APDU without intermediate lists and string conversion
+        :param apdu:        C-APDU - bytes/bytearray/memoryview
+                            or any object which support buffer protocol
+        :param rx_buffer:   writable buffer (bytearray, memoryview, ...) which receives R-APDU
+                            if None - the buffer of this connection is used
+        :return:            memoryview of response (without SW), sw1, sw2
+                            The memoryview refers to receive buffer and is valid until next call
+        """
+        self.__check_handle(self.transmit.__name__)
 
-                index += 1
-                TDi = raw_atr[ptr]
+        if isinstance(apdu, bytes):
+            tx_view = tx_apdu = apdu
+            tx_apdu_len = len(apdu)
+        else:
+            tx_view = memoryview(apdu).cast('B')
+            tx_apdu_len = tx_view.nbytes
+            if tx_view.readonly:
+                tx_apdu = tx_view.tobytes()
             else:
-                break
+                tx_apdu = (ctypes.c_char * tx_apdu_len).from_buffer(tx_view)
+
+        if rx_buffer is None:
+            rx_apdu_len = expected_length(tx_view) + 2
+            if rx_apdu_len > len(self.__rx_apdu):
+                self.adjust_rx_buffer(rx_apdu_len)
+            rx_apdu = self.__rx_apdu
+            rx_view = self.__rx_apdu_view
+        else:
+            rx_view = memoryview(rx_buffer).cast('B')
+            rx_apdu = (ctypes.c_char * rx_view.nbytes).from_buffer(rx_view)
 
-        ptr += 1
+        self.__rx_apdu_len.value = rx_view.nbytes
 
-        if atr.get('TD1'):
-            if (atr['TD1'] & 0xF) != 0:
-                atr['TCK'] = raw_atr.pop()
+        self.rv = self.backend.transmit(self.hwnd_reader,
+                                        self.__pio_send_pci,
+                                        tx_apdu,
+                                        tx_apdu_len,
+                                        rx_apdu,
+                                        self.__rx_apdu_len)
 
-        atr['hb'] = raw_atr[ptr:ptr + hist_bytes]
-        atr['headres'].append('hb')
+        if self.recorder is not None:
+            self.recorder.exchange(self.reader, self.rv, tx_view,
+                                   b'' if self.rv else rx_view[:self.__rx_apdu_len.value])
 
-        if atr.get('TCK'):
-            atr['headres'].append('TCK')
+        self.__check_rv(self.transmit.__name__)
+
+        rx_apdu_len = self.__rx_apdu_len.value
+
+        if rx_apdu_len < 2:
+            raise Iso7816Exception('Error, R-apdu: {}'.format(rx_view[:rx_apdu_len].tolist()))
+
+        response = rx_view[:rx_apdu_len - 2]
+        sw1 = rx_view[rx_apdu_len - 2]
+        sw2 = rx_view[rx_apdu_len - 1]
+
+        if trace.enabled:
+            trace.exchange(tx_view, response, sw1, sw2)
 
-        for header in atr['headres']:
+        return response, sw1, sw2
 
-            if header == 'TS':
-                print("TS  = {:>5X} -> {:}".format(atr['TS'], constants.DSC_ATR['TS'][atr['TS']]))
+    def adjust_rx_buffer(self, size=None):
+        """
+        Resize receive buffer of this connection
+        :param size:    size of buffer in bytes (response data + SW1 SW2)
+                        if None - size is taken from reader's attributes 'MAXINPUT' or 'MAX_IFSD'
+                        and buffer for extended APDU is used if reader doesn't report them
+        :return:        new size of buffer
+        """
+        if size is None:
+            for name in ('MAXINPUT', 'MAX_IFSD'):
+                try:
+                    raw_attrib = self.get_attrib(name)
 
-            elif header == 'T0':
-                print("T0  = {:>5X}".format(atr['T0']))
+                except Iso7816Exception:
+                    continue
 
-            elif header == 'TA1':
-                print("TA1 = {:>5X} ->".format(atr['TA1']))
-                print("{:>16}Fi = {}".format(' ', (constants.DSC_ATR['FI'][(atr['TA1'] & 0xF0) >> 4])))
-                print("{:>16}Di = {}".format(' ', (constants.DSC_ATR['DI'][atr['TA1'] & 0xF])))
+                if raw_attrib:
+                    size = int.from_bytes(bytes(raw_attrib[:4]), 'little') + 2
+                    break
+            else:
+                size = constants.MAX_BUFFER_SIZE_EXTENDED
 
-            elif header == 'TB1':
-                print("TB1 = {:>5X} ->".format(atr['TB1']))
-                print("{:>16}II = {}".format(' ', (atr['TB1'] & 0x60) >> 6))
-                print("{:>16}Pi = {}".format(' ', atr['TB1'] & 0x1F))
+        size = max(constants.MAX_BUFFER_SIZE, min(size, constants.MAX_BUFFER_SIZE_EXTENDED))
 
-            elif header == 'TC1':
-                print("TC1 = {:>5X} -> Extra guard time".format(atr['TC1']))
+        if size != len(self.__rx_apdu):
+            self.__rx_apdu = ctypes.create_string_buffer(size)
+            self.__rx_apdu_view = memoryview(self.__rx_apdu).cast('B')
 
-            elif header == 'TD1':
-                print("TD1 = {:>5X} ->".format(atr['TD1']))
-                print("{:>16}T = {} - {}".format(' ', atr['TD1'] & 0xF, constants.DSC_ATR['T'][atr['TD1'] & 0xF]))
+        return size
 
-            elif header == 'hb':
-                print("\nH Bytes: {}".format(" ".join('{:02X}'.format(i) for i in atr['hb'])))
+    def analyze_atr(self, raw_atr=None):
+        """
+        Analaze ATR and show description, see iso7816.atr.parse_atr for parsed ATR without printing
+        :param raw_atr: string/list/bytes to analyze, if None - ATR of connected card
+        :return: atr = {'TS': <val>,
+                        'T0': <val>,
+                        'TAi': <val>,
+                        'TBi': <val>,
+                        'TCi': <val>,
+                        'TDi': <val>,
+                        'hb' : <val>,
+                        'TCK': <val>,
+                        'headers': ['TS', 'T0', 'TA1', 'TB1', 'TC1', 'TD1', 'TA2', ...]
+                        }
 
-            elif header == 'TCK':
-                print("TCK = {:>5X}".format(atr['TCK']))
+        """
 
+        if raw_atr is None:
+            raw_atr = self.get_atr()
+
+        parsed_atr = parse_atr(raw_atr)
+
+        print(render_atr(parsed_atr))
         print(" ")
-        return atr
+
+        return parsed_atr.as_dict()
 
     def get_attrib(self, get_attrib=None):
         """
@@ -522,81 +481,142 @@ class Iso7816:
         """
 
         if get_attrib:
-            attr_len = ctypes.c_long()                                  # Length of the pbAttr buffer in bytes and
-                                                                        # receives the actual length of the received attribute
-
             if isinstance(get_attrib, str):
-                rv = self.pcsc_lib.SCardGetAttrib(self.hwnd_reader,
-                                                  constants.ATTRIB_SMART_CARD[get_attrib],
-                                                  None,
-                                                  ctypes.byref(attr_len))
-            elif isinstance(get_attrib, int):
-                rv = self.pcsc_lib.SCardGetAttrib(self.hwnd_reader,
-                                                  get_attrib,
-                                                  None,
-                                                  ctypes.byref(attr_len))
-
-            self.__check_rv(rv, self.get_attrib.__name__)
-
-            attrib = ctypes.create_string_buffer(attr_len.value)        # Pointer to a buffer that receives the attribute.
-                                                                        # If this value is NULL, SCardGetAttrib()
-                                                                        # ignores the buffer length supplied in pcbAttrLen,
-                                                                        # writes the length of the buffer
-                                                                        # that would have been returned
-                                                                        # if this parameter had not been NULL to pcbAttrLen,
-                                                                        # and returns a success code
+                get_attrib = constants.ATTRIB_SMART_CARD[get_attrib]
 
-            if isinstance(get_attrib, str):
-                rv = self.pcsc_lib.SCardGetAttrib(self.hwnd_reader,
-                                                  constants.ATTRIB_SMART_CARD[get_attrib],
-                                                  ctypes.byref(attrib),
-                                                  ctypes.byref(attr_len))
-            elif isinstance(get_attrib, int):
-                rv = self.pcsc_lib.SCardGetAttrib(self.hwnd_reader,
-                                                  get_attrib,
-                                                  ctypes.byref(attrib),
-                                                  ctypes.byref(attr_len))
+            self.__check_handle(self.get_attrib.__name__)
 
-            self.__check_rv(rv, self.get_attrib.__name__)
+            self.rv, raw_attrib = self.backend.get_attrib(self.hwnd_reader, get_attrib, self.__attrib_buffer)
 
-            raw_attrib = list(struct.unpack('%dB' % attr_len.value, attrib[:attr_len.value]))
+            self.__check_rv(self.get_attrib.__name__)
 
-            return raw_attrib
+            return list(raw_attrib)
 
         else:
             return sorted(constants.ATTRIB_SMART_CARD.keys())
 
-    @staticmethod
-    def validate_byte(raw_value):
-
-        if isinstance(raw_value, int):
-            if raw_value in range(0, 0x10000):
-                return raw_value
-            else:
-                raise Iso7816Exception('wrong value of [CLA]/[INS]/[P1]/[P2]/[Lc]/[Le]')
+    def get_attribs(self, names):
+        """
+        Get several attributes decoded to typed values (see iso7816.attrib)
+        Static attributes of reader (vendor, serial number, max clock, ...) are cached until reconnect
+        :param names:   names of attributes (keys of constants.ATTRIB_SMART_CARD)
+        :return:        dict {name: value}, value is None if reader doesn't support attribute
+        """
+        attribs = {}
 
-        elif isinstance(raw_value, str):
+        for name in names:
             try:
-                value = int(raw_value, 16)
+                attribs[name] = self.__static_attribs[name]
+                continue
 
-            except ValueError:
-                raise Iso7816Exception('wrong value of [CLA]/[INS]/[P1]/[P2]/[Lc]/[Le]')
+            except KeyError:
+                pass
 
+            self.__check_handle(self.get_attribs.__name__)
+
+            self.rv, raw_attrib = self.backend.get_attrib(self.hwnd_reader,
+                                                          constants.ATTRIB_SMART_CARD[name],
+                                                          self.__attrib_buffer)
+
+            if self.rv in (constants.SCARD_E_UNSUPPORTED_FEATURE, constants.SCARD_E_NOT_TRANSACTED):
+                value = None
             else:
-                if value <= 0xFF:
-                    return value
-                else:
-                    raise Iso7816Exception('wrong value of [CLA]/[INS]/[P1]/[P2]/[Lc]/[Le]')
+                self.__check_rv(self.get_attribs.__name__)
+                value = decode_attrib(name, raw_attrib)
+
+            if name in STATIC_ATTRIBS:
+                self.__static_attribs[name] = value
+
+            attribs[name] = value
+
+        return attribs
+
+    def reader_snapshot(self):
+        """
+        All readable attributes of reader decoded to typed values
+        :return:    dict {name: value}, see 'get_attribs'
+        """
+        return self.get_attribs(SNAPSHOT_ATTRIBS)
+
+    def control(self, control_code, data=b'', response_size=constants.MAX_BUFFER_SIZE_EXTENDED):
+        """
+        Send command directly to the reader (SCardControl), e.g. features of PC/SC part 10
+        :param control_code:    code of reader's command
+        :param data:            bytes sent to reader
+        :param response_size:   maximum size of response
+        :return:                response of reader (bytes)
+        """
+        self.__check_handle(self.control.__name__)
+
+        self.rv, response = self.backend.control(self.hwnd_reader, control_code, bytes(data), response_size)
+
+        self.__check_rv(self.control.__name__)
+
+        return response
+
+    @staticmethod
+    def validate_byte(raw_value):
+        """
+        :param raw_value:   int or hex string ('A4', '0xA4') of single byte
+        :return:            int 0..0xFF
+        """
+        return validate_byte(raw_value)
 
     @staticmethod
     def validate_data(raw_data):
+        """
+        :param raw_data:    hex string with any whitespace ('A0 00  00 03', 'A0000003') or list of int
+        :return:            list of int
+        """
         if isinstance(raw_data, str):
             try:
-                data = [int(x, 16) for x in raw_data.split(" ")]
+                return list(bytes.fromhex(raw_data))
+
+            except ValueError:
+                pass
+
+            try:
+                data = [int(x, 16) for x in raw_data.split()]
 
             except ValueError:
                 raise Iso7816Exception('wrong format of [data]')
 
-            else:
-                return data
+        else:
+            data = list(raw_data)
+
+        if not all(isinstance(x, int) and 0 <= x <= 0xFF for x in data):
+            raise Iso7816Exception('wrong format of [data]')
+
+        return data
+
+    @staticmethod
+    def to_bytes(raw_apdu):
+        """
+        Convert APDU to bytes
+        :param raw_apdu:    string "AA BB CC DD"
+                            or list/tuple [0xAA, 0xBB, 0xCC]
+                            or bytes/bytearray/memoryview or other object of buffer protocol
+        :return:            bytes or the same buffer object
+        """
+        if isinstance(raw_apdu, (bytes, bytearray, memoryview)):
+            return raw_apdu
+
+        if isinstance(raw_apdu, str):
+            try:
+                return bytes.fromhex(raw_apdu)
+
+            except ValueError:
+                try:
+                    return bytes(int(x, 16) for x in raw_apdu.split())
+
+                except ValueError:
+                    raise Iso7816Exception("Wrong C-APDU {}".format(raw_apdu))
+
+        try:
+            if isinstance(raw_apdu, (list, tuple)):
+                return bytes(raw_apdu)
+
+            return bytes(memoryview(raw_apdu))                  # Other buffer objects, not int (bytes(5) - 5 zeros)
 
+        except (TypeError, ValueError):
+            raise Iso7816Exception("Wrong C-APDU {}".format(raw_apdu))
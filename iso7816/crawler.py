@@ -0,0 +1,408 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Discovery of file system of card by SELECT of file identifiers
+
+    crawler = Crawler(card, ranges=[(0x2F00, 0x2FFF), (0x5F00, 0x7FFF)], cache=True)
+    root = crawler.crawl()                              # FileNode of MF
+    for node in root.walk():
+        print(node.path_str, node.type, node.size)
+
+    json.dump(root.as_dict(), f)                        # tree model is serializable ...
+    for path, change in diff(FileNode.from_dict(json.load(f)), root):
+        print(path, change)                             # ... and diffable
+
+Existing FIDs of DF are memoized per (ATR, path of DF): the next card with the same ATR is probed only
+with FIDs which were found before. Subtrees are pruned by FCP: only DF which are not terminated are entered.
+"""
+
+__author__ = 'lem'
+
+import os
+import time
+import marshal
+
+from iso7816 import sw
+from iso7816 import tlv
+from iso7816.apdu import encode_apdu, MAX_SHORT_LE
+from iso7816.atr import to_bytes
+from iso7816.atrdb import DEFAULT_CACHE_DIR
+from iso7816.exceptions import Iso7816Exception
+
+
+FID_MF = 0x3F00
+RESERVED_FIDS = frozenset((FID_MF, 0x3FFF, 0xFFFF))             # MF, current DF path, reserved
+DEFAULT_RANGES = ((0x0000, 0xFFFF),)
+
+SW_FILE_NOT_FOUND = frozenset((0x6A82, 0x6A86, 0x6A87))
+SW_ACCESS_DENIED = frozenset((0x6982, 0x6985))                  # File exists, FCP is not returned
+
+TYPE_MF = 'MF'
+TYPE_DF = 'DF'
+TYPE_EF = 'EF'
+
+EF_STRUCTURES = {
+    0x01: 'transparent',
+    0x02: 'linear fixed',
+    0x03: 'linear fixed, TLV',
+    0x04: 'linear variable',
+    0x05: 'linear variable, TLV',
+    0x06: 'cyclic',
+    0x07: 'cyclic, TLV',
+}
+
+LCS_TERMINATED = frozenset((0x0C, 0x0D, 0x0E, 0x0F))            # Life cycle status of FCP (8A)
+
+CACHE_VERSION = 1
+
+
+class FileNode:
+    """
+    File of card with decoded FCP/FCI
+    """
+
+    __slots__ = ('path', 'sw', 'fcp', 'type', 'structure', 'size', 'records', 'record_size', 'name', 'sfi',
+                 'lcs', 'children')
+
+    def __init__(self, path, status, fcp=b''):
+        """
+        :param path:    tuple of FID from MF, e.g. (0x3F00, 0x7F10, 0x6F3A)
+        :param status:  SW of SELECT
+        :param fcp:     response of SELECT (FCP/FCI/FMD template)
+        """
+        self.path = tuple(path)
+        self.sw = status
+        self.fcp = bytes(fcp)
+        self.type = TYPE_MF if self.path == (FID_MF,) else None
+        self.structure = None                                   # Value of EF_STRUCTURES
+        self.size = None                                        # Number of data bytes (80 or 81)
+        self.records = None
+        self.record_size = None
+        self.name = None                                        # DF name (84)
+        self.sfi = None
+        self.lcs = None
+        self.children = []
+
+        if self.fcp:
+            self.__decode()
+
+    def __repr__(self):
+        return "FileNode({}, {}, SW={:04X})".format(self.path_str, self.type, self.sw)
+
+    def __decode(self):
+        try:
+            items = tlv.parse(self.fcp)
+
+        except Iso7816Exception:                                # Proprietary format of response
+            return
+
+        template = items.items[0] if items.items and items.items[0].tag in (0x62, 0x64, 0x6F) else None
+        if template is None:
+            return
+
+        descriptor = template.get(0x82)
+        if descriptor is not None and len(descriptor.value):
+            fdb = descriptor.value[0]
+
+            if fdb & 0xBF == 0x38:
+                if self.type is None:
+                    self.type = TYPE_DF
+            else:
+                self.type = TYPE_EF
+                self.structure = EF_STRUCTURES.get(fdb & 0x07)
+
+            if len(descriptor.value) >= 4:
+                self.record_size = int.from_bytes(descriptor.value[2:4], 'big')
+            if len(descriptor.value) >= 5:
+                self.records = int.from_bytes(descriptor.value[4:], 'big')
+
+        size = template.get(0x80) or template.get(0x81)
+        if size is not None and self.type == TYPE_EF:
+            self.size = int.from_bytes(size.value, 'big')
+
+        name = template.get(0x84)
+        if name is not None:
+            self.name = bytes(name.value)
+            if self.type is None:
+                self.type = TYPE_DF
+
+        sfi = template.get(0x88)
+        if sfi is not None and len(sfi.value):
+            self.sfi = sfi.value[0] >> 3
+
+        lcs = template.get(0x8A)
+        if lcs is not None and len(lcs.value):
+            self.lcs = lcs.value[0]
+
+    @property
+    def fid(self):
+        return self.path[-1]
+
+    @property
+    def path_str(self):
+        return '/'.join('{:04X}'.format(fid) for fid in self.path)
+
+    @property
+    def is_df(self):
+        return self.type in (TYPE_MF, TYPE_DF)
+
+    def walk(self):
+        """
+        :return: generator of this node and all nested nodes (depth-first)
+        """
+        stack = [self]
+
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def as_dict(self):
+        """
+        :return: dict of str/int/list, e.g. for json
+        """
+        return {
+            'path': self.path_str,
+            'sw': '{:04X}'.format(self.sw),
+            'fcp': self.fcp.hex().upper(),
+            'type': self.type,
+            'structure': self.structure,
+            'size': self.size,
+            'records': self.records,
+            'record_size': self.record_size,
+            'name': self.name.hex().upper() if self.name is not None else None,
+            'sfi': self.sfi,
+            'lcs': self.lcs,
+            'children': [child.as_dict() for child in self.children],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        :param data:    result of 'as_dict'
+        :return:        FileNode, decoded values are restored from FCP
+        """
+        node = cls([int(fid, 16) for fid in data['path'].split('/')], int(data['sw'], 16), bytes.fromhex(data['fcp']))
+
+        if node.type is None:
+            node.type = data.get('type')
+
+        node.children = [cls.from_dict(child) for child in data.get('children', ())]
+
+        return node
+
+
+def diff(old, new):
+    """
+    Compare two trees
+    :param old:     FileNode
+    :param new:     FileNode
+    :return:        generator of (path, change), change - 'added', 'removed' or 'changed'
+    """
+    old_nodes = {node.path: node for node in old.walk()}
+    new_nodes = {node.path: node for node in new.walk()}
+
+    for path in sorted(old_nodes.keys() | new_nodes.keys()):
+        path_str = '/'.join('{:04X}'.format(fid) for fid in path)
+
+        if path not in new_nodes:
+            yield path_str, 'removed'
+
+        elif path not in old_nodes:
+            yield path_str, 'added'
+
+        elif (old_nodes[path].sw, old_nodes[path].fcp) != (new_nodes[path].sw, new_nodes[path].fcp):
+            yield path_str, 'changed'
+
+
+class CrawlCache:
+    """
+    Existing FIDs of DF per (ATR, path of DF)
+    """
+
+    def __init__(self, filename=None):
+        """
+        :param filename:    file of cache, None - cache is kept in memory only
+        """
+        self.filename = filename
+        self.__entries = {}                                     # {(ATR, path): (FID, ...)}
+
+        if filename is not None:
+            self.__load()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __load(self):
+        try:
+            with open(self.filename, 'rb') as f:
+                version, entries = marshal.loads(f.read())
+
+        except (OSError, EOFError, ValueError, TypeError):
+            return
+
+        if version == CACHE_VERSION:
+            self.__entries = entries
+
+    def get(self, atr, path):
+        """
+        :param atr:     bytes of ATR
+        :param path:    tuple of FID of DF
+        :return:        tuple of existing FID or None if DF wasn't probed
+        """
+        return self.__entries.get((bytes(atr), tuple(path)))
+
+    def put(self, atr, path, fids):
+        self.__entries[(bytes(atr), tuple(path))] = tuple(fids)
+
+    def save(self):
+        """
+        Write cache to 'filename'
+        """
+        if self.filename is None:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+
+        temp_filename = '{}.{}.tmp'.format(self.filename, os.getpid())
+        with open(temp_filename, 'wb') as f:
+            f.write(marshal.dumps((CACHE_VERSION, self.__entries)))
+        os.replace(temp_filename, self.filename)
+
+
+class Crawler:
+    """
+    Walker of DF/EF tree
+    Statistic of the last crawl is in 'stats': {'selects', 'skipped', 'files', 'time'}
+    """
+
+    def __init__(self, card, ranges=DEFAULT_RANGES, max_depth=4, cache=None, p2=0x04, descend_unknown=False,
+                 cla=0x00):
+        """
+        :param card:                connected Iso7816 object
+        :param ranges:              list of (first FID, last FID) which are probed in each DF
+        :param max_depth:           maximum level of DF under MF
+        :param cache:               CrawlCache, True - cache in DEFAULT_CACHE_DIR, None - no memoization
+        :param p2:                  P2 of SELECT: 0x04 - FCP, 0x00 - FCI
+        :param descend_unknown:     probe children of files without FCP descriptor
+        :param cla:                 class byte of SELECT
+        """
+        self.card = card
+        self.ranges = tuple(ranges)
+        self.max_depth = max_depth
+        self.cache = CrawlCache(os.path.join(DEFAULT_CACHE_DIR, 'crawler.cache')) if cache is True else cache
+        self.p2 = p2
+        self.descend_unknown = descend_unknown
+        self.cla = cla
+        self.stats = None
+        self.__atr = b''
+        self.__refresh = False
+
+    def __select(self, fid, p2=None):
+        """
+        :return: response (bytearray), SW
+        """
+        p2 = self.p2 if p2 is None else p2
+        apdu = encode_apdu(self.cla, 0xA4, 0x00, p2, fid.to_bytes(2, 'big'), MAX_SHORT_LE if p2 != 0x0C else None)
+
+        response, sw1, sw2 = self.card.transmit_chain(apdu)
+        self.stats['selects'] += self.card.chain_stats['commands']
+
+        return response, (sw1 << 8) | sw2
+
+    def __select_path(self, path):
+        """
+        Make DF current, it is selected from MF step by step
+        """
+        for fid in path:
+            response, status = self.__select(fid, 0x0C)
+
+            if status != sw.SW_SUCCESS:
+                sw.check_sw(status >> 8, status & 0xFF, response)
+
+    def __probe(self, fid, parent):
+        """
+        :return: FileNode or None if file isn't found
+        """
+        response, status = self.__select(fid)
+
+        if status in SW_FILE_NOT_FOUND:
+            return None
+
+        if status not in SW_ACCESS_DENIED and sw.category(status) not in (sw.SUCCESS, sw.WARNING):
+            sw.check_sw(status >> 8, status & 0xFF, response)
+
+        return FileNode(parent.path + (fid,), status, response)
+
+    def __descend(self, node, depth):
+        if node.type == TYPE_EF or depth > self.max_depth:
+            return False
+
+        if node.lcs in LCS_TERMINATED:
+            return False
+
+        return node.is_df or self.descend_unknown
+
+    def __candidates(self, path):
+        if self.cache is not None and not self.__refresh:
+            fids = self.cache.get(self.__atr, path)
+            if fids is not None:
+                self.stats['skipped'] += sum(last - first + 1 for first, last in self.ranges) - len(fids)
+                return fids
+
+        return (fid for first, last in self.ranges for fid in range(first, last + 1))
+
+    def __crawl_df(self, node, depth):
+        found = []
+
+        for fid in self.__candidates(node.path):
+            if fid in RESERVED_FIDS or fid in node.path:
+                continue
+
+            child = self.__probe(fid, node)
+            if child is None:
+                continue
+
+            found.append(fid)
+            node.children.append(child)
+            self.stats['files'] += 1
+
+            if self.__descend(child, depth + 1):
+                self.__crawl_df(child, depth + 1)
+
+            if child.type != TYPE_EF:                           # Current DF may be changed by SELECT
+                self.__select_path(node.path)
+
+        if self.cache is not None:
+            self.cache.put(self.__atr, node.path, found)
+
+    def crawl(self, refresh=False):
+        """
+        Walk file system from MF
+        :param refresh:     ignore memoized FIDs of this ATR (they are replaced by the result)
+        :return:            FileNode of MF
+        """
+        self.stats = {'selects': 0, 'skipped': 0, 'files': 0, 'time': 0.0}
+        time_start = time.perf_counter()
+
+        self.__atr = to_bytes(self.card.get_atr()) if self.cache is not None else b''
+        self.__refresh = refresh
+
+        try:
+            response, status = self.__select(FID_MF)
+
+            if status not in SW_ACCESS_DENIED and sw.category(status) not in (sw.SUCCESS, sw.WARNING):
+                sw.check_sw(status >> 8, status & 0xFF, response)
+
+            root = FileNode((FID_MF,), status, response)
+            self.__crawl_df(root, 0)
+
+            if self.cache is not None:
+                self.cache.save()
+
+            return root
+
+        finally:
+            self.stats['time'] = time.perf_counter() - time_start
@@ -0,0 +1,182 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Exceptions of iso7816
+
+    Iso7816Exception
+     +-- PcscError                  error of PC/SC library, 'error' - return value
+     |    +-- CardRemovedError
+     |    +-- CardResetError
+     |    +-- ReaderUnavailableError
+     +-- SecureMessagingError       wrong cryptogram, MAC or padding of secure channel
+     +-- SwError                    status word of R-APDU, see iso7816.sw
+          +-- SwWarning             62xx, 63xx
+          |    +-- VerificationError            63Cx
+          +-- SwExecutionError      64xx - 66xx
+          +-- SwCheckingError       67xx - 6Fxx
+               +-- WrongLengthError             67xx, 6Cxx
+               +-- SecurityError                6982, 6983, 6984
+               +-- NotFoundError                6A82, 6A83, 6A88
+               +-- NotSupportedError            68xx, 6A81, 6D00, 6E00
+
+Message of exception is formatted when it is read, construction is cheap
+"""
+
+__author__ = 'lem'
+
+from iso7816 import constants
+
+
+class Iso7816Exception(Exception):
+    """
+    The base class for iso7816 exception
+    """
+
+    def __init__(self, msg='Iso7816 Exception', error=None):
+        super().__init__(msg, error)
+        self._msg = msg
+        self.error = error & 0xFFFFFFFF if error else None
+
+    def __str__(self):
+        return self.msg
+
+    @property
+    def msg(self):
+        description = constants.DSC_ERROR.get(self.error) if self.error is not None else None
+
+        if description is None:
+            return self._msg
+
+        return description + ' ' + self._msg
+
+
+class PcscError(Iso7816Exception):
+    """
+    PC/SC library returned error
+    """
+
+
+class CardRemovedError(PcscError):
+    """
+    Card is removed or absent
+    """
+
+
+class CardResetError(PcscError):
+    """
+    Card was reset by another connection, SCardReconnect restores the connection
+    """
+
+
+class ReaderUnavailableError(PcscError):
+    """
+    Reader is removed, unknown or PC/SC service is stopped
+    """
+
+
+PCSC_ERRORS = {
+    constants.SCARD_W_REMOVED_CARD: CardRemovedError,
+    constants.SCARD_E_NO_SMARTCARD: CardRemovedError,
+    constants.SCARD_W_RESET_CARD: CardResetError,
+    constants.SCARD_E_READER_UNAVAILABLE: ReaderUnavailableError,
+    constants.SCARD_E_UNKNOWN_READER: ReaderUnavailableError,
+    constants.SCARD_E_NO_SERVICE: ReaderUnavailableError,
+}
+
+
+def pcsc_error(msg, error):
+    """
+    Exception of PC/SC error
+    :param msg:     message, e.g. name of function
+    :param error:   return value of PC/SC function
+    :return:        PcscError or its subclass
+    """
+    return PCSC_ERRORS.get(error & 0xFFFFFFFF, PcscError)(msg, error)
+
+
+class SecureMessagingError(Iso7816Exception):
+    """
+    Authentication of card or R-APDU of secure channel failed
+    """
+
+
+class SwError(Iso7816Exception):
+    """
+    Status word of R-APDU is not success
+    """
+
+    def __init__(self, sw1, sw2, response=None):
+        """
+        :param sw1:         SW1
+        :param sw2:         SW2
+        :param response:    data of R-APDU
+        """
+        Exception.__init__(self, sw1, sw2, response)
+        self.sw1 = sw1
+        self.sw2 = sw2
+        self.response = response
+        self.error = None
+
+    @property
+    def sw(self):
+        return (self.sw1 << 8) | self.sw2
+
+    @property
+    def msg(self):
+        from iso7816.sw import describe
+
+        return "SW = {:04X} - {}".format(self.sw, describe(self.sw))
+
+
+class SwWarning(SwError):
+    """
+    Warning processing: 62xx, 63xx
+    """
+
+
+class VerificationError(SwWarning):
+    """
+    Verification failed: 63Cx, 'retries' - number of further allowed retries
+    """
+
+    @property
+    def retries(self):
+        return self.sw2 & 0xF
+
+
+class SwExecutionError(SwError):
+    """
+    Execution error: 64xx - 66xx
+    """
+
+
+class SwCheckingError(SwError):
+    """
+    Checking error: 67xx - 6Fxx
+    """
+
+
+class WrongLengthError(SwCheckingError):
+    """
+    Wrong length: 67xx, 6Cxx
+    """
+
+
+class SecurityError(SwCheckingError):
+    """
+    Security status not satisfied, authentication method blocked, reference data not usable
+    """
+
+
+class NotFoundError(SwCheckingError):
+    """
+    File, application, record or reference data not found
+    """
+
+
+class NotSupportedError(SwCheckingError):
+    """
+    Class, instruction, function or feature not supported
+    """
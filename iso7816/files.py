@@ -0,0 +1,245 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Reading of transparent and record EF (READ BINARY / READ RECORD)
+
+    reader = FileReader(card)
+    card.transmit('00 A4 02 0C 02 2F 00')               # select EF
+    for chunk in reader.read_binary():                  # memoryview, valid until next chunk
+        ...
+    data = bytearray(4096)
+    n = reader.read_into(data, sfi=0x1E)
+    reader.read_to_file('ef.bin', resume=True)          # continue from size of existing file
+    for number, record in reader.read_records(sfi=1):
+        ...
+    print(reader.stats['bytes_per_sec'])
+"""
+
+__author__ = 'lem'
+
+import os
+import time
+
+from iso7816 import sw
+from iso7816 import tlv
+from iso7816.apdu import encode_apdu, set_le, MAX_SHORT_LE, MAX_EXTENDED_LE
+from iso7816.atr import parse_atr
+from iso7816.exceptions import Iso7816Exception
+
+
+MAX_OFFSET_B0 = 0x7FFF                                          # Offset in P1-P2 of READ BINARY (B0)
+MAX_OFFSET_SFI = 0xFF                                           # Offset in P2 if SFI is in P1
+
+SW_END_OF_FILE = 0x6282
+SW_WRONG_OFFSET = (0x6B00, 0x6A86)                              # Offset is beyond the end of file
+SW_RECORD_NOT_FOUND = 0x6A83
+
+MAX_OFFSET_DO_SIZE = 4                                          # '53 82 xx xx' around data of READ BINARY (B1)
+
+
+class FileReader:
+    """
+    Reader of EF with the largest chunk which card and reader support
+    Statistic of the last reading is in 'stats': {'bytes', 'commands', 'time', 'bytes_per_sec'}
+    """
+
+    def __init__(self, card, chunk_size=None, cla=0x00):
+        """
+        :param card:        connected Iso7816 object
+        :param chunk_size:  maximum number of bytes in one R-APDU
+                            if None - 65536 if ATR reports extended Lc/Le (limited by the reader's buffer),
+                            otherwise 256
+        :param cla:         class byte of commands
+        """
+        self.card = card
+        self.cla = cla
+        self.chunk_size = chunk_size if chunk_size is not None else self.max_chunk_size()
+        self.stats = None
+
+    def max_chunk_size(self):
+        """
+        :return: the largest response data which card and reader support
+        """
+        try:
+            extended = parse_atr(self.card.get_atr()).historical_info.extended_length
+
+        except Iso7816Exception:
+            extended = False
+
+        if not extended:
+            return MAX_SHORT_LE
+
+        return min(self.card.adjust_rx_buffer() - 2, MAX_EXTENDED_LE)
+
+    def __start(self):
+        self.stats = {'bytes': 0, 'commands': 0, 'time': 0.0, 'bytes_per_sec': 0.0}
+        return time.perf_counter()
+
+    def __finish(self, time_start):
+        elapsed = time.perf_counter() - time_start
+        self.stats['time'] = elapsed
+        self.stats['bytes_per_sec'] = self.stats['bytes'] / elapsed if elapsed else 0.0
+
+    def __exchange(self, apdu):
+        """
+        Transmit C-APDU, repeat it with exact Le on 6Cxx and collect data on 61xx
+        :return: response data (memoryview or bytearray), SW
+        """
+        response, sw1, sw2 = self.card.transmit_into(apdu)
+        self.stats['commands'] += 1
+
+        if sw1 == 0x6C:
+            response, sw1, sw2 = self.card.transmit_into(set_le(apdu, sw2))
+            self.stats['commands'] += 1
+
+        elif sw1 == 0x61:
+            data = bytearray(response)
+            response, sw1, sw2 = self.card.transmit_chain(bytes((apdu[0] & 0x03, 0xC0, 0x00, 0x00, sw2)))
+            self.stats['commands'] += self.card.chain_stats['commands']
+            data += response
+            response = data
+
+        return response, (sw1 << 8) | sw2
+
+    def read_binary(self, offset=0, length=None, sfi=None):
+        """
+        Read transparent EF (current EF or EF by short identifier)
+        :param offset:  offset of the first byte
+        :param length:  number of bytes, if None - until the end of file
+        :param sfi:     short EF identifier (1..30), if None - current EF
+        :return:        generator of memoryview chunks, each one is valid until the next chunk
+        """
+        time_start = self.__start()
+
+        try:
+            while length is None or length > 0:
+                le = self.chunk_size if length is None else min(self.chunk_size, length)
+
+                if sfi is not None and offset <= MAX_OFFSET_SFI:
+                    apdu = encode_apdu(self.cla, 0xB0, 0x80 | sfi, offset, None, le)
+                    sfi = None                                  # The next commands read current EF
+
+                elif sfi is None and offset <= MAX_OFFSET_B0:
+                    apdu = encode_apdu(self.cla, 0xB0, offset >> 8, offset & 0xFF, None, le)
+
+                else:                                           # READ BINARY with odd INS, offset data object,
+                                                                # SFI (if any) in P2
+                    max_le = MAX_EXTENDED_LE if self.chunk_size > MAX_SHORT_LE else MAX_SHORT_LE
+                    le = min(le, max_le - MAX_OFFSET_DO_SIZE)   # Data and its DO '53' fit into Le
+                    offset_do = tlv.encode(0x54, offset.to_bytes((offset.bit_length() + 7) // 8, 'big'))
+                    apdu = encode_apdu(self.cla, 0xB1, 0x00, sfi or 0x00, offset_do, le + MAX_OFFSET_DO_SIZE)
+                    sfi = None
+
+                response, status = self.__exchange(apdu)
+
+                if status in SW_WRONG_OFFSET:
+                    break
+
+                if status != SW_END_OF_FILE:
+                    sw.check_sw(status >> 8, status & 0xFF, response)
+
+                if apdu[1] == 0xB1 and response:
+                    response = tlv.parse(response).get(0x53)
+                    response = response.value if response is not None else memoryview(b'')
+
+                if not response:
+                    break
+
+                offset += len(response)
+                if length is not None:
+                    length -= len(response)
+
+                self.stats['bytes'] += len(response)
+
+                yield response if isinstance(response, memoryview) else memoryview(response)
+
+                if status == SW_END_OF_FILE or (length is None and len(response) < le):
+                    break
+
+        finally:
+            self.__finish(time_start)
+
+    def read_into(self, buffer, offset=0, sfi=None):
+        """
+        Read transparent EF into preallocated buffer
+        :param buffer:  writable buffer (bytearray, memoryview, ...), reading stops when it is full
+        :param offset:  offset of the first byte in file
+        :param sfi:     short EF identifier, if None - current EF
+        :return:        number of read bytes
+        """
+        view = memoryview(buffer).cast('B')
+        position = 0
+
+        for chunk in self.read_binary(offset, len(view), sfi):
+            view[position:position + len(chunk)] = chunk
+            position += len(chunk)
+
+        return position
+
+    def read_to_file(self, file, offset=0, length=None, sfi=None, resume=False):
+        """
+        Read transparent EF into file
+        :param file:    path or binary file object
+        :param offset:  offset of the first byte in EF
+        :param length:  number of bytes, if None - until the end of file
+        :param sfi:     short EF identifier, if None - current EF
+        :param resume:  if True and 'file' is path - continue from size of existing file (offset is ignored)
+        :return:        number of written bytes
+        """
+        if not isinstance(file, (str, bytes, os.PathLike)):
+            return self.__write(file, offset, length, sfi)
+
+        mode = 'wb'
+        if resume and os.path.exists(file):
+            offset = os.path.getsize(file)
+            mode = 'ab'
+
+        with open(file, mode) as f:
+            return self.__write(f, offset, length, sfi)
+
+    def __write(self, f, offset, length, sfi):
+        written = 0
+
+        for chunk in self.read_binary(offset, length, sfi):
+            f.write(chunk)
+            written += len(chunk)
+
+        return written
+
+    def read_records(self, record=1, count=None, sfi=None):
+        """
+        Read records of record EF one by one
+        :param record:  number of the first record
+        :param count:   number of records, if None - until 'Record not found' (6A83)
+        :param sfi:     short EF identifier, if None - current EF
+        :return:        generator of (number of record, memoryview), memoryview is valid until the next record
+        """
+        time_start = self.__start()
+        p2 = 0x04 if sfi is None else (sfi << 3) | 0x04         # Record number in P1
+
+        try:
+            while count is None or count > 0:
+                apdu = encode_apdu(self.cla, 0xB2, record, p2, None, min(self.chunk_size, MAX_SHORT_LE))
+                response, status = self.__exchange(apdu)
+
+                if status == SW_RECORD_NOT_FOUND or status in SW_WRONG_OFFSET:
+                    break
+
+                if status != SW_END_OF_FILE:
+                    sw.check_sw(status >> 8, status & 0xFF, response)
+
+                self.stats['bytes'] += len(response)
+
+                yield record, response if isinstance(response, memoryview) else memoryview(response)
+
+                if record == 0xFE:                              # 6282 - record is shorter than Le
+                    break
+
+                record += 1
+                if count is not None:
+                    count -= 1
+
+        finally:
+            self.__finish(time_start)
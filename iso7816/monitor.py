@@ -0,0 +1,217 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import asyncio
+import threading
+import collections
+import concurrent.futures
+
+from iso7816 import constants
+from iso7816.core import Iso7816, ScardReaderState, PCSC_LIB
+from iso7816.exceptions import Iso7816Exception
+
+
+CARD_INSERTED = 'inserted'
+CARD_REMOVED = 'removed'
+READER_ADDED = 'reader_added'
+READER_REMOVED = 'reader_removed'
+
+CardEvent = collections.namedtuple('CardEvent', ['event', 'reader', 'atr'])
+
+
+class CardMonitor:
+    """
+    Wait for insertion/removal of cards and for new readers (SCardGetStatusChange)
+
+        monitor = CardMonitor()
+        for event in monitor:                       # blocking iterator
+            print(event.event, event.reader, event.atr)
+
+        monitor.start(callback)                     # callback(event) in background thread
+
+        async for event in monitor:                 # asyncio
+            ...
+    """
+
+    def __init__(self, path_to_lib=PCSC_LIB, report_present=True, pnp=True, timeout=1000, backend=None):
+        """
+        :param path_to_lib:     path to PC/SC library
+        :param report_present:  report cards which are present at start as inserted
+        :param pnp:             detect new readers with pseudo reader '\\\\?PnP?\\Notification'
+        :param timeout:         timeout (ms) of one wait in iterators, used to check 'stop'
+        :param backend:         iso7816.backend.Backend, if None - PcscBackend of 'path_to_lib'
+        """
+        self.card = Iso7816(path_to_lib, backend,
+                            shared_context=False)               # Own PC/SC context of monitor,
+                                                                # 'stop' cancels its requests only
+        self.report_present = report_present
+        self.pnp = pnp
+        self.timeout = timeout
+
+        self.__states = None                                    # ctypes array of ScardReaderState
+        self.__names = []                                       # Encoded names of readers, kept alive for C-library
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+    def __iter__(self):
+        return self.events()
+
+    def __aiter__(self):
+        return self.aevents()
+
+    @staticmethod
+    def __card_events(reader, state):
+        """
+        Compare current and new state of reader
+        """
+        events = []
+        old = state.dwCurrentState
+        new = state.dwEventState
+
+        was_present = old & constants.SCARD_STATE_PRESENT
+        is_present = new & constants.SCARD_STATE_PRESENT
+        reinserted = was_present and is_present and (old >> 16) != (new >> 16)    # Event counter is changed
+
+        if was_present and (not is_present or reinserted):
+            events.append(CardEvent(CARD_REMOVED, reader, None))
+
+        if is_present and (not was_present or reinserted):
+            events.append(CardEvent(CARD_INSERTED, reader, bytes(state.rgbAtr[:state.cbAtr])))
+
+        return events
+
+    def __update_readers(self, events):
+        """
+        Rebuild array of reader states after list of readers is changed
+        """
+        try:
+            readers = self.card.get_readers()
+
+        except Iso7816Exception:
+            readers = []
+
+        old_states = {}
+        if self.__states is not None:
+            old_states = {state.szReader.decode(): state.dwCurrentState for state in self.__states}
+
+            for reader in readers:
+                if reader not in old_states:
+                    events.append(CardEvent(READER_ADDED, reader, None))
+
+            for reader, current_state in old_states.items():
+                if reader != constants.PNP_NOTIFICATION and reader not in readers:
+                    if current_state & constants.SCARD_STATE_PRESENT:
+                        events.append(CardEvent(CARD_REMOVED, reader, None))
+                    events.append(CardEvent(READER_REMOVED, reader, None))
+
+        if self.pnp:
+            readers = readers + [constants.PNP_NOTIFICATION]
+
+        self.__names = [reader.encode() for reader in readers]
+        self.__states = (ScardReaderState * len(readers))()
+
+        for state, reader, name in zip(self.__states, readers, self.__names):
+            state.szReader = name
+            state.dwCurrentState = old_states.get(reader, constants.SCARD_STATE_UNAWARE)
+
+    def wait(self, timeout=constants.INFINITE):
+        """
+        Wait for the next change of readers
+        :param timeout:     timeout in ms, constants.INFINITE - wait forever
+        :return:            list of CardEvent, empty on timeout or 'stop'
+        """
+        events = []
+
+        if self.__states is None:
+            self.__update_readers(events)
+            if not self.report_present:
+                self.card.get_status_change(self.__states, 0)
+                for state in self.__states:
+                    state.dwCurrentState = state.dwEventState & ~constants.SCARD_STATE_CHANGED
+
+        if not self.card.get_status_change(self.__states, timeout):
+            return events
+
+        pnp_changed = False
+
+        for state in self.__states:
+            if not state.dwEventState & constants.SCARD_STATE_CHANGED:
+                continue
+
+            reader = state.szReader.decode()
+            if reader == constants.PNP_NOTIFICATION:
+                pnp_changed = True
+            else:
+                events.extend(self.__card_events(reader, state))
+
+            state.dwCurrentState = state.dwEventState & ~constants.SCARD_STATE_CHANGED
+
+        if pnp_changed:
+            self.__update_readers(events)
+
+        return events
+
+    def events(self):
+        """
+        Blocking iterator of CardEvent, it is finished by 'stop' (also by 'stop' before iteration)
+        """
+        while not self.__stopped.is_set():
+            yield from self.wait(self.timeout)
+
+    async def aevents(self):
+        """
+        Asynchronous iterator of CardEvent, it is finished by 'stop' or cancellation of task
+        """
+        loop = asyncio.get_running_loop()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='CardMonitor')
+
+        try:
+            while not self.__stopped.is_set():
+                try:
+                    events = await loop.run_in_executor(executor, self.wait, self.timeout)
+
+                except asyncio.CancelledError:
+                    self.card.cancel()
+                    raise
+
+                for event in events:
+                    yield event
+
+        finally:
+            executor.shutdown(wait=False)
+
+    def start(self, callback):
+        """
+        Call callback(event) for every CardEvent in background thread
+        :param callback:    callable with one argument - CardEvent
+        :return:            thread of monitor
+        """
+        self.__stopped.clear()                                  # 'stop' after this point is never lost
+
+        def loop():
+            for event in self.events():
+                callback(event)
+
+        self.__thread = threading.Thread(target=loop, name='CardMonitor', daemon=True)
+        self.__thread.start()
+
+        return self.__thread
+
+    def stop(self):
+        """
+        Stop iterators and background thread, iterators of stopped monitor finish at once until 'start'
+        """
+        self.__stopped.set()
+
+        try:
+            self.card.cancel()
+
+        except Iso7816Exception:
+            pass
+
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join()
+            self.__thread = None
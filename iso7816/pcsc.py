@@ -0,0 +1,162 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+ctypes bindings of PC/SC library (libpcsclite, PCSC.framework, winscard.dll)
+
+The library is loaded once per process and path, every SCard* function has declared prototype,
+so ctypes checks and converts arguments without guessing and the caller can keep bound function:
+
+    lib = pcsc.load()
+    transmit = lib.SCardTransmit
+    rv = transmit(card, ctypes.byref(pci), apdu, len(apdu), None, rx_buffer, ctypes.byref(rx_len))
+"""
+
+__author__ = 'lem'
+
+import sys
+import ctypes
+import ctypes.util
+import functools
+
+from iso7816 import constants
+from iso7816.exceptions import Iso7816Exception
+
+
+DEFAULT_PCSC_LIB = "/lib/x86_64-linux-gnu/libpcsclite.so.1"    # Used if library isn't found
+
+if sys.platform == 'win32':
+    DWORD = ctypes.c_ulong                                      # 32 bits on Windows
+    SCARDCONTEXT = ctypes.c_size_t                              # ULONG_PTR
+    SCARDHANDLE = ctypes.c_size_t
+    READER_STATE_ATR_SIZE = 36
+    _LIBRARY_NAME = 'winscard'
+    _SUFFIX = 'A'                                               # ANSI versions of functions with strings
+    _PACK = 0
+
+elif sys.platform == 'darwin':
+    DWORD = ctypes.c_uint32
+    SCARDCONTEXT = ctypes.c_int32
+    SCARDHANDLE = ctypes.c_int32
+    READER_STATE_ATR_SIZE = constants.MAX_ATR_SIZE
+    _LIBRARY_NAME = 'PCSC'
+    _SUFFIX = ''
+    _PACK = 1                                                   # Structures of PCSC.framework are packed
+
+else:
+    DWORD = ctypes.c_ulong
+    SCARDCONTEXT = ctypes.c_long
+    SCARDHANDLE = ctypes.c_long
+    READER_STATE_ATR_SIZE = constants.MAX_ATR_SIZE
+    _LIBRARY_NAME = 'pcsclite'
+    _SUFFIX = ''
+    _PACK = 0
+
+RESULT = ctypes.c_uint32                                        # LONG result of functions, read as unsigned
+                                                                # to compare with error codes of constants
+LPDWORD = ctypes.POINTER(DWORD)
+
+
+class ScardIORequest(ctypes.Structure):
+    """
+    SCARD_IO_REQUEST - Protocol Control Information of SCardTransmit
+    """
+    _pack_ = _PACK
+    _fields_ = [('dwProtocol', DWORD),
+                ('cbPciLength', DWORD)]
+
+
+class ScardReaderState(ctypes.Structure):
+    """
+    SCARD_READERSTATE, used by SCardGetStatusChange
+    """
+    _pack_ = _PACK
+    _fields_ = [('szReader', ctypes.c_char_p),
+                ('pvUserData', ctypes.c_void_p),
+                ('dwCurrentState', DWORD),
+                ('dwEventState', DWORD),
+                ('cbAtr', DWORD),
+                ('rgbAtr', ctypes.c_ubyte * READER_STATE_ATR_SIZE)]
+
+
+LPSCARD_IO_REQUEST = ctypes.POINTER(ScardIORequest)
+LPSCARD_READERSTATE = ctypes.POINTER(ScardReaderState)
+
+# (name, has ANSI/UNICODE versions, argtypes), buffers are c_void_p: it accepts bytes, ctypes arrays and None
+PROTOTYPES = (
+    ('SCardEstablishContext', False, (DWORD, ctypes.c_void_p, ctypes.c_void_p, ctypes.POINTER(SCARDCONTEXT))),
+    ('SCardReleaseContext', False, (SCARDCONTEXT,)),
+    ('SCardIsValidContext', False, (SCARDCONTEXT,)),
+    ('SCardListReaderGroups', True, (SCARDCONTEXT, ctypes.c_void_p, LPDWORD)),
+    ('SCardListReaders', True, (SCARDCONTEXT, ctypes.c_char_p, ctypes.c_void_p, LPDWORD)),
+    ('SCardConnect', True, (SCARDCONTEXT, ctypes.c_char_p, DWORD, DWORD, ctypes.POINTER(SCARDHANDLE), LPDWORD)),
+    ('SCardReconnect', False, (SCARDHANDLE, DWORD, DWORD, DWORD, LPDWORD)),
+    ('SCardDisconnect', False, (SCARDHANDLE, DWORD)),
+    ('SCardBeginTransaction', False, (SCARDHANDLE,)),
+    ('SCardEndTransaction', False, (SCARDHANDLE, DWORD)),
+    ('SCardStatus', True, (SCARDHANDLE, ctypes.c_void_p, LPDWORD, LPDWORD, LPDWORD, ctypes.c_void_p, LPDWORD)),
+    ('SCardGetStatusChange', True, (SCARDCONTEXT, DWORD, LPSCARD_READERSTATE, DWORD)),
+    ('SCardControl', False, (SCARDHANDLE, DWORD, ctypes.c_void_p, DWORD, ctypes.c_void_p, DWORD, LPDWORD)),
+    ('SCardTransmit', False, (SCARDHANDLE, LPSCARD_IO_REQUEST, ctypes.c_void_p, DWORD,
+                              LPSCARD_IO_REQUEST, ctypes.c_void_p, LPDWORD)),
+    ('SCardCancel', False, (SCARDCONTEXT,)),
+    ('SCardGetAttrib', False, (SCARDHANDLE, DWORD, ctypes.c_void_p, LPDWORD)),
+    ('SCardSetAttrib', False, (SCARDHANDLE, DWORD, ctypes.c_void_p, DWORD)),
+)
+
+
+def find_library():
+    """
+    Path of PC/SC library of this platform
+    :return: name or path of library for ctypes
+    """
+    return ctypes.util.find_library(_LIBRARY_NAME) or DEFAULT_PCSC_LIB
+
+
+PCSC_LIB = find_library()
+
+
+class PcscLibrary:
+    """
+    PC/SC library with declared prototypes
+    Attributes are functions SCard* (without suffix 'A' on Windows), None if library doesn't export function
+    """
+
+    def __init__(self, path_to_lib=PCSC_LIB):
+        """
+        :param path_to_lib:     name or path of library
+        """
+        self.path = path_to_lib
+
+        try:
+            if sys.platform == 'win32':
+                self.lib = ctypes.WinDLL(path_to_lib)
+            else:
+                self.lib = ctypes.CDLL(path_to_lib)
+
+        except OSError:
+            raise Iso7816Exception("Can't find '{}'".format(path_to_lib))
+
+        for name, has_suffix, argtypes in PROTOTYPES:
+            try:
+                function = getattr(self.lib, name + _SUFFIX if has_suffix else name)
+
+            except AttributeError:
+                function = None
+
+            else:
+                function.argtypes = argtypes
+                function.restype = RESULT
+
+            setattr(self, name, function)
+
+
+@functools.lru_cache(maxsize=None)
+def load(path_to_lib=PCSC_LIB):
+    """
+    Load library once per process
+    :param path_to_lib:     name or path of library
+    :return:                PcscLibrary
+    """
+    return PcscLibrary(path_to_lib)
@@ -0,0 +1,150 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import threading
+import concurrent.futures
+
+from iso7816 import constants
+from iso7816.core import Iso7816, PCSC_LIB
+from iso7816.exceptions import Iso7816Exception, PcscError
+
+
+class ReaderPool:
+    """
+    Executor with one worker thread per reader
+    Each worker has its own PC/SC context and connection, so jobs on different readers run in parallel
+    (SCardTransmit releases GIL) and jobs on one reader are serialized
+
+        with ReaderPool() as pool:
+            futures = [pool.submit(personalize, card_data) for card_data in batch]
+
+        def personalize(card, card_data):
+            card.transmit(...)
+    """
+
+    def __init__(self,
+                 readers=None,
+                 path_to_lib=PCSC_LIB,
+                 backend=None,
+                 mode=constants.SCARD_SHARE_SHARED,
+                 protocol=constants.SCARD_PROTOCOL_T0 | constants.SCARD_PROTOCOL_T1):
+        """
+        :param readers:     list of readers names, if None - all available readers
+        :param path_to_lib: path to PC/SC library
+        :param backend:     iso7816.backend.Backend shared by workers, if None - PcscBackend of 'path_to_lib'
+        :param mode:        mode of connection, see 'Iso7816.connect'
+        :param protocol:    protocol of connection, see 'Iso7816.connect'
+        """
+        self.path_to_lib = path_to_lib
+        self.backend = backend
+        self.mode = mode
+        self.protocol = protocol
+
+        if readers is None:
+            with Iso7816(path_to_lib, backend) as card:
+                readers = card.get_readers()
+
+        if not readers:
+            raise Iso7816Exception("[ReaderPool] no readers")
+
+        self.readers = list(readers)
+
+        self.__local = threading.local()                        # Iso7816 object of worker thread
+        self.__lock = threading.Lock()
+        self.__pending = dict.fromkeys(self.readers, 0)        # Number of not finished jobs per reader
+        self.__executors = {reader: concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                                          thread_name_prefix=reader)
+                            for reader in self.readers}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def __session(self, reader):
+        """
+        Connection of current worker thread, it is created on the first job
+        """
+        card = getattr(self.__local, 'card', None)
+
+        if card is None:
+            card = self.__local.card = Iso7816(self.path_to_lib, self.backend)
+            self.__local.connected = False
+
+        if not self.__local.connected:
+            card.connect(reader, self.mode, self.protocol)
+            self.__local.connected = True
+
+        return card
+
+    def __run(self, reader, fn, args, kwargs):
+        try:
+            card = self.__session(reader)
+            try:
+                return fn(card, *args, **kwargs)
+
+            except PcscError:
+                card.disconnect()                               # Card may be removed or reset,
+                self.__local.connected = False                  # the next job connects again
+                raise
+
+        finally:
+            with self.__lock:
+                self.__pending[reader] -= 1
+
+    def __close(self):
+        card = getattr(self.__local, 'card', None)
+
+        if card is not None:
+            card.close()
+            self.__local.card = None
+
+    def submit(self, fn, *args, reader=None, **kwargs):
+        """
+        Schedule job fn(card, *args, **kwargs)
+        :param fn:      callable, the first argument is connected Iso7816 object
+        :param reader:  name of reader, if None - the reader with the least number of pending jobs
+        :return:        concurrent.futures.Future
+        """
+        with self.__lock:
+            if reader is None:
+                reader = min(self.readers, key=self.__pending.__getitem__)
+
+            elif reader not in self.__executors:
+                raise Iso7816Exception("[ReaderPool] unknown reader '{}'".format(reader))
+
+            self.__pending[reader] += 1
+
+        try:
+            return self.__executors[reader].submit(self.__run, reader, fn, args, kwargs)
+
+        except RuntimeError:
+            with self.__lock:
+                self.__pending[reader] -= 1
+            raise
+
+    def submit_all(self, fn, *args, **kwargs):
+        """
+        Schedule job fn(card, *args, **kwargs) on every reader
+        :return:        dict {reader: concurrent.futures.Future}
+        """
+        return {reader: self.submit(fn, *args, reader=reader, **kwargs) for reader in self.readers}
+
+    def shutdown(self, wait=True):
+        """
+        Disconnect all readers and stop worker threads
+        :param wait:    wait for pending jobs
+        """
+        for executor in self.__executors.values():
+            try:
+                executor.submit(self.__close)
+
+            except RuntimeError:                                # Already shut down
+                pass
+
+        for executor in self.__executors.values():
+            executor.shutdown(wait=wait)
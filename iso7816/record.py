@@ -0,0 +1,235 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Binary trace of APDU: recording and replay
+
+    card.recorder = Recorder('session.trc')        # every transmit/get_atr of card is recorded
+    ...
+    card.recorder.close()
+
+    with TraceReader('session.trc') as trace:       # file is memory-mapped, records are not loaded
+        for record in trace:
+            print(record.reader, record.apdu.hex(), record.sw)
+
+        for record, response, sw1, sw2, matched in replay(trace, other_card, timing=True):
+            ...
+
+Format of file: header MAGIC + version (uint16), then records
+    kind (uint8), timestamp ns (uint64), rv of PC/SC (uint32), sw (uint16), reader id (uint16),
+    length of C-APDU (uint32), length of R-APDU (uint32), C-APDU, R-APDU
+Names of readers are stored once in records RECORD_READER (name in place of C-APDU)
+"""
+
+__author__ = 'lem'
+
+import mmap
+import time
+import struct
+import threading
+import collections
+
+from iso7816.exceptions import Iso7816Exception
+
+
+MAGIC = b'I7816TRC'
+VERSION = 1
+
+RECORD_READER = 0
+RECORD_EXCHANGE = 1
+RECORD_ATR = 2
+
+_FILE_HEADER = struct.Struct('<8sH')
+_RECORD_HEADER = struct.Struct('<BQIHHII')
+
+TraceRecord = collections.namedtuple('TraceRecord',
+                                     ['kind', 'timestamp', 'reader', 'rv', 'sw', 'apdu', 'response'])
+
+
+class Recorder:
+    """
+    Writer of binary trace, one object may be shared by several Iso7816 objects and threads
+    """
+
+    def __init__(self, filename, buffering=1024 * 1024):
+        """
+        :param filename:    name of trace file, new records are appended
+        :param buffering:   size of write buffer
+        """
+        self.__file = open(filename, 'ab', buffering=buffering)
+        self.__lock = threading.Lock()
+        self.__readers = {}                                     # {reader name: id}
+
+        if self.__file.tell() == 0:
+            self.__file.write(_FILE_HEADER.pack(MAGIC, VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __reader_id(self, reader):
+        """
+        Must be called under lock
+        """
+        try:
+            return self.__readers[reader]
+
+        except KeyError:
+            reader_id = self.__readers[reader] = len(self.__readers)
+            name = (reader or '').encode()
+            self.__file.write(_RECORD_HEADER.pack(RECORD_READER, time.time_ns(), 0, 0, reader_id, len(name), 0))
+            self.__file.write(name)
+            return reader_id
+
+    def write(self, kind, reader, rv, apdu, response):
+        """
+        Write one record
+        :param kind:        RECORD_EXCHANGE or RECORD_ATR
+        :param reader:      name of reader
+        :param rv:          returned value of PC/SC function
+        :param apdu:        C-APDU (buffer), empty for ATR
+        :param response:    R-APDU with SW1 SW2 or ATR (buffer)
+        """
+        timestamp = time.time_ns()
+        sw = (response[-2] << 8) | response[-1] if kind == RECORD_EXCHANGE and len(response) >= 2 else 0
+
+        with self.__lock:
+            reader_id = self.__reader_id(reader)
+            self.__file.write(_RECORD_HEADER.pack(kind, timestamp, rv & 0xFFFFFFFF, sw, reader_id,
+                                                  len(apdu), len(response)))
+            self.__file.write(apdu)
+            self.__file.write(response)
+
+    def exchange(self, reader, rv, apdu, response):
+        self.write(RECORD_EXCHANGE, reader, rv, apdu, response)
+
+    def atr(self, reader, rv, raw_atr):
+        self.write(RECORD_ATR, reader, rv, b'', raw_atr)
+
+    def flush(self):
+        with self.__lock:
+            self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+class TraceReader:
+    """
+    Reader of binary trace, the file is memory-mapped
+    'apdu' and 'response' of records are memoryview of file, they are valid until 'close'
+    """
+
+    def __init__(self, filename):
+        self.__file = open(filename, 'rb')
+
+        try:
+            self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        except ValueError:                                      # Empty file
+            self.__file.close()
+            raise Iso7816Exception("[TraceReader] wrong trace file '{}'".format(filename))
+
+        self.__view = memoryview(self.__mmap)
+
+        if len(self.__view) < _FILE_HEADER.size:
+            self.close()
+            raise Iso7816Exception("[TraceReader] wrong trace file '{}'".format(filename))
+
+        magic, version = _FILE_HEADER.unpack_from(self.__view)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise Iso7816Exception("[TraceReader] wrong trace file '{}'".format(filename))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self):
+        return self.records()
+
+    def records(self, kinds=(RECORD_EXCHANGE, RECORD_ATR)):
+        """
+        Iterate records
+        :param kinds:   kinds of records to return
+        :return:        generator of TraceRecord, 'reader' is name of reader
+        """
+        view = self.__view
+        size = len(view)
+        offset = _FILE_HEADER.size
+        header_size = _RECORD_HEADER.size
+        unpack_from = _RECORD_HEADER.unpack_from
+        readers = {}
+
+        while offset + header_size <= size:
+            kind, timestamp, rv, sw, reader_id, apdu_len, response_len = unpack_from(view, offset)
+            offset += header_size
+
+            apdu = view[offset:offset + apdu_len]
+            offset += apdu_len
+            response = view[offset:offset + response_len]
+            offset += response_len
+
+            if offset > size:                                   # Truncated record of not closed trace
+                break
+
+            if kind == RECORD_READER:
+                readers[reader_id] = bytes(apdu).decode()
+
+            elif kind in kinds:
+                yield TraceRecord(kind, timestamp, readers.get(reader_id), rv, sw, apdu, response)
+
+    def close(self):
+        self.__view.release()
+
+        try:
+            self.__mmap.close()
+
+        except BufferError:
+            raise Iso7816Exception("[TraceReader] records are still referenced, copy them by bytes() before close")
+
+        self.__file.close()
+
+
+def replay(records, card, timing=False, speed=1.0):
+    """
+    Send C-APDU of trace to card
+    :param records:     iterable of TraceRecord (e.g. TraceReader)
+    :param card:        connected Iso7816 object (real or simulated reader)
+    :param timing:      if True - keep original intervals between C-APDU
+                        if False - send C-APDU at maximum speed
+    :param speed:       multiplier of speed for 'timing'
+    :return:            generator of (record, response (bytes), sw1, sw2, matched)
+                        'matched' - R-APDU is the same as in trace
+    """
+    first_timestamp = None
+    time_start = None
+
+    for record in records:
+        if record.kind != RECORD_EXCHANGE:
+            continue
+
+        if timing:
+            if first_timestamp is None:
+                first_timestamp = record.timestamp
+                time_start = time.perf_counter()
+            else:
+                delay = (record.timestamp - first_timestamp) / 1e9 / speed - (time.perf_counter() - time_start)
+                if delay > 0:
+                    time.sleep(delay)
+
+        response, sw1, sw2 = card.transmit_into(record.apdu)
+        response = response.tobytes()
+
+        expected = record.response
+        matched = (len(expected) == len(response) + 2 and
+                   expected[:-2] == response and
+                   (expected[-2] << 8 | expected[-1]) == (sw1 << 8 | sw2))
+
+        yield record, response, sw1, sw2, matched
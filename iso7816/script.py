@@ -0,0 +1,263 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+APDU script runner
+
+Format of script (one command per line):
+
+    # comment
+    SET AID = A0 00 00 00 03 10 10             set variable
+    00 A4 04 00 07 $AID                         C-APDU without check of R-APDU
+    00 A4 04 00 07 ${AID} > * 90 00             C-APDU and expected R-APDU
+    00 B0 00 00 02 > 12 XX 90 00
+
+Expected R-APDU is a mask of response data + SW1 SW2:
+    XX      - any byte
+    6X, X0  - any nibble
+    *       - any number of bytes
+
+Script is streamed: each line is parsed when it is reached, a mask is compiled once and reused by all lines.
+'load' parses the whole script in advance, so errors of script (wrong mask, unknown variable) are raised
+before the first C-APDU and the loaded script is run many times without parsing
+"""
+
+__author__ = 'lem'
+
+import re
+import time
+import collections
+import contextlib
+
+from iso7816.exceptions import Iso7816Exception
+
+
+ScriptResult = collections.namedtuple('ScriptResult',
+                                      ['line_no', 'apdu', 'response', 'sw1', 'sw2', 'latency', 'matched'])
+
+# Command of loaded script: C-APDU (bytes), mask (str or None) and its compiled regular expression
+ScriptCommand = collections.namedtuple('ScriptCommand', ['line_no', 'apdu', 'mask', 'pattern'])
+
+_RE_VARIABLE = re.compile(r'\$\{(\w+)\}|\$(\w+)')
+_RE_SET = re.compile(r'^SET\s+(\w+)\s*=\s*(.*)$', re.IGNORECASE)
+
+
+def compile_mask(mask):
+    """
+    Compile expected R-APDU mask to regular expression
+    :param mask:    string "* 90 00", "6F XX 84 * 90 00", "61 XX" ...
+    :return:        compiled regular expression for bytes
+    """
+    pattern = []
+
+    for token in mask.replace('*', ' * ').split():
+        if token == '*':
+            pattern.append(b'.*')
+            continue
+
+        if len(token) % 2:
+            raise Iso7816Exception("Wrong mask of R-APDU: {}".format(mask))
+
+        for i in range(0, len(token), 2):
+            high, low = token[i].upper(), token[i + 1].upper()
+            try:
+                if high == 'X' and low == 'X':
+                    pattern.append(b'.')
+                elif high == 'X':
+                    pattern.append(b'[' + b''.join(re.escape(bytes((h << 4 | int(low, 16),)))
+                                                   for h in range(16)) + b']')
+                elif low == 'X':
+                    first = int(high, 16) << 4
+                    pattern.append(b'[' + re.escape(bytes((first,))) + b'-' +
+                                   re.escape(bytes((first | 0xF,))) + b']')
+                else:
+                    pattern.append(re.escape(bytes((int(high + low, 16),))))
+
+            except ValueError:
+                raise Iso7816Exception("Wrong mask of R-APDU: {}".format(mask))
+
+    return re.compile(b''.join(pattern), re.DOTALL)
+
+
+def read_script(lines):
+    """
+    Lazily parse lines of script
+    :param lines:   iterable of lines (e.g. opened file)
+    :return:        generator of (line_no, kind, payload)
+                    kind = 'set'  - payload = (name, value)
+                    kind = 'apdu' - payload = (apdu, mask or None)
+    """
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+
+        if not line or line.startswith('#'):
+            continue
+
+        match = _RE_SET.match(line)
+        if match:
+            yield line_no, 'set', (match.group(1), match.group(2).strip())
+            continue
+
+        apdu, _, mask = line.partition('>')
+        yield line_no, 'apdu', (apdu.strip(), mask.strip() or None)
+
+
+class ScriptRunner:
+    """
+    Run APDU script on connected Iso7816 object
+    Statistic of the last run is stored in 'stats':
+        {'apdus': <number of APDU>, 'failed': <number of mismatched R-APDU>,
+         'time': <seconds>, 'apdu_per_sec': <APDU per second>}
+    """
+
+    def __init__(self, card, variables=None, auto_get_response=False, stop_on_mismatch=True):
+        """
+        :param card:                connected Iso7816 object
+        :param variables:           dict of initial variables {'AID': 'A0 00 00 00 03'}
+        :param auto_get_response:   see 'Iso7816.transmit'
+        :param stop_on_mismatch:    raise Iso7816Exception on the first unexpected R-APDU
+        """
+        self.card = card
+        self.variables = dict(variables or {})
+        self.auto_get_response = auto_get_response
+        self.stop_on_mismatch = stop_on_mismatch
+        self.stats = None
+        self.__masks = {}                                       # Compiled masks, shared by all lines
+
+    def __substitute(self, text, line_no):
+        if '$' not in text:
+            return text
+
+        def value(match):
+            name = match.group(1) or match.group(2)
+            try:
+                return self.variables[name]
+
+            except KeyError:
+                raise Iso7816Exception("[script] line {}: unknown variable '{}'".format(line_no, name))
+
+        return _RE_VARIABLE.sub(value, text)
+
+    def __mask(self, mask, line_no):
+        try:
+            return self.__masks[mask]
+
+        except KeyError:
+            try:
+                compiled = self.__masks[mask] = compile_mask(mask)
+
+            except Iso7816Exception as e:
+                raise Iso7816Exception("[script] line {}: {}".format(line_no, e.msg))
+
+            return compiled
+
+    def commands(self, script):
+        """
+        Lazily parse script: variables are substituted, C-APDU are converted to bytes and masks are compiled
+        (once per distinct mask) as lines are read
+        :param script:  path to file of script or iterable of lines
+        :return:        generator of ScriptCommand
+        """
+        with contextlib.ExitStack() as stack:
+            if isinstance(script, str):
+                script = stack.enter_context(open(script))
+
+            for line_no, kind, payload in read_script(script):
+                if kind == 'set':
+                    name, value = payload
+                    self.variables[name] = self.__substitute(value, line_no)
+                    continue
+
+                text, mask = payload
+                apdu = bytes(self.card.to_bytes(self.__substitute(text, line_no)))
+
+                pattern = None
+                if mask is not None:
+                    mask = self.__substitute(mask, line_no)
+                    pattern = self.__mask(mask, line_no)
+
+                yield ScriptCommand(line_no, apdu, mask, pattern)
+
+    def load(self, script):
+        """
+        Parse the whole script in advance (optional): errors of script are raised before the first C-APDU
+        is sent and the result is run many times without parsing
+        :param script:  path to file of script or iterable of lines
+        :return:        list of ScriptCommand
+        """
+        return list(self.commands(script))
+
+    def run(self, script, transaction=False):
+        """
+        Run script, it is streamed line by line (the next line is parsed after the previous C-APDU)
+        :param script:          path to file of script, iterable of lines or result of 'load'
+        :param transaction:     if True - the whole script is run inside one transaction
+        :return:                generator of ScriptResult
+        """
+        with contextlib.ExitStack() as stack:
+            if isinstance(script, list) and script and isinstance(script[0], ScriptCommand):
+                commands = script                               # Loaded script
+            else:
+                commands = stack.enter_context(contextlib.closing(self.commands(script)))
+
+            if transaction:
+                stack.enter_context(self.card.transaction())
+
+            apdus = 0
+            failed = 0
+            time_start = time.perf_counter()
+
+            try:
+                for line_no, apdu, mask, pattern in commands:
+                    time_apdu = time.perf_counter()
+                    if self.auto_get_response:
+                        response, sw1, sw2 = self.card.transmit_chain(apdu)
+                        response = bytes(response)
+                    else:
+                        response, sw1, sw2 = self.card.transmit_into(apdu)
+                        response = response.tobytes()
+                    latency = time.perf_counter() - time_apdu
+                    apdus += 1
+
+                    matched = pattern is None or pattern.fullmatch(response + bytes((sw1, sw2))) is not None
+
+                    if not matched:
+                        failed += 1
+                        if self.stop_on_mismatch:
+                            raise Iso7816Exception("[script] line {}: unexpected R-APDU {} {:02X} {:02X}, "
+                                                   "expected {}".format(line_no, response.hex().upper(),
+                                                                        sw1, sw2, mask))
+
+                    yield ScriptResult(line_no, apdu, response, sw1, sw2, latency, matched)
+
+            finally:
+                elapsed = time.perf_counter() - time_start
+                self.stats = {'apdus': apdus,
+                              'failed': failed,
+                              'time': elapsed,
+                              'apdu_per_sec': apdus / elapsed if elapsed else 0.0}
+
+
+if __name__ == '__main__':
+    import sys
+    import iso7816
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m iso7816.script <script> [reader]")
+        sys.exit(1)
+
+    my_card = iso7816.Iso7816()
+    readers = my_card.get_readers()
+    my_card.connect(sys.argv[2] if len(sys.argv) > 2 else readers[0])
+
+    runner = ScriptRunner(my_card, auto_get_response=True)
+    for result in runner.run(sys.argv[1]):
+        print("{:>6}  {:>8.3f} ms  {}  ->  {}{:02X}{:02X}".format(result.line_no,
+                                                                 result.latency * 1000,
+                                                                 result.apdu.hex().upper(),
+                                                                 result.response.hex().upper(),
+                                                                 result.sw1,
+                                                                 result.sw2))
+
+    print("{apdus} APDU, {time:.3f} s, {apdu_per_sec:.1f} APDU/s".format(**runner.stats))
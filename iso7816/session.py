@@ -0,0 +1,133 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import threading
+import contextlib
+
+from iso7816 import constants
+from iso7816.core import Iso7816, PCSC_LIB
+from iso7816.exceptions import PcscError, CardResetError
+
+
+class SessionCache:
+    """
+    Keep connections to readers open between jobs, so back-to-back jobs on the same card
+    don't pay SCardConnect and cold reset of the card
+
+        cache = SessionCache()
+        with cache.session(reader) as card:         # the first job - SCardConnect
+            card.transmit(...)
+        with cache.session(reader, reset=True) as card:   # the next job - warm reset by SCardReconnect
+            card.transmit(...)
+        cache.close()
+
+    The object isn't shared by threads: PC/SC context of each connection belongs to thread which creates it
+    """
+
+    def __init__(self,
+                 path_to_lib=PCSC_LIB,
+                 backend=None,
+                 mode=constants.SCARD_SHARE_SHARED,
+                 protocol=constants.SCARD_PROTOCOL_T0 | constants.SCARD_PROTOCOL_T1,
+                 disposition=constants.SCARD_UNPOWER_CARD):
+        """
+        :param path_to_lib:     path to PC/SC library
+        :param backend:         iso7816.backend.Backend, if None - PcscBackend of 'path_to_lib'
+        :param mode:            mode of connection, see 'Iso7816.connect'
+        :param protocol:        protocol of connection, see 'Iso7816.connect'
+        :param disposition:     action with cards in 'close'
+        """
+        self.path_to_lib = path_to_lib
+        self.backend = backend
+        self.mode = mode
+        self.protocol = protocol
+        self.disposition = disposition
+
+        self.__sessions = {}                                    # {reader: Iso7816}
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, reader, reset=False):
+        """
+        Connected Iso7816 object of reader
+        :param reader:      name of reader
+        :param reset:       if True - warm reset of cached connection (SCardReconnect)
+        :return:            Iso7816
+        """
+        with self.__lock:
+            card = self.__sessions.get(reader)
+
+        if card is None or card.hwnd_reader is None:
+            if card is None:
+                card = Iso7816(self.path_to_lib, self.backend)
+                card.disposition = constants.SCARD_LEAVE_CARD
+
+            card.connect(reader, self.mode, self.protocol)
+
+            with self.__lock:
+                self.__sessions[reader] = card
+
+        elif reset:
+            card.reconnect(self.mode, self.protocol, constants.SCARD_RESET_CARD)
+
+        else:
+            try:
+                card.get_atr()                                  # SCardStatus - check of handle
+
+            except CardResetError:
+                card.reconnect(self.mode, self.protocol, constants.SCARD_LEAVE_CARD)
+
+            except PcscError:
+                card.disconnect(constants.SCARD_LEAVE_CARD)
+                card.connect(reader, self.mode, self.protocol)
+
+        return card
+
+    @contextlib.contextmanager
+    def session(self, reader, reset=False):
+        """
+        Context manager of cached connection, connection is dropped if job raises PcscError
+        (errors of status word keep the connection)
+        :param reader:      name of reader
+        :param reset:       see 'get'
+        :return:            Iso7816
+        """
+        card = self.get(reader, reset)
+
+        try:
+            yield card
+
+        except PcscError:
+            self.drop(reader, constants.SCARD_LEAVE_CARD)
+            raise
+
+    def drop(self, reader, disposition=None):
+        """
+        Disconnect and forget connection of reader
+        :param reader:          name of reader
+        :param disposition:     action with the card, if None - 'disposition' of cache
+        """
+        with self.__lock:
+            card = self.__sessions.pop(reader, None)
+
+        if card is not None:
+            card.close(self.disposition if disposition is None else disposition)
+
+    def close(self, disposition=None):
+        """
+        Disconnect all cached connections
+        :param disposition:     action with the cards, if None - 'disposition' of cache
+        """
+        with self.__lock:
+            readers = list(self.__sessions)
+
+        for reader in readers:
+            self.drop(reader, disposition)
@@ -0,0 +1,391 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import time
+import ctypes
+import itertools
+import threading
+
+from iso7816 import constants
+from iso7816.backend import Backend
+
+
+DEFAULT_ATR = bytes((0x3B, 0x80, 0x80, 0x01, 0x01))        # T=1, no historical bytes
+
+
+class SimulatedCard:
+    """
+    Card of SimulatedBackend
+
+        card = SimulatedCard(responses={b'\\x00\\xA4\\x04\\x00': b'\\x90\\x00'},
+                             handler=lambda apdu: b'\\x6A\\x82' if apdu[1] == 0xB0 else None)
+    """
+
+    def __init__(self,
+                 atr=DEFAULT_ATR,
+                 responses=None,
+                 handler=None,
+                 protocol=constants.SCARD_PROTOCOL_T1,
+                 default_response=b'\x6D\x00'):
+        """
+        :param atr:                 ATR of card
+        :param responses:           dict {C-APDU (bytes): R-APDU with SW (bytes)}
+        :param handler:             callable(C-APDU) -> R-APDU or None, used if C-APDU is not in 'responses'
+        :param protocol:            supported protocols SCARD_PROTOCOL_T0/SCARD_PROTOCOL_T1
+        :param default_response:    R-APDU if neither 'responses' nor 'handler' answers
+        """
+        self.atr = bytes(atr)
+        self.responses = {bytes(apdu): bytes(response) for apdu, response in (responses or {}).items()}
+        self.handler = handler
+        self.protocol = protocol
+        self.default_response = bytes(default_response)
+
+    def process(self, apdu):
+        """
+        :param apdu:    C-APDU (bytes)
+        :return:        R-APDU with SW (bytes)
+        """
+        try:
+            return self.responses[apdu]
+
+        except KeyError:
+            if self.handler is not None:
+                response = self.handler(apdu)
+                if response is not None:
+                    return bytes(response)
+
+            return self.default_response
+
+    def reset(self):
+        """
+        Called on reset/power off of card, redefine to clear state of card
+        """
+
+
+class _Reader:
+    __slots__ = ('card', 'events', 'resets')
+
+    def __init__(self, card):
+        self.card = card
+        self.events = 0                                         # Counter of insertion/removal
+        self.resets = 0                                         # Counter of reset of card
+
+
+class _Connection:
+    __slots__ = ('reader', 'events', 'resets', 'protocol')
+
+    def __init__(self, reader, events, resets, protocol):
+        self.reader = reader
+        self.events = events
+        self.resets = resets
+        self.protocol = protocol
+
+
+class SimulatedBackend(Backend):
+    """
+    Pure Python PC/SC backend with virtual readers and cards
+
+        backend = SimulatedBackend({'Reader 0': SimulatedCard(), 'Reader 1': None}, latency=0.002)
+        card = Iso7816(backend=backend)
+        backend.insert('Reader 1', SimulatedCard(atr=...))
+
+    Transactions are accepted but don't lock the reader
+    """
+
+    def __init__(self, readers=None, latency=0.0, attributes=None):
+        """
+        :param readers:     dict {name of reader: SimulatedCard or None}
+                            or list of names of readers (each one with SimulatedCard())
+                            if None - one reader with SimulatedCard()
+        :param latency:     delay (seconds) of every transmit, GIL is released as in real library
+        :param attributes:  dict {id of attribute: bytes}, added to default attributes of readers
+        """
+        if readers is None:
+            readers = {'Simulated Reader 0': SimulatedCard()}
+
+        elif not isinstance(readers, dict):
+            readers = {name: SimulatedCard() for name in readers}
+
+        self.latency = latency
+        self.attributes = {
+            constants.ATTRIB_SMART_CARD['VENDOR_NAME']: b'iso7816\x00',
+            constants.ATTRIB_SMART_CARD['VENDOR_IFD_TYPE']: b'Simulated Reader\x00',
+            constants.ATTRIB_SMART_CARD['VENDOR_IFD_VERSION']: (0x01000000).to_bytes(4, 'little'),
+            constants.ATTRIB_SMART_CARD['VENDOR_IFD_SERIAL_NO']: b'0000000000\x00',
+            constants.ATTRIB_SMART_CARD['MAXINPUT']: constants.MAX_BUFFER_SIZE_EXTENDED.to_bytes(4, 'little'),
+            constants.ATTRIB_SMART_CARD['MAX_IFSD']: (254).to_bytes(4, 'little'),
+        }
+        self.attributes.update(attributes or {})
+
+        self.__condition = threading.Condition()
+        self.__readers = {name: _Reader(card) for name, card in readers.items()}
+        self.__contexts = {}                                    # {context: number of cancels}
+        self.__waiting = {}                                     # {context: number of waiting threads}
+        self.__connections = {}                                 # {card: _Connection}
+        self.__handles = itertools.count(0x10000)
+
+    # Control of virtual readers
+
+    def add_reader(self, name, card=None):
+        with self.__condition:
+            self.__readers[name] = _Reader(card)
+            self.__condition.notify_all()
+
+    def remove_reader(self, name):
+        with self.__condition:
+            del self.__readers[name]
+            self.__condition.notify_all()
+
+    def insert(self, name, card):
+        with self.__condition:
+            reader = self.__readers[name]
+            reader.card = card
+            reader.events += 1
+            self.__condition.notify_all()
+
+    def remove(self, name):
+        with self.__condition:
+            reader = self.__readers[name]
+            reader.card = None
+            reader.events += 1
+            self.__condition.notify_all()
+
+    # Backend
+
+    def __connection(self, card):
+        """
+        Must be called under lock
+        :return: rv, _Connection, _Reader
+        """
+        connection = self.__connections.get(card)
+        if connection is None:
+            return constants.SCARD_E_INVALID_HANDLE, None, None
+
+        reader = self.__readers.get(connection.reader)
+        if reader is None:
+            return constants.SCARD_E_READER_UNAVAILABLE, connection, None
+
+        if reader.events != connection.events or reader.card is None:
+            return constants.SCARD_W_REMOVED_CARD, connection, reader
+
+        if reader.resets != connection.resets:
+            return constants.SCARD_W_RESET_CARD, connection, reader
+
+        return 0, connection, reader
+
+    def establish_context(self, scope):
+        with self.__condition:
+            context = next(self.__handles)
+            self.__contexts[context] = 0
+            return 0, context
+
+    def release_context(self, context):
+        with self.__condition:
+            if self.__contexts.pop(context, None) is None:
+                return constants.SCARD_E_INVALID_HANDLE
+            return 0
+
+    def list_readers(self, context):
+        with self.__condition:
+            if not self.__readers:
+                return constants.SCARD_E_NO_READERS_AVAILABLE, []
+            return 0, list(self.__readers)
+
+    def connect(self, context, reader, mode, protocol):
+        with self.__condition:
+            if reader not in self.__readers:
+                return constants.SCARD_E_UNKNOWN_READER, 0, 0
+
+            sim_reader = self.__readers[reader]
+            active_protocol = 0
+
+            if mode != constants.SCARD_SHARE_DIRECT:
+                if sim_reader.card is None:
+                    return constants.SCARD_E_NO_SMARTCARD, 0, 0
+
+                active_protocol = sim_reader.card.protocol & protocol
+                if not active_protocol:
+                    return constants.SCARD_E_PROTO_MISMATCH, 0, 0
+
+                active_protocol &= -active_protocol                 # The lowest supported protocol
+
+            card = next(self.__handles)
+            self.__connections[card] = _Connection(reader, sim_reader.events, sim_reader.resets, active_protocol)
+
+            return 0, card, active_protocol
+
+    def reconnect(self, card, mode, protocol, initialization):
+        with self.__condition:
+            rv, connection, reader = self.__connection(card)
+            if connection is None or reader is None or reader.card is None:
+                return rv or constants.SCARD_E_NO_SMARTCARD, 0
+
+            active_protocol = reader.card.protocol & protocol
+            if not active_protocol:
+                return constants.SCARD_E_PROTO_MISMATCH, 0
+            active_protocol &= -active_protocol
+
+            if initialization in (constants.SCARD_RESET_CARD, constants.SCARD_UNPOWER_CARD):
+                reader.card.reset()
+                reader.resets += 1
+
+            connection.events = reader.events
+            connection.resets = reader.resets
+            connection.protocol = active_protocol
+
+            return 0, active_protocol
+
+    def disconnect(self, card, disposition):
+        with self.__condition:
+            rv, connection, reader = self.__connection(card)
+            if connection is None:
+                return rv
+
+            del self.__connections[card]
+
+            if rv == 0 and disposition in (constants.SCARD_RESET_CARD, constants.SCARD_UNPOWER_CARD):
+                reader.card.reset()
+                reader.resets += 1
+
+            return 0
+
+    def status(self, card):
+        with self.__condition:
+            rv, connection, reader = self.__connection(card)
+            if rv:
+                return rv, b'', 0
+            return 0, reader.card.atr, connection.protocol
+
+    def transmit(self, card, pci, apdu, apdu_len, rx_buffer, rx_len):
+        with self.__condition:
+            rv, connection, reader = self.__connection(card)
+            if rv:
+                return rv
+            sim_card = reader.card
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        response = sim_card.process(bytes(apdu[:apdu_len]))
+
+        if len(response) > rx_len.value:
+            rx_len.value = len(response)
+            return constants.SCARD_E_INSUFFICIENT_BUFFER
+
+        ctypes.memmove(rx_buffer, response, len(response))
+        rx_len.value = len(response)
+
+        return 0
+
+    def begin_transaction(self, card):
+        with self.__condition:
+            return self.__connection(card)[0]
+
+    def end_transaction(self, card, disposition):
+        with self.__condition:
+            rv, connection, reader = self.__connection(card)
+            if rv == 0 and disposition in (constants.SCARD_RESET_CARD, constants.SCARD_UNPOWER_CARD):
+                reader.card.reset()
+                reader.resets += 1
+                connection.resets = reader.resets
+            return rv
+
+    def __event_state(self, name):
+        """
+        Must be called under lock
+        :return: state of reader, ATR
+        """
+        if name == constants.PNP_NOTIFICATION:
+            return len(self.__readers) << 16, b''
+
+        reader = self.__readers.get(name)
+        if reader is None:
+            return constants.SCARD_STATE_UNKNOWN, b''
+
+        if reader.card is None:
+            return constants.SCARD_STATE_EMPTY | (reader.events << 16), b''
+
+        return constants.SCARD_STATE_PRESENT | (reader.events << 16), reader.card.atr
+
+    def get_status_change(self, context, timeout, reader_states):
+        deadline = None if timeout == constants.INFINITE else time.monotonic() + timeout / 1000
+
+        with self.__condition:
+            if context not in self.__contexts:
+                return constants.SCARD_E_INVALID_HANDLE
+
+            cancels = self.__contexts[context]
+            self.__waiting[context] = self.__waiting.get(context, 0) + 1
+
+            try:
+                while True:
+                    if self.__contexts.get(context, cancels) != cancels:
+                        return constants.SCARD_E_CANCELLED
+
+                    changed = False
+                    for state in reader_states:
+                        if state.dwCurrentState & constants.SCARD_STATE_IGNORE:
+                            continue
+
+                        event_state, atr = self.__event_state(state.szReader.decode())
+                        if event_state != state.dwCurrentState & ~constants.SCARD_STATE_CHANGED:
+                            event_state |= constants.SCARD_STATE_CHANGED
+                            changed = True
+
+                        state.dwEventState = event_state
+                        state.cbAtr = len(atr)
+                        ctypes.memmove(state.rgbAtr, atr, len(atr))
+
+                    if changed:
+                        return 0
+
+                    if deadline is None:
+                        self.__condition.wait()
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return constants.SCARD_E_TIMEOUT
+                        self.__condition.wait(remaining)
+
+            finally:
+                self.__waiting[context] -= 1
+
+    def cancel(self, context):
+        with self.__condition:
+            if context not in self.__contexts:
+                return constants.SCARD_E_INVALID_HANDLE
+
+            if self.__waiting.get(context):                     # Only waiting requests are cancelled
+                self.__contexts[context] += 1
+                self.__condition.notify_all()
+
+            return 0
+
+    def get_attrib(self, card, attrib, buffer=None):
+        with self.__condition:
+            rv, connection, reader = self.__connection(card)
+            if rv:
+                return rv, b''
+
+            if attrib == constants.ATTRIB_SMART_CARD['ATR_STRING']:
+                return 0, reader.card.atr
+
+            if attrib == constants.ATTRIB_SMART_CARD['CURRENT_PROTOCOL_TYPE']:
+                return 0, connection.protocol.to_bytes(4, 'little')
+
+            try:
+                return 0, self.attributes[attrib]
+
+            except KeyError:
+                return constants.SCARD_E_UNSUPPORTED_FEATURE, b''
+
+    def control(self, card, control_code, data, response_size):
+        with self.__condition:
+            rv = self.__connection(card)[0]
+            if rv and rv != constants.SCARD_W_REMOVED_CARD:
+                return rv, b''
+
+        return constants.SCARD_E_UNSUPPORTED_FEATURE, b''
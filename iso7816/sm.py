@@ -0,0 +1,627 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Secure messaging: GlobalPlatform SCP02, SCP03 and ISO/IEC 7816-4 SM (ICAO 9303 BAC/PACE)
+
+    channel = Scp03(card, enc_key, mac_key, security_level=C_MAC | C_DECRYPTION | R_MAC).open()
+    rx, sw1, sw2 = channel.transmit('80 CA 00 66 00')                   # wrapped and unwrapped
+    for rx, sw1, sw2 in channel.transmit_many(apdus):                   # one transaction
+        ...
+
+    channel = IsoSm(card, ks_enc, ks_mac, ssc)                          # session keys of BAC/PACE
+    rx, sw1, sw2 = channel.transmit('00 B0 00 00 00')
+
+Session keys are derived once per channel, cipher and MAC contexts are created once per key and reused:
+CBC with another IV continues the same context (the IV is folded into the first block).
+Package 'cryptography' is required.
+"""
+
+__author__ = 'lem'
+
+import os
+
+from iso7816 import sw
+from iso7816 import tlv
+from iso7816.apdu import decode_apdu, encode_apdu, MAX_SHORT_LC, MAX_SHORT_LE
+from iso7816.exceptions import Iso7816Exception, SecureMessagingError
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.cmac import CMAC
+
+except ImportError:                                             # Secure messaging is optional
+    Cipher = None
+
+try:
+    from cryptography.hazmat.decrepit.ciphers.algorithms import TripleDES
+
+except ImportError:
+    TripleDES = algorithms.TripleDES if Cipher is not None else None
+
+
+# Security level of GlobalPlatform secure channel (P1 of EXTERNAL AUTHENTICATE)
+NO_SECURITY = 0x00
+C_MAC = 0x01
+C_DECRYPTION = 0x02
+R_MAC = 0x10
+R_ENCRYPTION = 0x20
+
+# Derivation constants of SCP03 (GlobalPlatform Amendment D)
+SCP03_CARD_CRYPTOGRAM = 0x00
+SCP03_HOST_CRYPTOGRAM = 0x01
+SCP03_S_ENC = 0x04
+SCP03_S_MAC = 0x06
+SCP03_S_RMAC = 0x07
+
+# Derivation constants of SCP02 (GlobalPlatform 2.2 Appendix E)
+SCP02_S_MAC = b'\x01\x01'
+SCP02_S_RMAC = b'\x01\x02'
+SCP02_S_DEK = b'\x01\x81'
+SCP02_S_ENC = b'\x01\x82'
+
+
+def _check_backend():
+    if Cipher is None:
+        raise Iso7816Exception("Secure messaging requires package 'cryptography'")
+
+
+def _des3(key):
+    """
+    :param key:     DES key (8 bytes), 2-key or 3-key 3DES (16 or 24 bytes)
+    :return:        TripleDES with 3-key form of key
+    """
+    key = bytes(key)
+    return TripleDES((key * 3)[:24] if len(key) == 8 else key + key[:8] if len(key) == 16 else key)
+
+
+def _xor(a, b):
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+
+def pad(data, block_size):
+    """
+    Padding of ISO/IEC 9797-1 method 2: '80' and zeros up to multiple of block size
+    :return: bytes
+    """
+    data = bytes(data) + b'\x80'
+    return data + bytes(-len(data) % block_size)
+
+
+def unpad(data):
+    """
+    Remove padding of ISO/IEC 9797-1 method 2
+    :return: bytes
+    """
+    data = bytes(data).rstrip(b'\x00')
+
+    if not data or data[-1] != 0x80:
+        raise SecureMessagingError("Wrong padding of decrypted data")
+
+    return data[:-1]
+
+
+def _secure_cla(cla):
+    return cla | 0x20 if cla & 0x40 else cla | 0x04             # Further interindustry class has own SM bit
+
+
+class BlockCipher:
+    """
+    Cipher contexts of one key, they are created once and reused by all commands
+    """
+
+    __slots__ = ('block_size', '__ecb_encryptor', '__ecb_decryptor', '__cbc_encryptor', '__cbc_decryptor',
+                 '__encrypt_chain', '__decrypt_chain')
+
+    def __init__(self, algorithm):
+        """
+        :param algorithm:   algorithms.AES(key) or TripleDES(key) of 24 bytes
+        """
+        _check_backend()
+
+        self.block_size = algorithm.block_size // 8
+        zero = bytes(self.block_size)
+
+        self.__ecb_encryptor = Cipher(algorithm, modes.ECB()).encryptor()
+        self.__ecb_decryptor = Cipher(algorithm, modes.ECB()).decryptor()
+        self.__cbc_encryptor = Cipher(algorithm, modes.CBC(zero)).encryptor()
+        self.__cbc_decryptor = Cipher(algorithm, modes.CBC(zero)).decryptor()
+        self.__encrypt_chain = zero                             # The last cipher block of CBC contexts
+        self.__decrypt_chain = zero
+
+    def encrypt_block(self, block):
+        return self.__ecb_encryptor.update(block)
+
+    def decrypt_block(self, block):
+        return self.__ecb_decryptor.update(block)
+
+    def __check_length(self, data):
+        """
+        Partial block would stay in CBC context and corrupt all the next operations
+        :return: block size
+        """
+        if not data or len(data) % self.block_size:
+            raise SecureMessagingError("Wrong length of CBC data: {}".format(len(data)))
+
+        return self.block_size
+
+    def encrypt_cbc(self, data, iv=None):
+        """
+        :param data:    bytes, length is multiple of block size
+        :param iv:      initial vector, None - zeros
+        :return:        bytes
+        """
+        size = self.__check_length(data)
+        chain = self.__encrypt_chain if iv is None else _xor(iv, self.__encrypt_chain)
+        encrypted = self.__cbc_encryptor.update(_xor(data[:size], chain) + data[size:])
+        self.__encrypt_chain = encrypted[-size:]
+
+        return encrypted
+
+    def decrypt_cbc(self, data, iv=None):
+        """
+        :param data:    bytes, length is multiple of block size
+        :param iv:      initial vector, None - zeros
+        :return:        bytes
+        """
+        size = self.__check_length(data)
+        chain = self.__decrypt_chain if iv is None else _xor(iv, self.__decrypt_chain)
+        decrypted = self.__cbc_decryptor.update(data)
+        self.__decrypt_chain = bytes(data[-size:])
+
+        return _xor(decrypted[:size], chain) + decrypted[size:]
+
+
+class AesCmac:
+    """
+    CMAC of AES, the keyed context is copied for each MAC
+    """
+
+    __slots__ = ('__context',)
+
+    def __init__(self, key):
+        _check_backend()
+        self.__context = CMAC(algorithms.AES(bytes(key)))
+
+    def mac(self, *parts):
+        context = self.__context.copy()
+        for part in parts:
+            context.update(part)
+
+        return context.finalize()
+
+
+class RetailMac:
+    """
+    MAC of ISO/IEC 9797-1 algorithm 3 (DES, the last block with 3DES) with padding method 2
+    """
+
+    __slots__ = ('__k1', '__k2')
+
+    def __init__(self, key):
+        _check_backend()
+        key = bytes(key)
+        self.__k1 = BlockCipher(_des3(key[:8]))
+        self.__k2 = BlockCipher(_des3(key[8:16]))
+
+    def mac(self, data, iv=None):
+        last = self.__k1.encrypt_cbc(pad(data, 8), iv)[-8:]
+        return self.__k1.encrypt_block(self.__k2.decrypt_block(last))
+
+    def encrypt_icv(self, mac):
+        """
+        ICV of the next C-MAC of SCP02 (encrypted by the first part of key)
+        """
+        return self.__k1.encrypt_block(mac)
+
+
+class SecureChannel:
+    """
+    Base class of secure channel, subclasses define 'wrap' and 'unwrap'
+    """
+
+    def __init__(self, card):
+        """
+        :param card:    connected Iso7816 object
+        """
+        _check_backend()
+        self.card = card
+
+    def wrap(self, apdu):
+        """
+        :param apdu:    C-APDU (bytes)
+        :return:        protected C-APDU (bytes)
+        """
+        raise NotImplementedError
+
+    def unwrap(self, response, sw1, sw2):
+        """
+        :param response:    data of protected R-APDU
+        :return:            data (bytes), sw1, sw2
+        """
+        raise NotImplementedError
+
+    def transmit(self, raw_apdu):
+        """
+        :param raw_apdu:    APDU in format of Iso7816.transmit
+        :return:            response (list), sw1, sw2
+        """
+        response, sw1, sw2 = self.card.transmit_chain(self.wrap(self.card.to_bytes(raw_apdu)))
+        response, sw1, sw2 = self.unwrap(response, sw1, sw2)
+
+        return list(response), sw1, sw2
+
+    def transmit_many(self, apdus, expected_sw=None):
+        """
+        Transmit sequence of APDU inside one transaction, see Iso7816.transmit_many
+        :param apdus:           iterable of APDU, each one in format of Iso7816.transmit
+        :param expected_sw:     iterable of expected SW (after unwrapping) or None
+        :return:                generator of (response (bytes), sw1, sw2)
+        """
+        if expected_sw is not None:
+            expected_sw = frozenset(expected_sw)
+
+        with self.card.transaction():
+            for raw_apdu in apdus:
+                response, sw1, sw2 = self.card.transmit_chain(self.wrap(self.card.to_bytes(raw_apdu)))
+                response, sw1, sw2 = self.unwrap(response, sw1, sw2)
+
+                yield response, sw1, sw2
+
+                if expected_sw is not None and ((sw1 << 8) | sw2) not in expected_sw:
+                    break
+
+    @staticmethod
+    def _is_plain_error(response, sw1):
+        """
+        Card returns error SW without protection
+        """
+        return not response and sw1 not in (0x90, 0x61, 0x62, 0x63)
+
+
+class _GpSecureChannel(SecureChannel):
+    """
+    Opening of GlobalPlatform secure channel: INITIALIZE UPDATE, EXTERNAL AUTHENTICATE
+    """
+
+    def __init__(self, card, security_level, key_version, host_challenge, challenge_size):
+        super().__init__(card)
+        self.security_level = security_level
+        self.key_version = key_version
+        self.host_challenge = bytes(host_challenge) if host_challenge is not None else os.urandom(challenge_size)
+        self.key_info = None
+        self.diversification_data = None
+        self.opened = False
+
+    def _initialize_update(self):
+        """
+        :return: response of INITIALIZE UPDATE (bytes)
+        """
+        response, sw1, sw2 = self.card.transmit_chain(encode_apdu(0x80, 0x50, self.key_version, 0x00,
+                                                                  self.host_challenge, MAX_SHORT_LE))
+        if (sw1, sw2) != (0x90, 0x00):
+            sw.check_sw(sw1, sw2, response)
+            raise SecureMessagingError("INITIALIZE UPDATE: SW = {:02X}{:02X}".format(sw1, sw2))
+
+        self.diversification_data = bytes(response[:10])
+        return bytes(response)
+
+    def _external_authenticate(self, host_cryptogram):
+        response, sw1, sw2 = self.card.transmit_chain(self.wrap(encode_apdu(0x84, 0x82, self.security_level, 0x00,
+                                                                            host_cryptogram)))
+        if (sw1, sw2) != (0x90, 0x00):
+            raise SecureMessagingError("EXTERNAL AUTHENTICATE: SW = {:02X}{:02X}".format(sw1, sw2))
+
+        self.opened = True
+
+    def open(self):
+        """
+        Authenticate card and host, derive session keys
+        :return: self
+        """
+        raise NotImplementedError
+
+
+class Scp03(_GpSecureChannel):
+    """
+    GlobalPlatform SCP03 (AES), security level: C_MAC, C_DECRYPTION, R_MAC, R_ENCRYPTION
+    """
+
+    def __init__(self, card, enc, mac, dek=None, security_level=C_MAC, key_version=0x00, host_challenge=None):
+        """
+        :param card:            connected Iso7816 object
+        :param enc:             static key ENC (16, 24 or 32 bytes)
+        :param mac:             static key MAC
+        :param dek:             static key DEK, it isn't used for wrapping
+        :param security_level:  combination of C_MAC, C_DECRYPTION, R_MAC, R_ENCRYPTION
+        :param key_version:     key version number (P1 of INITIALIZE UPDATE), 0 - the first available
+        :param host_challenge:  8 bytes, None - random
+        """
+        super().__init__(card, security_level, key_version, host_challenge, 8)
+        self.keys = (bytes(enc), bytes(mac), bytes(dek) if dek is not None else None)
+        self.sequence_counter = None
+        self.__enc = None                                       # BlockCipher of S-ENC
+        self.__mac = None                                       # AesCmac of S-MAC
+        self.__rmac = None                                      # AesCmac of S-RMAC
+        self.__mac_chaining = bytes(16)
+        self.__counter = 0                                      # Encryption counter
+        self.__command_chaining = None                          # MAC chaining value of the last command
+
+    @staticmethod
+    def derive(key, constant, context, bits=128):
+        """
+        KDF in counter mode (NIST SP 800-108) with AES-CMAC
+        :param key:         static or session key
+        :param constant:    derivation constant, e.g. SCP03_S_ENC
+        :param context:     host challenge + card challenge
+        :param bits:        length of result
+        :return:            bytes
+        """
+        cmac = AesCmac(key)
+        result = b''
+
+        for counter in range(1, (bits + 127) // 128 + 1):
+            result += cmac.mac(bytes(11), bytes((constant, 0x00)), bits.to_bytes(2, 'big'), bytes((counter,)),
+                               context)
+
+        return result[:bits // 8]
+
+    def open(self):
+        response = self._initialize_update()
+
+        if len(response) < 29 or response[11] != 0x03:
+            raise SecureMessagingError("Wrong response of INITIALIZE UPDATE for SCP03")
+
+        self.key_info = response[10:13]
+        card_challenge = response[13:21]
+        card_cryptogram = response[21:29]
+        self.sequence_counter = response[29:32] or None
+
+        enc, mac, _ = self.keys
+        context = self.host_challenge + card_challenge
+        s_enc = self.derive(enc, SCP03_S_ENC, context, len(enc) * 8)
+        s_mac = self.derive(mac, SCP03_S_MAC, context, len(mac) * 8)
+        s_rmac = self.derive(mac, SCP03_S_RMAC, context, len(mac) * 8)
+
+        if self.derive(s_mac, SCP03_CARD_CRYPTOGRAM, context, 64) != card_cryptogram:
+            raise SecureMessagingError("Wrong card cryptogram")
+
+        self.__enc = BlockCipher(algorithms.AES(s_enc))
+        self.__mac = AesCmac(s_mac)
+        self.__rmac = AesCmac(s_rmac)
+        self.__mac_chaining = bytes(16)
+        self.__counter = 0
+
+        self._external_authenticate(self.derive(s_mac, SCP03_HOST_CRYPTOGRAM, context, 64))
+
+        return self
+
+    def wrap(self, apdu):
+        cla, ins, p1, p2, data, le = decode_apdu(apdu)
+        authenticate = ins == 0x82 and not self.opened
+        level = C_MAC if authenticate else self.security_level
+
+        if not level & C_MAC:
+            return bytes(apdu)
+
+        if level & C_DECRYPTION:
+            self.__counter += 1                                 # Incremented for each command of session
+            if data:
+                icv = self.__enc.encrypt_block(self.__counter.to_bytes(16, 'big'))
+                data = self.__enc.encrypt_cbc(pad(data, 16), icv)
+
+        cla = _secure_cla(cla)
+        lc = len(data) + 8
+        extended = lc > MAX_SHORT_LC or (le is not None and le > MAX_SHORT_LE)
+        lc_field = b'\x00' + lc.to_bytes(2, 'big') if extended else bytes((lc,))
+
+        self.__mac_chaining = self.__mac.mac(self.__mac_chaining, bytes((cla, ins, p1, p2)), lc_field, data)
+        self.__command_chaining = self.__mac_chaining
+
+        return encode_apdu(cla, ins, p1, p2, data + self.__mac_chaining[:8], le, extended)
+
+    def unwrap(self, response, sw1, sw2):
+        response = bytes(response)
+
+        if not self.opened or not self.security_level & R_MAC or self._is_plain_error(response, sw1):
+            return response, sw1, sw2
+
+        if len(response) < 8:
+            raise SecureMessagingError("R-MAC is absent")
+
+        data, mac = response[:-8], response[-8:]
+        if self.__rmac.mac(self.__command_chaining, data, bytes((sw1, sw2)))[:8] != mac:
+            raise SecureMessagingError("Wrong R-MAC")
+
+        if self.security_level & R_ENCRYPTION and data:
+            icv = self.__enc.encrypt_block(b'\x80' + self.__counter.to_bytes(15, 'big'))
+            data = unpad(self.__enc.decrypt_cbc(data, icv))
+
+        return data, sw1, sw2
+
+
+class Scp02(_GpSecureChannel):
+    """
+    GlobalPlatform SCP02 (3DES, i=15: ICV of C-MAC is encrypted), security level: C_MAC, C_DECRYPTION
+    """
+
+    def __init__(self, card, enc, mac, dek=None, security_level=C_MAC, key_version=0x00, host_challenge=None):
+        """
+        :param card:            connected Iso7816 object
+        :param enc:             static key ENC (16 bytes)
+        :param mac:             static key MAC
+        :param dek:             static key DEK, it isn't used for wrapping
+        :param security_level:  combination of C_MAC, C_DECRYPTION
+        :param key_version:     key version number (P1 of INITIALIZE UPDATE), 0 - the first available
+        :param host_challenge:  8 bytes, None - random
+        """
+        if security_level & (R_MAC | R_ENCRYPTION):
+            raise Iso7816Exception("R-MAC and R-ENCRYPTION of SCP02 aren't supported")
+
+        super().__init__(card, security_level, key_version, host_challenge, 8)
+        self.keys = (bytes(enc), bytes(mac), bytes(dek) if dek is not None else None)
+        self.sequence_counter = None
+        self.__enc = None                                       # BlockCipher of S-ENC
+        self.__mac = None                                       # RetailMac of S-MAC
+        self.__icv = bytes(8)
+
+    @staticmethod
+    def derive(key, constant, sequence_counter):
+        """
+        :param key:                 static key (16 bytes)
+        :param constant:            derivation constant, e.g. SCP02_S_ENC
+        :param sequence_counter:    2 bytes of INITIALIZE UPDATE
+        :return:                    session key (bytes)
+        """
+        return BlockCipher(_des3(key)).encrypt_cbc(constant + sequence_counter + bytes(12))
+
+    def open(self):
+        response = self._initialize_update()
+
+        if len(response) < 28 or response[11] != 0x02:
+            raise SecureMessagingError("Wrong response of INITIALIZE UPDATE for SCP02")
+
+        self.key_info = response[10:12]
+        self.sequence_counter = response[12:14]
+        card_challenge = response[14:20]
+        card_cryptogram = response[20:28]
+
+        enc, mac, _ = self.keys
+        s_enc = self.derive(enc, SCP02_S_ENC, self.sequence_counter)
+        s_mac = self.derive(mac, SCP02_S_MAC, self.sequence_counter)
+
+        self.__enc = BlockCipher(_des3(s_enc))
+        self.__mac = RetailMac(s_mac)
+        self.__icv = bytes(8)
+
+        challenges = self.sequence_counter + card_challenge
+        if self.__enc.encrypt_cbc(pad(self.host_challenge + challenges, 8))[-8:] != card_cryptogram:
+            raise SecureMessagingError("Wrong card cryptogram")
+
+        self._external_authenticate(self.__enc.encrypt_cbc(pad(challenges + self.host_challenge, 8))[-8:])
+
+        return self
+
+    def wrap(self, apdu):
+        cla, ins, p1, p2, data, le = decode_apdu(apdu)
+        authenticate = ins == 0x82 and not self.opened
+        level = C_MAC if authenticate else self.security_level
+
+        if not level & C_MAC:
+            return bytes(apdu)
+
+        cla = _secure_cla(cla)
+        lc = len(data) + 8                                      # C-MAC is computed over plain data
+        body = self.__enc.encrypt_cbc(pad(data, 8)) if level & C_DECRYPTION and data else data
+
+        extended = len(body) + 8 > MAX_SHORT_LC or (le is not None and le > MAX_SHORT_LE)     # Form of sent Lc
+        lc_field = b'\x00' + lc.to_bytes(2, 'big') if extended else bytes((lc,))
+
+        icv = self.__mac.encrypt_icv(self.__icv) if not authenticate else self.__icv
+        self.__icv = self.__mac.mac(bytes((cla, ins, p1, p2)) + lc_field + data, icv)
+
+        return encode_apdu(cla, ins, p1, p2, body + self.__icv, le, extended)
+
+    def unwrap(self, response, sw1, sw2):
+        return bytes(response), sw1, sw2
+
+
+class IsoSm(SecureChannel):
+    """
+    Secure messaging of ISO/IEC 7816-4 with DO'87', DO'97', DO'99', DO'8E' (ICAO 9303 BAC - 3DES, PACE - AES)
+    """
+
+    def __init__(self, card, ks_enc, ks_mac, ssc=0, aes=False):
+        """
+        :param card:    connected Iso7816 object
+        :param ks_enc:  session key of encryption
+        :param ks_mac:  session key of MAC
+        :param ssc:     send sequence counter (int or bytes)
+        :param aes:     True - AES (CMAC, IV is encrypted SSC), False - 3DES (retail MAC, zero IV)
+        """
+        super().__init__(card)
+        self.aes = aes
+        self.block_size = 16 if aes else 8
+        self.ssc = int.from_bytes(ssc, 'big') if isinstance(ssc, (bytes, bytearray)) else ssc
+
+        if aes:
+            self.__enc = BlockCipher(algorithms.AES(bytes(ks_enc)))
+            self.__mac = AesCmac(ks_mac)
+        else:
+            self.__enc = BlockCipher(_des3(ks_enc))
+            self.__mac = RetailMac(ks_mac)
+
+    def __compute_mac(self, data, ssc):
+        """
+        :param data:    padded header and data objects, padding of the whole MAC input is added here
+        :param ssc:     send sequence counter of command/response
+        """
+        ssc = ssc.to_bytes(self.block_size, 'big')
+
+        if self.aes:
+            return self.__mac.mac(ssc, pad(data, 16))[:8]
+
+        return self.__mac.mac(ssc + data)
+
+    def __iv(self, ssc):
+        return self.__enc.encrypt_block(ssc.to_bytes(16, 'big')) if self.aes else None
+
+    def wrap(self, apdu):
+        cla, ins, p1, p2, data, le = decode_apdu(apdu)
+        cla = cla | 0x20 if cla & 0x40 else cla | 0x0C
+        ssc = self.ssc + 1                                      # Stored only if command is wrapped
+
+        protected = b''
+        if data:
+            encrypted = self.__enc.encrypt_cbc(pad(data, self.block_size), self.__iv(ssc))
+            protected = tlv.encode(0x85, encrypted) if ins & 0x01 else tlv.encode(0x87, b'\x01' + encrypted)
+
+        if le is not None:
+            le_field = (le & 0xFFFF).to_bytes(2, 'big') if le > MAX_SHORT_LE else bytes((le & 0xFF,))
+            protected += tlv.encode(0x97, le_field)
+
+        header = pad(bytes((cla, ins, p1, p2)), self.block_size)
+        mac = self.__compute_mac(header + protected, ssc)
+        protected += tlv.encode(0x8E, mac)
+
+        extended = len(protected) > MAX_SHORT_LC or (le is not None and le > MAX_SHORT_LE)
+        apdu = encode_apdu(cla, ins, p1, p2, protected, 0x10000 if extended else 0x100, extended)
+        self.ssc = ssc
+
+        return apdu
+
+    def unwrap(self, response, sw1, sw2):
+        response = bytes(response)
+        self.ssc += 1
+
+        if self._is_plain_error(response, sw1):
+            return response, sw1, sw2
+
+        encrypted = status = mac = None
+        authenticated = b''
+
+        for item in tlv.iter_tlv(response):
+            if item.tag == 0x8E:
+                mac = bytes(item.value)
+                break
+
+            authenticated += item.encode()
+
+            if item.tag in (0x85, 0x87):
+                encrypted = bytes(item.value[1:]) if item.tag == 0x87 else bytes(item.value)
+            elif item.tag == 0x99:
+                status = bytes(item.value)
+
+        if mac is None:
+            raise SecureMessagingError("DO'8E' is absent in R-APDU")
+
+        if self.__compute_mac(authenticated, self.ssc) != mac:
+            raise SecureMessagingError("Wrong MAC of R-APDU")
+
+        data = unpad(self.__enc.decrypt_cbc(encrypted, self.__iv(self.ssc))) if encrypted else b''
+
+        if status is not None and len(status) == 2:
+            sw1, sw2 = status
+
+        return data, sw1, sw2
@@ -0,0 +1,200 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Status words (ISO/IEC 7816-4, GlobalPlatform)
+
+Descriptions and exception classes of all 65536 values are precomputed in tables indexed by SW:
+
+    describe(0x63C2)                    # 'Verification failed, 2 retries left'
+    check_sw(sw1, sw2)                  # raises subclass of SwError if SW is error
+    check_sw(sw1, sw2, warnings=True)   # ... or warning
+"""
+
+__author__ = 'lem'
+
+from iso7816 import constants
+from iso7816.exceptions import SwError, SwWarning, VerificationError, SwExecutionError, SwCheckingError
+from iso7816.exceptions import WrongLengthError, SecurityError, NotFoundError, NotSupportedError
+
+
+SW_SUCCESS = 0x9000
+
+# Categories of SW
+SUCCESS = 0
+WARNING = 1
+EXECUTION_ERROR = 2
+CHECKING_ERROR = 3
+PROPRIETARY = 4
+UNKNOWN = 5
+
+ISO_SW = {
+    0x6200: "No information given (non-volatile memory unchanged)",
+    0x6281: "Part of returned data may be corrupted",
+    0x6282: "End of file or record reached before reading Ne bytes, or unsuccessful search",
+    0x6283: "Selected file deactivated",
+    0x6284: "File control information not formatted according to ISO/IEC 7816-4",
+    0x6285: "Selected file in termination state",
+    0x6286: "No input data available from a sensor on the card",
+    0x6287: "At least one of the referenced records is deactivated",
+    0x6300: "No information given (non-volatile memory changed)",
+    0x6310: "More data available",
+    0x6340: "Unsuccessful comparison",
+    0x6381: "File filled up by the last write",
+    0x6400: "Execution error",
+    0x6401: "Immediate response required by the card",
+    0x6500: "No information given (non-volatile memory changed)",
+    0x6581: "Memory failure",
+    0x6600: "Security-related issue",
+    0x6700: "Wrong length",
+    0x6800: "Functions in CLA not supported",
+    0x6881: "Logical channel not supported",
+    0x6882: "Secure messaging not supported",
+    0x6883: "Last command of the chain expected",
+    0x6884: "Command chaining not supported",
+    0x6900: "Command not allowed",
+    0x6981: "Command incompatible with file structure",
+    0x6982: "Security status not satisfied",
+    0x6983: "Authentication method blocked",
+    0x6984: "Reference data not usable",
+    0x6985: "Conditions of use not satisfied",
+    0x6986: "Command not allowed (no current EF)",
+    0x6987: "Expected secure messaging data objects missing",
+    0x6988: "Incorrect secure messaging data objects",
+    0x6A00: "Wrong parameters P1-P2",
+    0x6A80: "Incorrect parameters in the command data field",
+    0x6A81: "Function not supported",
+    0x6A82: "File or application not found",
+    0x6A83: "Record not found",
+    0x6A84: "Not enough memory space in the file",
+    0x6A85: "Nc inconsistent with TLV structure",
+    0x6A86: "Incorrect parameters P1-P2",
+    0x6A87: "Nc inconsistent with parameters P1-P2",
+    0x6A88: "Referenced data or reference data not found",
+    0x6A89: "File already exists",
+    0x6A8A: "DF name already exists",
+    0x6B00: "Wrong parameters P1-P2",
+    0x6D00: "Instruction code not supported or invalid",
+    0x6E00: "Class not supported",
+    0x6F00: "No precise diagnosis",
+    0x9000: "Normal processing",
+}
+
+SW1_FAMILIES = {                                                # Description of SW2 without specific meaning
+    0x62: "Warning, non-volatile memory unchanged",
+    0x63: "Warning, non-volatile memory changed",
+    0x64: "Execution error, non-volatile memory unchanged",
+    0x65: "Execution error, non-volatile memory changed",
+    0x66: "Security-related issue",
+    0x67: "Wrong length",
+    0x68: "Functions in CLA not supported",
+    0x69: "Command not allowed",
+    0x6A: "Wrong parameters P1-P2",
+    0x6B: "Wrong parameters P1-P2",
+    0x6D: "Instruction code not supported or invalid",
+    0x6E: "Class not supported",
+    0x6F: "No precise diagnosis",
+}
+
+SPECIFIC_ERRORS = {
+    0x6982: SecurityError,
+    0x6983: SecurityError,
+    0x6984: SecurityError,
+    0x6A81: NotSupportedError,
+    0x6A82: NotFoundError,
+    0x6A83: NotFoundError,
+    0x6A88: NotFoundError,
+}
+
+
+def _build_tables():
+    descriptions = []
+    categories = bytearray()
+    errors = []
+
+    for sw1 in range(0x100):
+        if sw1 in (0x90, 0x61):
+            category, error = SUCCESS, None
+        elif sw1 in (0x62, 0x63):
+            category, error = WARNING, SwWarning
+        elif 0x64 <= sw1 <= 0x66:
+            category, error = EXECUTION_ERROR, SwExecutionError
+        elif 0x67 <= sw1 <= 0x6F:
+            category, error = CHECKING_ERROR, SwCheckingError
+        elif 0x90 <= sw1 <= 0x9F:
+            category, error = PROPRIETARY, SwError
+        else:
+            category, error = UNKNOWN, SwError
+
+        if sw1 in (0x67, 0x6C):
+            error = WrongLengthError
+        elif sw1 in (0x68, 0x6D, 0x6E):
+            error = NotSupportedError
+
+        if sw1 == 0x61:
+            block = ["{} bytes of response data still available".format(sw2) for sw2 in range(0x100)]
+        elif sw1 == 0x6C:
+            block = ["Wrong Le field, {} bytes of data available".format(sw2) for sw2 in range(0x100)]
+        elif sw1 in SW1_FAMILIES:
+            block = [SW1_FAMILIES[sw1]] * 0x100
+        elif category == PROPRIETARY:
+            block = ["Proprietary status"] * 0x100
+        else:
+            block = ["Unknown status"] * 0x100
+
+        descriptions.extend(block)
+        categories.extend([category] * 0x100)
+        errors.extend([error] * 0x100)
+
+    for sw2 in range(0x02, 0x81):                               # Triggering by the card
+        descriptions[0x6200 | sw2] = "Triggering by the card ({:02X})".format(sw2)
+        descriptions[0x6400 | sw2] = "Triggering by the card ({:02X})".format(sw2)
+
+    for counter in range(0x10):
+        descriptions[0x63C0 | counter] = "Verification failed, {} retries left".format(counter)
+        errors[0x63C0 | counter] = VerificationError
+
+    for sw, description in constants.DSC_SW_ERROR.items():     # Proprietary codes known before
+        descriptions[sw] = description
+
+    for sw, description in ISO_SW.items():
+        descriptions[sw] = description
+
+    for sw, error in SPECIFIC_ERRORS.items():
+        errors[sw] = error
+
+    return tuple(descriptions), bytes(categories), tuple(errors)
+
+
+DESCRIPTIONS, CATEGORIES, ERRORS = _build_tables()
+
+
+def describe(sw1, sw2=None):
+    """
+    :param sw1:     SW1 or SW (if 'sw2' is None)
+    :param sw2:     SW2
+    :return:        description of SW
+    """
+    return DESCRIPTIONS[sw1 if sw2 is None else (sw1 << 8) | sw2]
+
+
+def category(sw1, sw2=None):
+    """
+    :return:    SUCCESS/WARNING/EXECUTION_ERROR/CHECKING_ERROR/PROPRIETARY/UNKNOWN
+    """
+    return CATEGORIES[sw1 if sw2 is None else (sw1 << 8) | sw2]
+
+
+def check_sw(sw1, sw2, response=None, warnings=False):
+    """
+    Raise exception if SW is not success
+    :param sw1:         SW1
+    :param sw2:         SW2
+    :param response:    data of R-APDU, stored in exception
+    :param warnings:    raise SwWarning for 62xx, 63xx
+    """
+    error = ERRORS[(sw1 << 8) | sw2]
+
+    if error is not None and (warnings or not issubclass(error, SwWarning)):
+        raise error(sw1, sw2, response)
@@ -0,0 +1,304 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+BER-TLV (ISO/IEC 7816-4) parser and encoder
+
+    fci = tlv.parse(response)                   # response - bytes, list or memoryview of 'transmit_into'
+    fci['6F/84'].value                          # memoryview of DF name, no copy
+    fci.get('6F/A5/BF0C')                       # None if absent
+    for item in fci['6F/A5']:                   # children are parsed on first access
+        print(item.tag_hex, bytes(item.value))
+
+    data = tlv.encode(0x6F, [(0x84, aid), (0xA5, [(0x50, b'VISA')])])
+
+Values are memoryview of parsed data: they are valid as long as the data isn't changed
+(the receive buffer of 'transmit_into' is reused by the next transmit)
+"""
+
+__author__ = 'lem'
+
+from iso7816.exceptions import Iso7816Exception
+
+
+class Tlv:
+    """
+    Data object
+    """
+
+    __slots__ = ('tag', 'constructed', 'value', '__children')
+
+    def __init__(self, tag, constructed, value):
+        self.tag = tag                                          # int, e.g. 0x6F, 0xBF0C
+        self.constructed = constructed
+        self.value = value                                      # memoryview
+        self.__children = None
+
+    def __repr__(self):
+        return "Tlv({}, {})".format(self.tag_hex, self.value.hex(' ').upper())
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __getitem__(self, path):
+        item = self.get(path)
+
+        if item is None:
+            raise KeyError(path)
+
+        return item
+
+    @property
+    def tag_hex(self):
+        return '{:X}'.format(self.tag).zfill(2 * len(encode_tag(self.tag)))
+
+    @property
+    def children(self):
+        """
+        Data objects of constructed object, they are parsed once
+        :return: tuple of Tlv, empty for primitive object
+        """
+        if self.__children is None:
+            self.__children = tuple(iter_tlv(self.value)) if self.constructed else ()
+
+        return self.__children
+
+    def get(self, path, default=None):
+        """
+        The first object by path relative to this object
+        :param path:    tag (int) or path of tags in hex - 'A5/BF0C'
+        :return:        Tlv
+        """
+        return _get(self.children, path, default)
+
+    def find_all(self, tag):
+        """
+        All nested objects with tag (depth-first)
+        :param tag:     int
+        :return:        generator of Tlv
+        """
+        for child in self.children:
+            if child.tag == tag:
+                yield child
+            if child.constructed:
+                yield from child.find_all(tag)
+
+    def encode(self):
+        """
+        :return: bytes of object
+        """
+        return encode(self.tag, self.value)
+
+
+class TlvList:
+    """
+    Data objects of response
+    """
+
+    __slots__ = ('data', 'items', '__index')
+
+    def __init__(self, data):
+        self.data = data                                        # memoryview of parsed data
+        self.items = tuple(iter_tlv(data))                      # Top level objects
+        self.__index = None
+
+    def __repr__(self):
+        return "TlvList({})".format(list(self.items))
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, path):
+        return self.get(path) is not None
+
+    def __getitem__(self, path):
+        item = self.get(path)
+
+        if item is None:
+            raise KeyError(path)
+
+        return item
+
+    def get(self, path, default=None):
+        """
+        The first object by path
+        :param path:    tag (int) or path of tags in hex - '6F/A5/BF0C'
+        :return:        Tlv
+        """
+        if self.__index is not None and isinstance(path, str):
+            items = self.__index.get(path.upper())
+            return items[0] if items else default
+
+        return _get(self.items, path, default)
+
+    @property
+    def index(self):
+        """
+        All objects by path, built once
+        :return: dict {'6F': [Tlv], '6F/84': [Tlv], ...}
+        """
+        if self.__index is None:
+            index = {}
+            stack = [('', item) for item in reversed(self.items)]
+
+            while stack:
+                parent, item = stack.pop()
+                path = parent + item.tag_hex
+                index.setdefault(path, []).append(item)
+
+                if item.constructed:
+                    stack.extend((path + '/', child) for child in reversed(item.children))
+
+            self.__index = index
+
+        return self.__index
+
+    def find_all(self, tag):
+        """
+        All objects with tag (depth-first)
+        :param tag:     int
+        :return:        generator of Tlv
+        """
+        for item in self.items:
+            if item.tag == tag:
+                yield item
+            if item.constructed:
+                yield from item.find_all(tag)
+
+
+def _get(items, path, default):
+    if isinstance(path, int):
+        tags = (path,)
+    else:
+        tags = [int(tag, 16) for tag in path.split('/')]
+
+    for tag in tags:
+        for item in items:
+            if item.tag == tag:
+                break
+        else:
+            return default
+
+        items = item.children
+
+    return item
+
+
+def iter_tlv(data):
+    """
+    Parse data objects of one level
+    :param data:    bytes, bytearray, memoryview or list of int
+    :return:        generator of Tlv, values are memoryview of 'data'
+    """
+    if isinstance(data, list):
+        data = bytes(data)
+
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    if view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+
+    size = len(view)
+    ptr = 0
+
+    while ptr < size:
+        first = view[ptr]
+
+        if first == 0x00:                                       # Padding between objects
+            ptr += 1
+            continue
+
+        tag = first
+        ptr += 1
+
+        if first & 0x1F == 0x1F:                                # Subsequent bytes of tag
+            while True:
+                if ptr >= size:
+                    raise Iso7816Exception("Wrong TLV: tag is truncated")
+                tag = (tag << 8) | view[ptr]
+                ptr += 1
+                if not tag & 0x80:
+                    break
+
+        if ptr >= size:
+            raise Iso7816Exception("Wrong TLV: length of tag {:X} is absent".format(tag))
+
+        length = view[ptr]
+        ptr += 1
+
+        if length & 0x80:
+            n_bytes = length & 0x7F
+            if n_bytes == 0 or n_bytes > 4:
+                raise Iso7816Exception("Wrong TLV: unsupported length of tag {:X}".format(tag))
+            if ptr + n_bytes > size:
+                raise Iso7816Exception("Wrong TLV: length of tag {:X} is truncated".format(tag))
+            length = int.from_bytes(view[ptr:ptr + n_bytes], 'big')
+            ptr += n_bytes
+
+        if ptr + length > size:
+            raise Iso7816Exception("Wrong TLV: value of tag {:X} is truncated".format(tag))
+
+        yield Tlv(tag, bool(first & 0x20), view[ptr:ptr + length])
+        ptr += length
+
+
+def parse(data):
+    """
+    Parse data objects
+    :param data:    bytes, bytearray, memoryview or list of int
+    :return:        TlvList
+    """
+    if isinstance(data, list):
+        data = bytes(data)
+
+    return TlvList(memoryview(data).cast('B') if not isinstance(data, memoryview) else data)
+
+
+def encode_tag(tag):
+    """
+    :param tag:     int
+    :return:        bytes
+    """
+    return tag.to_bytes((tag.bit_length() + 7) // 8 or 1, 'big')
+
+
+def encode_length(length):
+    """
+    :param length:  int
+    :return:        bytes - '7F', '81 80', '82 01 00', ...
+    """
+    if length < 0x80:
+        return bytes((length,))
+
+    n_bytes = (length.bit_length() + 7) // 8
+    return bytes((0x80 | n_bytes,)) + length.to_bytes(n_bytes, 'big')
+
+
+def encode(tag, value):
+    """
+    Encode data object
+    :param tag:     int
+    :param value:   bytes-like, list of int or list of (tag, value) of nested objects
+    :return:        bytes
+    """
+    if isinstance(value, (list, tuple)) and value and isinstance(value[0], (tuple, Tlv)):
+        value = encode_all(value)
+    elif not isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+
+    return b''.join((encode_tag(tag), encode_length(len(value)), value))
+
+
+def encode_all(items):
+    """
+    Encode list of data objects
+    :param items:   iterable of (tag, value) or Tlv
+    :return:        bytes
+    """
+    return b''.join(item.encode() if isinstance(item, Tlv) else encode(*item) for item in items)
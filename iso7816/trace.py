@@ -0,0 +1,135 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Tracing of APDU
+
+Tracing is disabled by default and costs one check of 'enabled' per APDU.
+When it is enabled, raw bytes are passed to a background thread (QueueListener),
+which formats them and writes to the log.
+
+    iso7816.trace.enable_trace('iso7816.log', max_bytes=10 * 1024 * 1024, backup_count=5, sample=10)
+"""
+
+__author__ = 'lem'
+
+import queue
+import logging
+import itertools
+import logging.handlers
+
+
+TRACE_FORMAT = u'[%(asctime)s]  %(message)s'
+
+logger = logging.getLogger('iso7816')
+
+enabled = False                                             # Checked by hot path before any call of tracer
+
+_sample = 1                                                 # Trace every N-th exchange
+_counter = itertools.count()
+_handler = None
+_queue_handler = None
+_listener = None
+
+
+class _Hex:
+    """
+    Bytes which are formatted to hex string only when record is written
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return self.data.hex(' ').upper()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    The record is put to queue as is, message is formatted by thread of listener
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def enable_trace(filename='iso7816.log',
+                 level=logging.INFO,
+                 max_bytes=0,
+                 backup_count=0,
+                 sample=1,
+                 handler=None):
+    """
+    Start tracing of APDU
+    :param filename:        name of log file
+    :param level:           level of 'iso7816' logger
+    :param max_bytes:       if not 0 - the log file is rotated when it reaches this size
+    :param backup_count:    number of rotated files
+    :param sample:          trace every N-th exchange of APDU
+    :param handler:         logging.Handler which is used instead of file
+    """
+    global enabled, _sample, _handler, _queue_handler, _listener
+
+    disable_trace()
+
+    if handler is None:
+        if max_bytes:
+            handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count)
+        else:
+            handler = logging.FileHandler(filename)
+        handler.setFormatter(logging.Formatter(TRACE_FORMAT))
+
+    trace_queue = queue.SimpleQueue()
+
+    _handler = handler
+    _sample = max(1, sample)
+    _queue_handler = _QueueHandler(trace_queue)
+    _listener = logging.handlers.QueueListener(trace_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+    logger.addHandler(_queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    enabled = True
+
+
+def disable_trace():
+    """
+    Stop tracing of APDU, all queued records are written before return
+    """
+    global enabled, _handler, _queue_handler, _listener
+
+    enabled = False
+
+    if _listener is not None:
+        logger.removeHandler(_queue_handler)
+        logger.propagate = True
+        _listener.stop()
+        _handler.close()
+
+        _handler = None
+        _queue_handler = None
+        _listener = None
+
+
+def exchange(apdu, response, sw1, sw2):
+    """
+    Trace C-APDU and R-APDU
+    :param apdu:        C-APDU (bytes/bytearray/memoryview)
+    :param response:    response data (bytes/bytearray/memoryview)
+    """
+    if _sample > 1 and next(_counter) % _sample:
+        return
+
+    logger.info("TX apdu: %s", _Hex(bytes(apdu)))
+    logger.info("RX apdu: %s", _Hex(bytes(response) + bytes((sw1, sw2))))
+
+
+def atr(raw_atr):
+    """
+    Trace ATR
+    """
+    logger.info("ATR: %s", _Hex(bytes(raw_atr)))
@@ -165,24 +165,25 @@ class SmartCardGui(iso7816.Iso7816):
             self.print_console(e.msg)
 
     def gui_send_apdu(self):
-        gui_apdu = " ".join([self.cla.get(), self.ins.get(), self.p1.get(), self.p2.get()])
-        if len(self.lc.get()) > 0:
-            gui_apdu += " " + self.lc.get()
+        try:
+            header = [iso7816.Iso7816.validate_byte(field.get()) for field in (self.cla, self.ins, self.p1, self.p2)]
+            data = iso7816.Iso7816.validate_data(self.data.get()) if self.data.get().strip() else []
 
-        if len(self.data.get()) > 0:
-            gui_apdu += " " + self.data.get()
+            if self.lc.get().strip() and iso7816.Iso7816.validate_byte(self.lc.get()) != len(data):
+                raise iso7816.Iso7816Exception('[Lc] differs from length of [data]')
 
-        if len(self.le.get()) > 0:
-            gui_apdu += " " + self.le.get()
+            le = None
+            if self.le.get().strip():
+                le = iso7816.Iso7816.validate_byte(self.le.get()) or iso7816.apdu.MAX_SHORT_LE
 
-        try:
-            response, sw1, sw2 = self.transmit(gui_apdu)
+            apdu = iso7816.CommandAPDU(*header, data=data, le=le).encode()
+            response, sw1, sw2 = self.transmit(apdu)
 
         except iso7816.Iso7816Exception as e:
             self.print_console(e.msg)
 
         else:
-            self.print_console("TX: " + gui_apdu.upper())
+            self.print_console("TX: " + apdu.hex(' ').upper())
             self.print_console("RX: " + " ".join("{:02X}".format(i) for i in response))
             self.print_console("    SW1={:02X}, SW2={:02X}".format(sw1, sw2))
 
@@ -190,6 +191,7 @@ class SmartCardGui(iso7816.Iso7816):
 
 
 if __name__ == '__main__':
+    iso7816.trace.enable_trace("iso7816.log")
     root = tk.Tk()
     SmartCardGui(root)
     root.mainloop()
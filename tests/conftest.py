@@ -0,0 +1,42 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Tests run without card-reader: PC/SC calls go to iso7816.simulator.SimulatedBackend
+
+    $python -m pytest tests
+"""
+
+__author__ = 'lem'
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import iso7816
+from iso7816.simulator import SimulatedBackend, SimulatedCard
+
+
+@pytest.fixture
+def make_card():
+    """
+    :return: function(handler=None, responses=None, atr=None) -> connected Iso7816 of SimulatedBackend
+    """
+    cards = []
+
+    def make(handler=None, responses=None, atr=None):
+        simulated = SimulatedCard(handler=handler, responses=responses) if atr is None else \
+            SimulatedCard(atr=atr, handler=handler, responses=responses)
+        card = iso7816.Iso7816(backend=SimulatedBackend({'Test Reader': simulated}))
+        card.connect('Test Reader')
+        cards.append(card)
+        return card
+
+    yield make
+
+    for card in cards:
+        card.close()
@@ -0,0 +1,140 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import pytest
+
+from iso7816 import Iso7816, Iso7816Exception, CommandAPDU, ApduTemplate
+from iso7816.apdu import encode_apdu, expected_length, set_le
+
+
+@pytest.mark.parametrize('apdu, ne', [
+    ('00 A4 04 00', 0),
+    ('00 B0 00 00 00', 256),
+    ('00 B0 00 00 10', 16),
+    ('00 D6 00 00 02 01 02', 0),
+    ('00 A4 04 00 02 3F 00 00', 256),
+    ('00 B0 00 00 00 00 00', 65536),
+    ('00 B0 00 00 00 01 00', 256),
+    ('00 D6 00 00 00 00 02 01 02', 0),
+    ('00 D6 00 00 00 00 02 01 02 10 00', 4096),
+])
+def test_expected_length(apdu, ne):
+    assert expected_length(bytes.fromhex(apdu)) == ne
+
+
+@pytest.mark.parametrize('apdu', ['00 B0 00 00 00 00', '00 B0 00 00 00 01'])
+def test_expected_length_truncated_extended(apdu):
+    with pytest.raises(Iso7816Exception):
+        expected_length(bytes.fromhex(apdu))
+
+
+def test_set_le():
+    assert set_le(bytes.fromhex('00 B0 00 00 00'), 0x10) == bytes.fromhex('00 B0 00 00 10')
+    assert set_le(bytes.fromhex('00 B0 00 00 00 00 00'), 0x10) == bytes.fromhex('00 B0 00 00 00 00 10')
+    assert set_le(bytes.fromhex('00 B0 00 00 10'), 0x00) == bytes.fromhex('00 B0 00 00 00')
+    assert set_le(bytes.fromhex('00 B0 00 00 00 00 10'), 0x00) == bytes.fromhex('00 B0 00 00 00 01 00')
+    assert set_le(bytes.fromhex('00 D6 00 00 00 00 01 AA 00 10'), 0x00) == \
+        bytes.fromhex('00 D6 00 00 00 00 01 AA 01 00')
+
+
+@pytest.mark.parametrize('apdu, case, data, le, extended', [
+    ('00 A4 04 00', 1, b'', None, False),
+    ('00 B0 00 00 00', 2, b'', 256, False),
+    ('00 B0 00 00 10', 2, b'', 16, False),
+    ('00 D6 00 00 02 01 02', 3, b'\x01\x02', None, False),
+    ('00 A4 04 00 02 3F 00 00', 4, b'\x3F\x00', 256, False),
+    ('00 B0 00 00 00 00 00', 2, b'', 65536, True),
+    ('00 B0 00 00 00 00 10', 2, b'', 16, True),
+    ('00 D6 00 00 00 00 02 01 02', 3, b'\x01\x02', None, True),
+    ('00 A4 04 00 00 00 02 3F 00 10 00', 4, b'\x3F\x00', 4096, True),
+])
+def test_command_apdu(apdu, case, data, le, extended):
+    raw = bytes.fromhex(apdu)
+    command = CommandAPDU.from_bytes(raw)
+
+    assert (command.case, command.data, command.le, command.extended) == (case, data, le, extended)
+    assert bytes(command) == raw
+    assert CommandAPDU(raw[0], raw[1], raw[2], raw[3], data, le, extended) == command
+    assert encode_apdu(raw[0], raw[1], raw[2], raw[3], data, le, extended) == raw
+
+
+def test_command_apdu_extended_is_chosen():
+    assert CommandAPDU(0x00, 0xD6, data=bytes(256)).encode()[4:7] == b'\x00\x01\x00'
+    assert CommandAPDU(0x00, 0xB0, le=257).encode() == bytes.fromhex('00 B0 00 00 00 01 01')
+
+
+@pytest.mark.parametrize('header', [(0x100, 0xB0, 0, 0), (0, -1, 0, 0), (0, 0xB0, 0x100, 0), (0, 0xB0, 0, 'G0'),
+                                    (0, 0xB0, 0, None)])
+def test_command_apdu_wrong_header(header):
+    with pytest.raises(Iso7816Exception):
+        CommandAPDU(*header)
+
+    with pytest.raises(Iso7816Exception):
+        encode_apdu(*header)
+
+
+@pytest.mark.parametrize('le, extended', [(0, None), (65537, None), (257, False), ('00', None)])
+def test_command_apdu_wrong_le(le, extended):
+    with pytest.raises(Iso7816Exception):
+        CommandAPDU(0x00, 0xB0, le=le, extended=extended)
+
+
+def test_validate_byte():
+    assert Iso7816.validate_byte('A4') == Iso7816.validate_byte('0xA4') == Iso7816.validate_byte(0xA4) == 0xA4
+
+    with pytest.raises(Iso7816Exception):
+        Iso7816.validate_byte(0x100)
+
+
+def test_template_build():
+    read = ApduTemplate(0x00, 0xB0, le=256)
+
+    assert bytes(read.build()) == bytes.fromhex('00 B0 00 00 00')
+    assert bytes(read.build(p1=0x01, p2=0x20, le=0x10)) == bytes.fromhex('00 B0 01 20 10')
+    assert bytes(read.build(p2='0x30')) == bytes.fromhex('00 B0 01 30 10')
+    assert read.build(p1=0x02).obj is read.buffer                 # The same buffer is patched
+
+
+def test_template_build_data():
+    update = ApduTemplate(0x00, 0xD6, data=bytes(6))
+
+    assert bytes(update.build(data=b'\x01\x02', offset=4)) == bytes.fromhex('00 D6 00 00 06 00 00 00 00 01 02')
+    assert bytes(update.build(data=b'\xFF')) == bytes.fromhex('00 D6 00 00 06 FF 00 00 00 01 02')
+
+
+def test_template_build_extended():
+    read = ApduTemplate(0x00, 0xB0, le=4096)
+
+    assert read.extended
+    assert bytes(read.build(p1=0x10, le=65536)) == bytes.fromhex('00 B0 10 00 00 00 00')
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'p1': 0x100},
+    {'p2': -1},
+    {'p2': 'ZZ'},
+    {'data': b'\x01', 'offset': -1},
+    {'data': b'\x01\x02', 'offset': 5},
+    {'le': 0},
+    {'le': 257},
+])
+def test_template_build_wrong(kwargs):
+    update = ApduTemplate(0x00, 0xD6, data=bytes(6), le=256)
+    apdu = bytes(update.buffer)
+
+    with pytest.raises(Iso7816Exception):
+        update.build(**kwargs)
+
+    assert bytes(update.buffer) == apdu
+
+
+def test_template_build_without_data_and_le():
+    select = ApduTemplate(0x00, 0xA4, 0x00, 0x0C)
+
+    with pytest.raises(Iso7816Exception):
+        select.build(data=b'\x3F\x00')
+    with pytest.raises(Iso7816Exception):
+        select.build(le=16)
@@ -0,0 +1,93 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import array
+
+import pytest
+
+import iso7816
+from iso7816 import constants
+from iso7816.simulator import SimulatedBackend, SimulatedCard
+
+
+class StrictBackend(SimulatedBackend):
+    """
+    Handle of connection must be int as for SCARDHANDLE of PcscBackend (ctypes raises ArgumentError for None)
+    """
+    def __getattribute__(self, name):
+        method = super().__getattribute__(name)
+        if name not in ('reconnect', 'begin_transaction', 'end_transaction', 'status', 'transmit',
+                        'get_attrib', 'control'):
+            return method
+
+        def call(card, *args):
+            assert card is not None, "{} is called without connection".format(name)
+            return method(card, *args)
+
+        return call
+
+
+CALLS = [
+    ('get_atr', lambda card: card.get_atr()),
+    ('transmit', lambda card: card.transmit_into(b'\x00\xB0\x00\x00\x01')),
+    ('reconnect', lambda card: card.reconnect()),
+    ('transaction', lambda card: card.transaction().__enter__()),
+    ('get_attrib', lambda card: card.get_attrib('VENDOR_NAME')),
+    ('get_attribs', lambda card: card.get_attribs(['VENDOR_NAME'])),
+    ('control', lambda card: card.control(0x42000D48)),
+]
+
+
+@pytest.fixture
+def card():
+    card = iso7816.Iso7816(backend=StrictBackend({'Test Reader': SimulatedCard()}))
+    yield card
+    card.close()
+
+
+@pytest.mark.parametrize('name, call', CALLS, ids=[name for name, _ in CALLS])
+def test_not_connected(card, name, call):
+    with pytest.raises(iso7816.PcscError) as error:
+        call(card)
+
+    assert error.value.error == constants.SCARD_E_INVALID_HANDLE
+    assert name in error.value.msg
+
+
+@pytest.mark.parametrize('name, call', CALLS, ids=[name for name, _ in CALLS])
+def test_disconnected(card, name, call):
+    card.connect('Test Reader')
+    card.disconnect()
+
+    with pytest.raises(iso7816.PcscError) as error:
+        call(card)
+
+    assert error.value.error == constants.SCARD_E_INVALID_HANDLE
+
+
+def test_disconnect_inside_transaction(card):
+    card.connect('Test Reader')
+
+    with card.transaction():
+        card.disconnect()
+
+
+@pytest.mark.parametrize('raw_apdu, apdu', [
+    ('00 B0 00 00 10', b'\x00\xB0\x00\x00\x10'),
+    ('00B0000010', b'\x00\xB0\x00\x00\x10'),
+    ([0x00, 0xB0, 0x00, 0x00], b'\x00\xB0\x00\x00'),
+    ((0x00, 0xB0, 0x00, 0x00), b'\x00\xB0\x00\x00'),
+    (b'\x00\xB0\x00\x00', b'\x00\xB0\x00\x00'),
+    (array.array('B', [0x00, 0xB0, 0x00, 0x00]), b'\x00\xB0\x00\x00'),
+])
+def test_to_bytes(raw_apdu, apdu):
+    assert bytes(iso7816.Iso7816.to_bytes(raw_apdu)) == apdu
+
+
+@pytest.mark.parametrize('raw_apdu', [5, 0, None, 1.5, [0x100], ['00'], {0x00: 0xB0}, '00 B0 0G'])
+def test_to_bytes_wrong(raw_apdu):
+    with pytest.raises(iso7816.Iso7816Exception):
+        iso7816.Iso7816.to_bytes(raw_apdu)
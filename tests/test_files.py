@@ -0,0 +1,188 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+from iso7816 import FileReader
+from iso7816 import tlv
+from iso7816.apdu import decode_apdu, MAX_SHORT_LE
+
+
+EF_CURRENT = bytes(range(256)) * 0x90                           # 36864 bytes, offsets beyond 0x7FFF
+EF_SFI = bytes(255 - (i & 0xFF) for i in range(0x400))
+SFI = 0x05
+
+RECORDS = [bytes((number,)) * (number * 10) for number in range(1, 6)]
+
+
+class Card:
+    """
+    Transparent EF (current EF and EF of SFI) and record EF, SW of ISO 7816-4
+    """
+
+    def __init__(self):
+        self.current = EF_CURRENT
+        self.apdus = []
+
+    def __call__(self, apdu):
+        self.apdus.append(bytes(apdu))
+        cla, ins, p1, p2, data, le = decode_apdu(apdu)
+
+        if ins == 0xB0:
+            if p1 & 0x80:
+                self.current = EF_SFI if p1 & 0x1F == SFI else None
+                offset = p2
+            else:
+                offset = (p1 << 8) | p2
+            return self.read(offset, le)
+
+        if ins == 0xB1:
+            if p2:
+                self.current = EF_SFI if p2 == SFI else None
+            offset = int.from_bytes(tlv.parse(data)[0x54].value, 'big')
+            response = self.read(offset, le - 4)
+            if len(response) == 2:
+                return response
+            return tlv.encode(0x53, response[:-2]) + response[-2:]
+
+        if ins == 0xB2:
+            if not 1 <= p1 <= len(RECORDS):
+                return b'\x6A\x83'
+            record = RECORDS[p1 - 1][:le]
+            return record + (b'\x62\x82' if len(record) < le else b'\x90\x00')
+
+        return b'\x6D\x00'
+
+    def read(self, offset, le):
+        if self.current is None:
+            return b'\x6A\x82'
+        if offset >= len(self.current):
+            return b'\x6B\x00'
+        data = self.current[offset:offset + le]
+        return data + (b'\x62\x82' if len(data) < le else b'\x90\x00')
+
+
+def read_all(reader, **kwargs):
+    return b''.join(bytes(chunk) for chunk in reader.read_binary(**kwargs))
+
+
+def test_read_binary(make_card):
+    card = Card()
+    reader = FileReader(make_card(card))
+
+    assert reader.chunk_size == MAX_SHORT_LE
+    assert read_all(reader) == EF_CURRENT
+    assert reader.stats['bytes'] == len(EF_CURRENT)
+    assert {apdu[1] for apdu in card.apdus} == {0xB0, 0xB1}
+
+
+def test_read_binary_b1_short_le(make_card):
+    card = Card()
+    reader = FileReader(make_card(card))
+
+    assert read_all(reader, offset=0x8000) == EF_CURRENT[0x8000:]
+
+    for apdu in card.apdus:
+        assert apdu[1] == 0xB1
+        assert len(apdu) == 5 + apdu[4] + 1                     # Short Lc and Le
+        assert apdu[-1] == 0x00                                 # Le = 256, data up to 252
+
+
+def test_read_binary_b1_extended_le(make_card):
+    card = Card()
+    reader = FileReader(make_card(card), chunk_size=4096)
+
+    assert read_all(reader, offset=0x8000) == EF_CURRENT[0x8000:]
+    assert decode_apdu(card.apdus[0])[5] == 4096 + 4
+
+
+def test_read_binary_sfi(make_card):
+    card = Card()
+    reader = FileReader(make_card(card))
+
+    assert read_all(reader, sfi=SFI) == EF_SFI
+    assert card.apdus[0][:4] == bytes((0x00, 0xB0, 0x80 | SFI, 0x00))
+
+
+def test_read_binary_sfi_beyond_p2(make_card):
+    card = Card()
+    reader = FileReader(make_card(card))
+
+    assert read_all(reader, offset=0x100, sfi=SFI) == EF_SFI[0x100:]
+    assert card.apdus[0][:4] == bytes((0x00, 0xB1, 0x00, SFI))
+    assert tlv.parse(decode_apdu(card.apdus[0])[4])[0x54].value == b'\x01\x00'
+
+
+def test_read_to_file_resume_sfi(make_card, tmp_path):
+    path = tmp_path / 'ef.bin'
+    path.write_bytes(EF_SFI[:300])
+    reader = FileReader(make_card(Card()))
+
+    assert reader.read_to_file(str(path), sfi=SFI, resume=True) == len(EF_SFI) - 300
+    assert path.read_bytes() == EF_SFI
+
+
+def test_read_into(make_card):
+    reader = FileReader(make_card(Card()))
+    buffer = bytearray(1000)
+
+    assert reader.read_into(buffer, offset=5, sfi=SFI) == 1000
+    assert buffer == EF_SFI[5:1005]
+
+
+def test_read_binary_chaining(make_card):
+    data = bytes(range(200)) + bytes(range(100))
+
+    def handler(apdu):
+        if apdu == bytes.fromhex('00 B0 00 00 00'):
+            return data[:100] + b'\x61\x9C'                     # 156 bytes in GET RESPONSE
+        if apdu == bytes.fromhex('00 C0 00 00 9C'):
+            return data[100:256] + b'\x90\x00'
+        if apdu == bytes.fromhex('00 B0 01 00 00'):
+            return b'\x6C\x2C'                                  # 44 bytes left
+        if apdu == bytes.fromhex('00 B0 01 00 2C'):
+            return data[256:] + b'\x90\x00'
+        return b'\x6A\x86'
+
+    reader = FileReader(make_card(handler))
+
+    assert read_all(reader) == data
+    assert reader.stats['commands'] == 4
+
+
+def test_read_records_short(make_card):
+    card = Card()
+    reader = FileReader(make_card(card))
+
+    records = [(number, bytes(record)) for number, record in reader.read_records()]
+
+    assert records == list(enumerate(RECORDS, 1))               # 6282 of each record doesn't stop reading
+    assert card.apdus[-1][2] == len(RECORDS) + 1                # 6A83
+
+
+def test_read_records_count_sfi(make_card):
+    card = Card()
+    reader = FileReader(make_card(card))
+
+    records = [(number, bytes(record)) for number, record in reader.read_records(record=2, count=2, sfi=1)]
+
+    assert records == [(2, RECORDS[1]), (3, RECORDS[2])]
+    assert len(card.apdus) == 2
+    assert card.apdus[0][3] == (1 << 3) | 0x04
+
+
+def test_read_records_exact_le(make_card):
+    def handler(apdu):
+        number, le = apdu[2], apdu[4] or 256
+        if number > len(RECORDS):
+            return b'\x6A\x83'
+        record = RECORDS[number - 1]
+        if le != len(record):
+            return bytes((0x6C, len(record)))
+        return record + b'\x90\x00'
+
+    reader = FileReader(make_card(handler))
+
+    assert [bytes(record) for _, record in reader.read_records()] == RECORDS
+    assert reader.stats['commands'] == 2 * len(RECORDS) + 1
@@ -0,0 +1,62 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import asyncio
+import threading
+
+from iso7816 import CardMonitor
+from iso7816.monitor import CARD_INSERTED
+from iso7816.simulator import SimulatedBackend, SimulatedCard
+
+
+def make_monitor():
+    return CardMonitor(backend=SimulatedBackend({'Reader 0': SimulatedCard(), 'Reader 1': None}), timeout=50)
+
+
+def test_wait_reports_present_card():
+    monitor = make_monitor()
+    events = monitor.wait(0)
+
+    assert [(event.event, event.reader) for event in events] == [(CARD_INSERTED, 'Reader 0')]
+
+
+def test_stop_before_iteration():
+    monitor = make_monitor()
+    monitor.stop()
+
+    assert list(monitor.events()) == []
+
+
+def test_stop_before_async_iteration():
+    monitor = make_monitor()
+    monitor.stop()
+
+    async def collect():
+        return [event async for event in monitor]
+
+    assert asyncio.run(asyncio.wait_for(collect(), 5)) == []
+
+
+def test_start_stop_race():
+    monitor = make_monitor()
+    events = []
+
+    thread = monitor.start(events.append)
+    monitor.stop()
+
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_start_after_stop():
+    monitor = make_monitor()
+    monitor.stop()
+
+    inserted = threading.Event()
+    monitor.start(lambda event: inserted.set())
+
+    assert inserted.wait(5)
+    monitor.stop()
@@ -0,0 +1,94 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import pytest
+
+from iso7816 import Iso7816Exception, ScriptRunner
+from iso7816.script import ScriptCommand
+
+
+SCRIPT = """
+# test
+SET AID = A0 00 00 00 03 10 10
+00 A4 04 00 07 $AID > 6F XX * 90 00
+00 B0 00 00 02 > 12 3X 90 00
+"""
+
+
+def handler(apdu):
+    if apdu[1] == 0xA4:
+        return bytes.fromhex('6F 02 84 00 90 00')
+    if apdu[1] == 0xB0:
+        return bytes.fromhex('12 34 90 00')
+    return None
+
+
+def test_load_compiles_masks(make_card):
+    runner = ScriptRunner(make_card(handler))
+    commands = runner.load(SCRIPT.splitlines())
+
+    assert [command.line_no for command in commands] == [4, 5]
+    assert all(isinstance(command, ScriptCommand) for command in commands)
+    assert commands[0].apdu == bytes.fromhex('00 A4 04 00 07 A0 00 00 00 03 10 10')
+    assert commands[1].pattern.fullmatch(bytes.fromhex('12 3F 90 00'))
+
+
+def test_run_loaded_script(make_card):
+    runner = ScriptRunner(make_card(handler))
+    commands = runner.load(SCRIPT.splitlines())
+
+    for _ in range(2):
+        results = list(runner.run(commands))
+        assert [result.matched for result in results] == [True, True]
+
+    assert runner.stats['apdus'] == 2
+
+
+def test_wrong_mask_is_raised_before_transmit(make_card):
+    sent = []
+
+    def recording_handler(apdu):
+        sent.append(apdu)
+        return handler(apdu)
+
+    runner = ScriptRunner(make_card(recording_handler))
+
+    with pytest.raises(Iso7816Exception, match='line 2'):
+        runner.load(['00 B0 00 00 02 > 90 00', '00 B0 00 00 02 > 9Z 00'])
+
+    assert sent == []
+
+
+def test_run_streams_script(make_card):
+    read = []
+
+    def lines():
+        for line in SCRIPT.splitlines():
+            read.append(line)
+            yield line
+
+    runner = ScriptRunner(make_card(handler))
+    results = runner.run(lines())
+
+    assert next(results).line_no == 4
+    assert len(read) == 4                                       # The next lines aren't read yet
+    assert [result.line_no for result in results] == [5]
+
+
+def test_run_raises_wrong_mask_when_line_is_reached(make_card):
+    runner = ScriptRunner(make_card(handler))
+    results = runner.run(['00 B0 00 00 02 > 12 34 90 00', '00 B0 00 00 02 > 9Z 00'])
+
+    assert next(results).matched
+    with pytest.raises(Iso7816Exception, match='line 2'):
+        next(results)
+
+
+def test_mismatch(make_card):
+    runner = ScriptRunner(make_card(handler), stop_on_mismatch=False)
+    results = list(runner.run(['00 B0 00 00 02 > 12 35 90 00']))
+
+    assert not results[0].matched and runner.stats['failed'] == 1
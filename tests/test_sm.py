@@ -0,0 +1,295 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+__author__ = 'lem'
+
+import os
+
+import pytest
+
+pytest.importorskip('cryptography')
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.cmac import CMAC
+
+from iso7816 import Iso7816Exception, SecureMessagingError
+from iso7816 import tlv
+from iso7816.apdu import decode_apdu
+from iso7816.sm import IsoSm, Scp02, Scp03, BlockCipher, C_MAC, C_DECRYPTION, R_MAC, R_ENCRYPTION, pad, unpad, _des3
+
+
+# ICAO 9303 part 11, appendix D.4: secure messaging of BAC
+KS_ENC = bytes.fromhex('979EC13B1CBFE9DCD01AB0FED307EAE5')
+KS_MAC = bytes.fromhex('F1CB1F1FB5ADF208806B89DC579DC1F8')
+SSC = bytes.fromhex('887022120C06C226')
+
+ICAO_EXCHANGES = [
+    # C-APDU, protected C-APDU, protected R-APDU (with SW), response data
+    ('00A4020C02011E', '0CA4020C158709016375432908C044F68E08BF8B92D635FF24F800',
+     '990290008E08FA855A5D4C50A8ED9000', ''),
+    ('00B0000004', '0CB000000D9701048E08ED6705417E96BA5500',
+     '8709019FF0EC34F9922651990290008E08AD55CC17140B2DED9000', '60145F01'),
+]
+
+
+def test_iso_sm_icao_vector(make_card):
+    channel = IsoSm(make_card(), KS_ENC, KS_MAC, SSC)
+
+    for apdu, protected, response, data in ICAO_EXCHANGES:
+        assert channel.wrap(bytes.fromhex(apdu)).hex().upper() == protected
+
+        response = bytes.fromhex(response)
+        assert channel.unwrap(response[:-2], 0x90, 0x00) == (bytes.fromhex(data), 0x90, 0x00)
+
+
+def test_iso_sm_transmit(make_card):
+    responses = {bytes.fromhex(protected): bytes.fromhex(response)
+                 for _, protected, response, _ in ICAO_EXCHANGES}
+    channel = IsoSm(make_card(responses=responses), KS_ENC, KS_MAC, SSC)
+
+    assert channel.transmit('00 A4 02 0C 02 01 1E') == ([], 0x90, 0x00)
+    assert channel.transmit('00 B0 00 00 04') == ([0x60, 0x14, 0x5F, 0x01], 0x90, 0x00)
+
+
+def test_iso_sm_wrong_mac(make_card):
+    channel = IsoSm(make_card(), KS_ENC, KS_MAC, SSC)
+    channel.wrap(bytes.fromhex(ICAO_EXCHANGES[0][0]))
+
+    with pytest.raises(SecureMessagingError):
+        channel.unwrap(bytes.fromhex('990290008E08FA855A5D4C50A8EE'), 0x90, 0x00)
+
+
+def test_iso_sm_plain_error(make_card):
+    channel = IsoSm(make_card(), KS_ENC, KS_MAC, SSC)
+    channel.wrap(bytes.fromhex(ICAO_EXCHANGES[0][0]))
+
+    assert channel.unwrap(b'', 0x6A, 0x82) == (b'', 0x6A, 0x82)
+
+
+@pytest.mark.parametrize('size', [200, 230, 240, 255])
+def test_iso_sm_wrap_long_data(make_card, size):
+    channel = IsoSm(make_card(), KS_ENC, KS_MAC, SSC)
+    data = os.urandom(size)
+    ssc = int.from_bytes(SSC, 'big') + 1
+
+    protected = channel.wrap(b'\x00\xD6\x00\x00' + bytes((size,)) + data + b'\x00')
+    _, _, _, _, body, le = decode_apdu(protected)
+    objects = tlv.parse(body)
+
+    assert (len(protected) > 5 and protected[4] == 0) == (len(body) > 255)
+    assert unpad(des3_cbc(KS_ENC, bytes(objects[0x87].value[1:]), decrypt=True)) == data
+    assert bytes(objects[0x8E].value) == retail_mac(KS_MAC, ssc.to_bytes(8, 'big') + pad(b'\x0C\xD6\x00\x00', 8) +
+                                                    body[:-10], bytes(8))
+    assert channel.ssc == ssc
+
+
+def test_iso_sm_wrap_error_keeps_ssc(make_card):
+    channel = IsoSm(make_card(), KS_ENC, KS_MAC, SSC)
+
+    with pytest.raises(Iso7816Exception):                      # Protected body is longer than 65535
+        channel.wrap(b'\x00\xD6\x00\x00\x00\xFF\xF0' + bytes(0xFFF0))
+
+    assert channel.ssc == int.from_bytes(SSC, 'big')
+    assert channel.wrap(bytes.fromhex(ICAO_EXCHANGES[0][0])).hex().upper() == ICAO_EXCHANGES[0][1]
+
+
+@pytest.mark.parametrize('size', [0, 15, 17])
+def test_block_cipher_wrong_length(size):
+    key, iv = os.urandom(16), os.urandom(16)
+    cipher = BlockCipher(algorithms.AES(key))
+    data = os.urandom(32)
+
+    with pytest.raises(SecureMessagingError):
+        cipher.encrypt_cbc(bytes(size), iv)
+    with pytest.raises(SecureMessagingError):
+        cipher.decrypt_cbc(bytes(size), iv)
+
+    assert cipher.encrypt_cbc(data, iv) == aes_cbc(key, iv, data)   # Contexts aren't corrupted
+    assert cipher.decrypt_cbc(aes_cbc(key, iv, data), iv) == data
+
+
+def aes_cmac(key, data):
+    mac = CMAC(algorithms.AES(key))
+    mac.update(data)
+    return mac.finalize()
+
+
+def aes_cbc(key, iv, data, decrypt=False):
+    cipher = Cipher(algorithms.AES(key), modes.CBC(iv))
+    context = cipher.decryptor() if decrypt else cipher.encryptor()
+    return context.update(data) + context.finalize()
+
+
+def aes_ecb(key, data):
+    return Cipher(algorithms.AES(key), modes.ECB()).encryptor().update(data)
+
+
+def scp03_derive(key, constant, context, bits):
+    derived = b''
+    for counter in range(1, (bits + 127) // 128 + 1):
+        derived += aes_cmac(key, bytes(11) + bytes((constant, 0)) + bits.to_bytes(2, 'big') +
+                            bytes((counter,)) + context)
+    return derived[:bits // 8]
+
+
+class Scp03Card:
+    """
+    Card side of SCP03, the response of command is reversed data repeated 3 times and '01'
+    """
+
+    def __init__(self, enc, mac):
+        self.enc = enc
+        self.mac = mac
+        self.received = []
+
+    def __call__(self, apdu):
+        cla, ins, p1, p2, data, le = decode_apdu(apdu)
+
+        if ins == 0x50:
+            self.challenges = data + os.urandom(8)
+            self.s_enc = scp03_derive(self.enc, 0x04, self.challenges, 128)
+            self.s_mac = scp03_derive(self.mac, 0x06, self.challenges, 128)
+            self.s_rmac = scp03_derive(self.mac, 0x07, self.challenges, 128)
+            self.chaining = bytes(16)
+            self.counter = 0
+            return (bytes(10) + b'\x30\x03\x00' + self.challenges[8:] +
+                    scp03_derive(self.s_mac, 0x00, self.challenges, 64) + b'\x90\x00')
+
+        body, mac = data[:-8], data[-8:]
+        lc = apdu[4:5] if apdu[4] else apdu[4:7]
+        chaining = aes_cmac(self.s_mac, self.chaining + apdu[:4] + lc + body)
+        if chaining[:8] != mac:
+            return b'\x69\x82'
+        self.chaining = chaining
+
+        if ins == 0x82:
+            if body != scp03_derive(self.s_mac, 0x01, self.challenges, 64):
+                return b'\x63\x00'
+            self.security_level = p1
+            return b'\x90\x00'
+
+        if self.security_level & C_DECRYPTION:
+            self.counter += 1
+            if body:
+                iv = aes_ecb(self.s_enc, self.counter.to_bytes(16, 'big'))
+                body = unpad(aes_cbc(self.s_enc, iv, body, decrypt=True))
+
+        self.received.append(body)
+        response = body[::-1] * 3 + b'\x01'
+
+        if self.security_level & R_ENCRYPTION:
+            iv = aes_ecb(self.s_enc, b'\x80' + self.counter.to_bytes(15, 'big'))
+            response = aes_cbc(self.s_enc, iv, pad(response, 16))
+        if self.security_level & R_MAC:
+            response += aes_cmac(self.s_rmac, self.chaining + response + b'\x90\x00')[:8]
+
+        return response + b'\x90\x00'
+
+
+@pytest.mark.parametrize('security_level', [C_MAC,
+                                            C_MAC | C_DECRYPTION,
+                                            C_MAC | R_MAC,
+                                            C_MAC | C_DECRYPTION | R_MAC | R_ENCRYPTION])
+def test_scp03(make_card, security_level):
+    enc, mac = os.urandom(16), os.urandom(16)
+    simulated = Scp03Card(enc, mac)
+    card = make_card(simulated)
+    card.adjust_rx_buffer(65538)
+
+    channel = Scp03(card, enc, mac, security_level=security_level).open()
+
+    for size in (1, 15, 16, 17, 255):
+        data = os.urandom(size)
+        response, sw1, sw2 = channel.transmit(b'\x80\xE2\x00\x00' + bytes((size,)) + data + b'\x00')
+
+        assert simulated.received[-1] == data
+        assert bytes(response) == data[::-1] * 3 + b'\x01'
+        assert (sw1, sw2) == (0x90, 0x00)
+
+    data = os.urandom(400)                                      # Extended Lc
+    channel.transmit(b'\x80\xE2\x00\x00\x00' + len(data).to_bytes(2, 'big') + data)
+    assert simulated.received[-1] == data
+
+    results = list(channel.transmit_many([b'\x80\xE2\x00\x00\x02\x01\x02', b'\x80\xCA\x00\x66\x00']))
+    assert [bytes(response) for response, _, _ in results] == [b'\x02\x01' * 3 + b'\x01', b'\x01']
+
+
+def test_scp03_wrong_key(make_card):
+    enc = os.urandom(16)
+    card = make_card(Scp03Card(enc, os.urandom(16)))
+
+    with pytest.raises(SecureMessagingError):                   # Card cryptogram is wrong
+        Scp03(card, enc, os.urandom(16)).open()
+
+
+def des3_cbc(key, data, iv=bytes(8), decrypt=False):
+    cipher = Cipher(_des3(key), modes.CBC(iv))
+    context = cipher.decryptor() if decrypt else cipher.encryptor()
+    return context.update(data) + context.finalize()
+
+
+def des_ecb(key, data, decrypt=False):
+    cipher = Cipher(_des3(key), modes.ECB())
+    return (cipher.decryptor() if decrypt else cipher.encryptor()).update(data)
+
+
+def retail_mac(key, data, iv):
+    last = des3_cbc(key[:8], pad(data, 8), iv)[-8:]
+    return des_ecb(key[:8], des_ecb(key[8:], last, decrypt=True))
+
+
+class Scp02Card:
+    """
+    Card side of SCP02 (i=15), commands are answered with 9000
+    """
+
+    def __init__(self, enc, mac):
+        self.enc = enc
+        self.mac = mac
+        self.received = []
+
+    def __call__(self, apdu):
+        cla, ins, p1, p2, data, le = decode_apdu(apdu)
+
+        if ins == 0x50:
+            self.host_challenge = data
+            self.sequence = b'\x00\x2A'
+            self.card_challenge = os.urandom(6)
+            self.s_enc = des3_cbc(self.enc, b'\x01\x82' + self.sequence + bytes(12))
+            self.s_mac = des3_cbc(self.mac, b'\x01\x01' + self.sequence + bytes(12))
+            self.icv = None
+            cryptogram = des3_cbc(self.s_enc, pad(data + self.sequence + self.card_challenge, 8))[-8:]
+            return bytes(10) + b'\x20\x02' + self.sequence + self.card_challenge + cryptogram + b'\x90\x00'
+
+        body, mac = data[:-8], data[-8:]
+        if ins != 0x82 and self.security_level & C_DECRYPTION and body:
+            body = unpad(des3_cbc(self.s_enc, body, decrypt=True))
+
+        lc = len(body) + 8                                      # Lc of plain data in the form of sent Lc
+        lc_field = b'\x00' + lc.to_bytes(2, 'big') if apdu[4] == 0 else bytes((lc,))
+        icv = bytes(8) if self.icv is None else des_ecb(self.s_mac[:8], self.icv)
+        if retail_mac(self.s_mac, apdu[:4] + lc_field + body, icv) != mac:
+            return b'\x69\x82'
+        self.icv = mac
+
+        if ins == 0x82:
+            self.security_level = p1
+            expected = des3_cbc(self.s_enc, pad(self.sequence + self.card_challenge + self.host_challenge, 8))
+            return b'\x90\x00' if body == expected[-8:] else b'\x63\x00'
+
+        self.received.append(body)
+        return b'\x90\x00'
+
+
+@pytest.mark.parametrize('security_level', [C_MAC, C_MAC | C_DECRYPTION])
+def test_scp02(make_card, security_level):
+    enc, mac = os.urandom(16), os.urandom(16)
+    simulated = Scp02Card(enc, mac)
+    channel = Scp02(make_card(simulated), enc, mac, security_level=security_level).open()
+
+    for size in (1, 7, 8, 9, 200, 240, 247, 248, 255):               # Sent body of 248.. is extended
+        data = os.urandom(size)
+
+        assert channel.transmit(b'\x80\xE2\x00\x00' + bytes((size,)) + data) == ([], 0x90, 0x00)
+        assert simulated.received[-1] == data